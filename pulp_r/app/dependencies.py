@@ -0,0 +1,220 @@
+"""
+Dependency graphs of the packages in a repository version.
+
+A repository version never changes once it is complete, so the graph of a version is built with
+a single query the first time it is needed and then kept in memory.
+"""
+
+from collections import defaultdict, deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Q
+from pulpcore.plugin.models import RepositoryVersion
+
+from pulp_r.app.models import RPackage, newest_packages
+from pulp_r.app.utils import version_constraint_q
+
+# Dependency fields that have to be installed for a package to work
+HARD_DEPENDENCY_FIELDS = ('depends', 'imports', 'linking_to')
+
+# R itself and the packages that ship with every R installation
+BASE_PACKAGES = frozenset((
+    'R', 'base', 'compiler', 'datasets', 'graphics', 'grDevices', 'grid', 'methods', 'parallel',
+    'splines', 'stats', 'stats4', 'tcltk', 'tools', 'utils',
+))
+
+
+class DependencyIndex:
+    """
+    The Depends, Imports and LinkingTo graph between the newest versions of a set of packages.
+
+    Nodes are package names, dependencies on R and its base packages are left out.
+    """
+
+    def __init__(self, packages):
+        """
+        Args:
+            packages: An iterable of ``(name, version, depends, imports, linking_to)`` of the
+                newest version of every package.
+        """
+        self.versions = {}
+        self.dependencies = {}
+        self.dependents = defaultdict(set)
+        for name, version, *fields in packages:
+            self.versions[name] = version
+            dependencies = {
+                dependency['package']
+                for dependency_list in fields
+                for dependency in dependency_list or ()
+                if dependency['package'] not in BASE_PACKAGES
+            }
+            self.dependencies[name] = sorted(dependencies)
+            for dependency in dependencies:
+                self.dependents[dependency].add(name)
+
+    def __contains__(self, name):
+        return name in self.versions
+
+    def _walk(self, name, edges, recursive):
+        """
+        Breadth first walk from ``name`` over ``edges``.
+
+        Returns:
+            A list of ``(name, depth, parent)`` for every reached package, closest first.
+        """
+        reached = [(child, 1, name) for child in edges(name)]
+        if not recursive:
+            return reached
+        seen = {name} | {child for child, _, _ in reached}
+        queue = deque(reached)
+        while queue:
+            parent, depth, _ = queue.popleft()
+            for child in edges(parent):
+                if child not in seen:
+                    seen.add(child)
+                    entry = (child, depth + 1, parent)
+                    reached.append(entry)
+                    queue.append(entry)
+        return reached
+
+    def reverse_dependencies(self, name, recursive=True):
+        """
+        The packages that need ``name``, directly or (if ``recursive``) through other packages.
+        """
+        return self._walk(name, lambda parent: sorted(self.dependents.get(parent, ())), recursive)
+
+    def dependency_tree(self, name, recursive=True):
+        """
+        The packages ``name`` needs, including those that are not in the repository version.
+        """
+        return self._walk(name, lambda parent: self.dependencies.get(parent, ()), recursive)
+
+
+def build_dependency_index(repository_version_pk):
+    """
+    Build the DependencyIndex of a repository version from the newest version of each package.
+    """
+    repository_version = RepositoryVersion.objects.get(pk=repository_version_pk)
+    packages = newest_packages(repository_version).values_list(
+        'name', 'version', *HARD_DEPENDENCY_FIELDS
+    )
+    return DependencyIndex(packages.iterator())
+
+
+_cached_dependency_index = lru_cache(maxsize=settings.R_DEPENDENCY_INDEX_CACHE_SIZE)(
+    build_dependency_index
+)
+
+
+def dependency_index(repository_version):
+    """
+    Return the DependencyIndex of ``repository_version``.
+
+    Indexes of complete versions are cached, a version still being created is read every time.
+    """
+    if not repository_version.complete:
+        return build_dependency_index(repository_version.pk)
+    return _cached_dependency_index(repository_version.pk)
+
+
+def _requirement_q(name, constraint):
+    """
+    Filter for the versions of package ``name`` that satisfy ``constraint``.
+
+    Raises:
+        ValueError: If the constraint cannot be parsed.
+    """
+    q = Q(name=name)
+    if constraint:
+        q &= version_constraint_q(constraint)
+    return q
+
+
+def install_order(dependencies):
+    """
+    Order packages so that every package comes after its dependencies.
+
+    Args:
+        dependencies (dict): Package names mapped to the names of their dependencies.
+
+    Returns:
+        The package names, any packages in a dependency cycle last.
+    """
+    pending = {name: set(deps) & dependencies.keys() for name, deps in dependencies.items()}
+    order = []
+    ready = sorted(name for name, deps in pending.items() if not deps)
+    while ready:
+        order.extend(ready)
+        for name in ready:
+            del pending[name]
+        done = set(ready)
+        ready = []
+        for name, deps in pending.items():
+            deps -= done
+            if not deps:
+                ready.append(name)
+        ready.sort()
+    return order + sorted(pending)
+
+
+def resolve_install_plan(repository_version, requirements):
+    """
+    Resolve requirements and all of their dependencies against a repository version.
+
+    Every round resolves all packages discovered by the previous one with a single query, so
+    the number of queries grows with the depth of the dependency graph, not its size. The first
+    requirement resolved for a package wins, so the given requirements take precedence over
+    constraints declared by dependencies. A dependency whose constraint cannot be parsed can
+    not be satisfied.
+
+    Args:
+        repository_version (RepositoryVersion): The repository version to resolve against.
+        requirements (dict): Package names mapped to version constraints, or None.
+
+    Returns:
+        A tuple of the resolved RPackages in install order and a list of ``(name, constraint)``
+        of the requirements that could not be satisfied.
+    """
+    resolved = {}
+    missing = []
+    seen = set(requirements)
+    wanted = dict(requirements)
+    while wanted:
+        q = Q(pk__in=[])
+        for name, constraint in wanted.items():
+            try:
+                q |= _requirement_q(name, constraint)
+            except ValueError:
+                pass
+        found = {
+            package.name: package
+            for package in RPackage.objects.filter(pk__in=repository_version.content)
+            .filter(q)
+            .order_by('name', '-version_key')
+            .distinct('name')
+            .only('name', 'version', 'md5sum', *HARD_DEPENDENCY_FIELDS)
+        }
+        missing.extend(
+            (name, constraint) for name, constraint in wanted.items() if name not in found
+        )
+        resolved.update(found)
+
+        wanted = {}
+        for package in found.values():
+            for field in HARD_DEPENDENCY_FIELDS:
+                for dependency in getattr(package, field) or ():
+                    name = dependency['package']
+                    if name not in BASE_PACKAGES and name not in seen:
+                        seen.add(name)
+                        wanted[name] = dependency.get('version')
+
+    order = install_order({
+        name: {
+            dependency['package']
+            for field in HARD_DEPENDENCY_FIELDS
+            for dependency in getattr(package, field) or ()
+        }
+        for name, package in resolved.items()
+    })
+    return [resolved[name] for name in order], sorted(missing)
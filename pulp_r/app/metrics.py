@@ -0,0 +1,77 @@
+"""
+Timers and counters for the phases of pulp_r tasks.
+
+A task collects its measurements in a ``TaskTimings`` and records the totals as progress reports
+of the task when it is done.
+"""
+
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from gettext import gettext as _
+
+from pulpcore.plugin.constants import TASK_STATES
+from pulpcore.plugin.models import ProgressReport
+
+
+class TaskTimings:
+    """
+    Wall time and number of calls per phase of a task, plus free-form counters.
+
+    Phases that run concurrently, like downloads of a sync, add up the time of every call, so
+    their total can exceed the duration of the task.
+    """
+
+    def __init__(self, prefix):
+        """
+        Args:
+            prefix (str): The kind of task, used as the prefix of the progress report codes.
+        """
+        self.prefix = prefix
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+
+    @contextmanager
+    def timer(self, phase):
+        """
+        Measure the block as one call of ``phase``.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[phase] += time.perf_counter() - start
+            self.calls[phase] += 1
+
+    def count(self, counter, amount=1):
+        self.counters[counter] += amount
+
+    def record(self):
+        """
+        Save the totals as completed progress reports of the running task.
+        """
+        reports = [
+            ProgressReport(
+                message=_("Time spent in {phase}: {seconds:.3f}s").format(
+                    phase=phase, seconds=seconds
+                ),
+                code=f"{self.prefix}.timing.{phase}",
+                state=TASK_STATES.COMPLETED,
+                total=self.calls[phase],
+                done=self.calls[phase],
+            )
+            for phase, seconds in self.seconds.items()
+        ]
+        reports.extend(
+            ProgressReport(
+                message=_("Counted {counter}").format(counter=counter),
+                code=f"{self.prefix}.count.{counter}",
+                state=TASK_STATES.COMPLETED,
+                total=amount,
+                done=amount,
+            )
+            for counter, amount in self.counters.items()
+        )
+        for report in reports:
+            report.save()
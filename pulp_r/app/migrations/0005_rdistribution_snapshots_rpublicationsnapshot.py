@@ -0,0 +1,60 @@
+# Generated by Django 4.2.13 on 2026-10-19 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_snapshots(apps, schema_editor):
+    """Record the newest existing publication of each day for every repository."""
+    RPublication = apps.get_model('r', 'RPublication')
+    RPublicationSnapshot = apps.get_model('r', 'RPublicationSnapshot')
+
+    current = {}
+    publications = (
+        RPublication.objects.filter(complete=True)
+        .order_by('pulp_created')
+        .values_list('pk', 'pulp_created', 'repository_version__repository_id',
+                     'repository_version__number')
+    )
+    for pk, created, repository_id, number in publications.iterator():
+        key = (repository_id, created.date())
+        if key not in current or current[key][1] <= number:
+            current[key] = (pk, number)
+
+    RPublicationSnapshot.objects.bulk_create(
+        [
+            RPublicationSnapshot(repository_id=repository_id, date=day, publication_id=pk)
+            for (repository_id, day), (pk, _) in current.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0117_task_unblocked_at'),
+        ('r', '0004_metadatacontent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rdistribution',
+            name='snapshots',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='RPublicationSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('publication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='r.rpublication')),
+                ('repository', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='r.rrepository')),
+            ],
+            options={
+                'default_related_name': '%(app_label)s_%(model_name)s',
+                'unique_together': {('repository', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop, elidable=True),
+    ]
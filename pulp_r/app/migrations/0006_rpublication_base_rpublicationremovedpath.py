@@ -0,0 +1,31 @@
+# Generated by Django 4.2.13 on 2026-10-19 10:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0117_task_unblocked_at'),
+        ('r', '0005_rdistribution_snapshots_rpublicationsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpublication',
+            name='base',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='deltas', to='r.rpublication'),
+        ),
+        migrations.CreateModel(
+            name='RPublicationRemovedPath',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('relative_path', models.TextField()),
+                ('publication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='removed_paths', to='r.rpublication')),
+            ],
+            options={
+                'unique_together': {('publication', 'relative_path')},
+            },
+        ),
+    ]
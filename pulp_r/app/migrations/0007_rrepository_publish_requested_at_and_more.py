@@ -0,0 +1,25 @@
+# Generated by Django 4.2.13 on 2026-10-19 10:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0117_task_unblocked_at'),
+        ('r', '0006_rpublication_base_rpublicationremovedpath'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rrepository',
+            name='publish_requested_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='rrepository',
+            name='publish_task',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.task'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.13 on 2026-10-19 11:37
+
+from django.db import migrations, models
+
+
+def mark_described_packages(apps, schema_editor):
+    """Packages that already carry a description do not need to be enriched."""
+    RPackage = apps.get_model('r', 'RPackage')
+    RPackage.objects.exclude(description='').update(enriched=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('r', '0007_rrepository_publish_requested_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpackage',
+            name='enriched',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_described_packages, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('r', '0008_rpackage_enriched'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rpackage',
+            index=models.Index(fields=['name', 'version', 'content_ptr'], name='r_rpackage_keyset_idx'),
+        ),
+    ]
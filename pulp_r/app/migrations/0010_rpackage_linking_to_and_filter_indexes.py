@@ -0,0 +1,49 @@
+# Generated by Django 4.2.13 on 2026-10-19 13:02
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+DEPENDENCY_COLUMNS = ('depends', 'imports', 'suggests', 'requires')
+
+# Sync used to store the dependency lists as JSON encoded strings inside the JSON columns.
+UNWRAP_SQL = "\n".join(
+    f"UPDATE r_rpackage SET {column} = ({column} #>> '{{}}')::jsonb "
+    f"WHERE jsonb_typeof({column}) = 'string';"
+    for column in DEPENDENCY_COLUMNS
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('r', '0009_rpackage_r_rpackage_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpackage',
+            name='linking_to',
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunSQL(UNWRAP_SQL, migrations.RunSQL.noop, elidable=True),
+        migrations.AddIndex(
+            model_name='rpackage',
+            index=models.Index(fields=['name'], name='r_rpackage_name_prefix_idx', opclasses=['text_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='rpackage',
+            index=models.Index(condition=models.Q(('needs_compilation', True)), fields=['name'], name='r_rpackage_compiled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rpackage',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['depends'], name='r_rpackage_depends_idx', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='rpackage',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['imports'], name='r_rpackage_imports_idx', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='rpackage',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['linking_to'], name='r_rpackage_linking_to_idx', opclasses=['jsonb_path_ops']),
+        ),
+    ]
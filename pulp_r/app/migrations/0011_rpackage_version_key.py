@@ -0,0 +1,41 @@
+# Generated by Django 4.2.13 on 2026-10-19 13:48
+
+from django.db import migrations, models
+
+from pulp_r.app.utils import version_key
+
+BATCH_SIZE = 1000
+
+
+def backfill_version_keys(apps, schema_editor):
+    """Compute the sortable version key of every existing package."""
+    RPackage = apps.get_model('r', 'RPackage')
+
+    batch = []
+    for package in RPackage.objects.only('pk', 'version').iterator(chunk_size=BATCH_SIZE):
+        package.version_key = version_key(package.version)
+        batch.append(package)
+        if len(batch) == BATCH_SIZE:
+            RPackage.objects.bulk_update(batch, ['version_key'])
+            batch = []
+    RPackage.objects.bulk_update(batch, ['version_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('r', '0010_rpackage_linking_to_and_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpackage',
+            name='version_key',
+            field=models.TextField(db_collation='C', default=''),
+        ),
+        migrations.RunPython(backfill_version_keys, migrations.RunPython.noop, elidable=True),
+        migrations.AddIndex(
+            model_name='rpackage',
+            index=models.Index(fields=['name', 'version_key'], name='r_rpackage_version_key_idx'),
+        ),
+    ]
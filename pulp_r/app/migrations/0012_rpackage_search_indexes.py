@@ -0,0 +1,25 @@
+# Generated by Django 4.2.13 on 2026-10-19 14:25
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('r', '0011_rpackage_version_key'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='rpackage',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('summary', 'description', config='english'), name='r_rpackage_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rpackage',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='r_rpackage_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-19 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('r', '0012_rpackage_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rrepository',
+            name='retain_package_versions',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
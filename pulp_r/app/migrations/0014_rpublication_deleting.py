@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-19 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('r', '0013_rrepository_retain_package_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpublication',
+            name='deleting',
+            field=models.BooleanField(default=False),
+        ),
+    ]
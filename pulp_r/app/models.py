@@ -5,14 +5,38 @@ Check `Plugin Writer's Guide`_ for more details.
     https://docs.pulpproject.org/pulpcore/plugins/plugin-writer/index.html
 """
 
+import re
+from datetime import date as Date
+from functools import lru_cache
 from logging import getLogger
 
-from django.db import models
+from aiohttp.web_exceptions import HTTPNotFound
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import connection, models, transaction
+from django.db.models import (
+    Case,
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import RowNumber
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from pulpcore.plugin.models import (
     Content,
     ContentArtifact,
     Distribution,
     Publication,
+    PublishedArtifact,
     PublishedMetadata,
     Remote,
     RemoteArtifact,
@@ -21,8 +45,16 @@ from pulpcore.plugin.models import (
     RepositoryVersion,
 )
 
+from pulp_r.app import utils
+
 logger = getLogger(__name__)
 
+LAYER_BATCH_SIZE = 1000
+# Full-text search document of a package, queries must use the same expression as the index
+SEARCH_CONFIG = 'english'
+SEARCH_VECTOR = SearchVector('summary', 'description', config=SEARCH_CONFIG)
+SNAPSHOT_PATH_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:/(.*))?$")
+
 class RPackage(Content):
     """
     The "r" content type representing an R package.
@@ -31,6 +63,8 @@ class RPackage(Content):
 
     name = models.TextField()
     version = models.TextField()
+    # Sorts like R's package_version(), see pulp_r.app.utils.version_key
+    version_key = models.TextField(default='', db_collation='C')
     priority = models.TextField(default='')  # Add priority field
     summary = models.TextField()
     description = models.TextField()
@@ -43,14 +77,49 @@ class RPackage(Content):
     imports = models.JSONField(default=list)
     suggests = models.JSONField(default=list)
     requires = models.JSONField(default=list)
+    linking_to = models.JSONField(default=list)
+    # Whether the metadata has been completed from the DESCRIPTION file of the tarball
+    enriched = models.BooleanField(default=False)
 
     class Meta:
         default_related_name = "%(app_label)s_%(model_name)s"
         unique_together = ['name', 'version']
+        indexes = [
+            # Keyset pagination order of the packages endpoint
+            models.Index(fields=['name', 'version', 'content_ptr'], name='r_rpackage_keyset_idx'),
+            # Latest version per package and version constraints
+            models.Index(fields=['name', 'version_key'], name='r_rpackage_version_key_idx'),
+            # Filters of the packages endpoint
+            models.Index(
+                fields=['name'], opclasses=['text_pattern_ops'], name='r_rpackage_name_prefix_idx'
+            ),
+            models.Index(
+                fields=['name'],
+                condition=Q(needs_compilation=True),
+                name='r_rpackage_compiled_idx',
+            ),
+            GinIndex(
+                fields=['depends'], opclasses=['jsonb_path_ops'], name='r_rpackage_depends_idx'
+            ),
+            GinIndex(
+                fields=['imports'], opclasses=['jsonb_path_ops'], name='r_rpackage_imports_idx'
+            ),
+            GinIndex(
+                fields=['linking_to'], opclasses=['jsonb_path_ops'],
+                name='r_rpackage_linking_to_idx',
+            ),
+            # Package search
+            GinIndex(SEARCH_VECTOR, name='r_rpackage_search_idx'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='r_rpackage_name_trgm_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.version_key = utils.version_key(self.version)
+        super().save(*args, **kwargs)
+
 class RPackageRepositoryVersion(models.Model):
     """
     Represents the relationship between an RPackage and a RepositoryVersion.
@@ -65,12 +134,151 @@ class RPackageRepositoryVersion(models.Model):
 class RPublication(Publication):
     """
     A Publication for RContent.
+
+    A publication with a ``base`` only stores the paths that differ from it (the delta): its own
+    PublishedArtifacts override those of the base and ``RPublicationRemovedPath`` rows hide base
+    paths that are gone. A base publication is always a full publication.
+
+    ``deleting`` is set before a publication is deleted in batches, so that new publications
+    are no longer layered on it and distributions stop serving it.
     """
     TYPE = "r"
 
+    base = models.ForeignKey(
+        'self', null=True, on_delete=models.DO_NOTHING, related_name='deltas'
+    )
+    deleting = models.BooleanField(default=False)
+
     class Meta:
         default_related_name = "%(app_label)s_%(model_name)s"
 
+    def effective_paths(self):
+        """
+        Return a dict of every relative path served by this publication to its ContentArtifact pk.
+        """
+        paths = {}
+        if self.base_id:
+            removed = set(self.removed_paths.values_list('relative_path', flat=True))
+            paths.update(
+                (path, ca)
+                for path, ca in PublishedArtifact.objects.filter(
+                    publication_id=self.base_id
+                ).values_list('relative_path', 'content_artifact_id').iterator()
+                if path not in removed
+            )
+        paths.update(
+            PublishedArtifact.objects.filter(publication=self)
+            .values_list('relative_path', 'content_artifact_id')
+            .iterator()
+        )
+        return paths
+
+    def write_layer(self, paths, base=None, batch_size=LAYER_BATCH_SIZE):
+        """
+        Store ``paths`` (relative path -> ContentArtifact pk) as this publication's content.
+
+        With a ``base`` only the difference to it is stored, otherwise every path gets a row.
+        Rows are written in batches of ``batch_size``, each in its own transaction, and the new
+        base is only set once all of them are written.
+        """
+        base_paths = base.effective_paths() if base else {}
+        own = {path: ca for path, ca in paths.items() if base_paths.get(path) != ca}
+        removed = set(base_paths) - set(paths)
+
+        existing = dict(
+            PublishedArtifact.objects.filter(publication=self)
+            .values_list('relative_path', 'content_artifact_id')
+        )
+        stale = [path for path, ca in existing.items() if own.get(path) != ca]
+        added = [
+            PublishedArtifact(relative_path=path, publication=self, content_artifact_id=ca)
+            for path, ca in own.items()
+            if existing.get(path) != ca
+        ]
+        existing_removed = set(self.removed_paths.values_list('relative_path', flat=True))
+        unhidden = list(existing_removed - removed)
+        hidden = [
+            RPublicationRemovedPath(publication=self, relative_path=path)
+            for path in removed - existing_removed
+        ]
+
+        for i in range(0, len(stale), batch_size):
+            with transaction.atomic():
+                PublishedArtifact.objects.filter(
+                    publication=self, relative_path__in=stale[i:i + batch_size]
+                ).delete()
+        for i in range(0, len(added), batch_size):
+            with transaction.atomic():
+                PublishedArtifact.objects.bulk_create(added[i:i + batch_size])
+        for i in range(0, len(unhidden), batch_size):
+            with transaction.atomic():
+                self.removed_paths.filter(relative_path__in=unhidden[i:i + batch_size]).delete()
+        for i in range(0, len(hidden), batch_size):
+            with transaction.atomic():
+                RPublicationRemovedPath.objects.bulk_create(hidden[i:i + batch_size])
+        self.base = base
+        self.save(update_fields=['base'])
+
+    def rebase_deltas(self, exclude=None):
+        """
+        Detach every delta publication from this publication so that it can be deleted.
+
+        The oldest delta becomes a full publication and the new base of the remaining deltas.
+        Their rows are written in batches of ``R_DELETE_BATCH_SIZE``, each in its own transaction.
+
+        Args:
+            exclude (Q): Deltas that are going to be deleted together with this publication.
+        """
+        deltas = RPublication.objects.filter(base=self)
+        if exclude is not None:
+            deltas = deltas.exclude(exclude)
+        deltas = list(deltas.order_by('pulp_created'))
+        if not deltas:
+            return
+        effective = [(delta, delta.effective_paths()) for delta in deltas]
+        new_base, new_base_paths = effective[0]
+        new_base.write_layer(new_base_paths, batch_size=settings.R_DELETE_BATCH_SIZE)
+        for delta, paths in effective[1:]:
+            delta.write_layer(paths, base=new_base, batch_size=settings.R_DELETE_BATCH_SIZE)
+
+
+class RPublicationRemovedPath(models.Model):
+    """
+    A path of the base publication that a delta RPublication no longer serves.
+    """
+    publication = models.ForeignKey(
+        RPublication, on_delete=models.CASCADE, related_name='removed_paths'
+    )
+    relative_path = models.TextField()
+
+    class Meta:
+        unique_together = ('publication', 'relative_path')
+
+
+def _deleted_along(origin):
+    """
+    Return a Q matching the RPublications removed by the same delete as ``origin``.
+    """
+    if isinstance(origin, models.QuerySet):
+        model, pks = origin.model, origin.values('pk')
+    elif isinstance(origin, models.Model):
+        model, pks = type(origin), [origin.pk]
+    else:
+        return None
+
+    if issubclass(model, Repository):
+        return Q(repository_version__repository__in=pks)
+    if issubclass(model, RepositoryVersion):
+        return Q(repository_version__in=pks)
+    if issubclass(model, Publication):
+        return Q(pk__in=pks)
+    return None
+
+
+@receiver(pre_delete, sender=RPublication)
+def _rebase_deltas_on_delete(sender, instance, origin=None, **kwargs):
+    instance.rebase_deltas(exclude=_deleted_along(origin))
+
 class RRemote(Remote):
     """
     A Remote for RContent.
@@ -83,22 +291,173 @@ class RRemote(Remote):
 class RRepository(Repository):
     """
     A Repository for RContent.
+
+    Uploads request a publication by setting ``publish_requested_at``; ``publish_task`` is the
+    task that coalesces those requests into publications of the latest version.
+
+    With ``retain_package_versions`` set, every new version keeps only that many of the newest
+    versions of each package.
     """
     TYPE = "r"
     CONTENT_TYPES = [RPackage]
 
+    publish_requested_at = models.DateTimeField(null=True)
+    publish_task = models.ForeignKey(
+        'core.Task', null=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    retain_package_versions = models.PositiveIntegerField(default=0)
+
     class Meta:
         default_related_name = "%(app_label)s_%(model_name)s"
 
+    def finalize_new_version(self, new_version):
+        """
+        Remove the package versions beyond ``retain_package_versions`` from a new version.
+
+        Versions are ranked by R version ordering per package name in a single query.
+        """
+        if not self.retain_package_versions:
+            return
+        ranked = RPackage.objects.filter(pk__in=new_version.content).annotate(
+            rank=Window(
+                RowNumber(),
+                partition_by=[F('name')],
+                order_by=[F('version_key').desc(), F('pulp_created').desc()],
+            )
+        )
+        superseded = ranked.filter(rank__gt=self.retain_package_versions).values('pk')
+        new_version.remove_content(RPackage.objects.filter(pk__in=superseded))
+
 class RDistribution(Distribution):
     """
     A Distribution for RContent.
+
+    When ``snapshots`` is enabled the distribution additionally serves
+    ``<base_path>/<YYYY-MM-DD>/<relative_path>`` from the publication that was current for the
+    repository on that day.
     """
     TYPE = "r"
 
+    snapshots = models.BooleanField(default=False)
+
     class Meta:
         default_related_name = "%(app_label)s_%(model_name)s"
 
+    def snapshot_repository_id(self):
+        """
+        Return the pk of the repository whose history is served in snapshot mode.
+        """
+        if self.repository_id:
+            return self.repository_id
+        if self.publication_id:
+            return self.publication.repository_version.repository_id
+        return None
+
+    def served_publication_id(self):
+        """
+        Return the pk of the publication served at the root of this distribution, if any.
+
+        A publication that is being deleted is not served, its rows are going away in batches.
+        """
+        if self.publication_id:
+            return (
+                RPublication.objects.filter(pk=self.publication_id, deleting=False)
+                .values_list('pk', flat=True)
+                .first()
+            )
+        if self.repository_id:
+            return (
+                RPublication.objects.filter(
+                    complete=True,
+                    deleting=False,
+                    repository_version__repository_id=self.repository_id,
+                )
+                .order_by('-repository_version__number', '-pulp_created')
+                .values_list('pk', flat=True)
+                .first()
+            )
+        return None
+
+    def content_handler(self, path):
+        """
+        Serve paths of layered publications and, in snapshot mode, ``<YYYY-MM-DD>/<path>``.
+
+        Anything not found here is left to the default pulpcore handling.
+        """
+        if not self.snapshots:
+            return self._served_content_artifact(path)
+        snapshot = split_snapshot_path(path)
+        if snapshot is None:
+            return self._served_content_artifact(path)
+        day, relative_path = snapshot
+        if not relative_path or relative_path.endswith("/"):
+            return None
+
+        repository_id = self.snapshot_repository_id()
+        if repository_id is None or day > timezone.now().date():
+            raise HTTPNotFound()
+
+        publication_id = resolve_snapshot(repository_id, day)
+        if publication_id is None:
+            raise HTTPNotFound()
+
+        content_artifact = published_content_artifact(publication_id, relative_path)
+        served = RPublication.objects.filter(pk=publication_id, deleting=False)
+        if content_artifact is None and not served.exists():
+            # The cached publication has been deleted since it was resolved.
+            _cached_lookup_snapshot.cache_clear()
+            publication_id = resolve_snapshot(repository_id, day)
+            if publication_id is not None:
+                content_artifact = published_content_artifact(publication_id, relative_path)
+        if content_artifact is None:
+            raise HTTPNotFound()
+        return content_artifact
+
+    def _served_content_artifact(self, path):
+        """
+        Return the ContentArtifact served at ``path`` by the served publication, or None.
+        """
+        if not path or path.endswith("/"):
+            return None
+        publication_id = self.served_publication_id()
+        if publication_id is None:
+            return None
+        return published_content_artifact(publication_id, path)
+
+    def content_handler_list_directory(self, rel_path):
+        """
+        List the entries of ``rel_path`` that a layered publication inherits from its base.
+        """
+        publication_id = self.served_publication_id()
+        if publication_id is None:
+            return set()
+        base_id = (
+            RPublication.objects.filter(pk=publication_id)
+            .values_list('base_id', flat=True)
+            .first()
+        )
+        if base_id is None:
+            return set()
+
+        paths = (
+            PublishedArtifact.objects.filter(
+                publication_id=base_id, relative_path__startswith=rel_path
+            )
+            .exclude(
+                Exists(
+                    RPublicationRemovedPath.objects.filter(
+                        publication_id=publication_id, relative_path=OuterRef('relative_path')
+                    )
+                )
+            )
+            .values_list('relative_path', flat=True)
+        )
+        entries = set()
+        for path in paths.iterator():
+            name, sep, _ = path[len(rel_path):].partition('/')
+            entries.add(name + sep)
+        return entries
+
 class RPublishedMetadata(PublishedMetadata):
     """
     PublishedMetadata for RContent.
@@ -115,4 +474,229 @@ class MetadataContent(Content):
     TYPE = 'metadata'
     
     class Meta:
-        default_related_name = "%(app_label)s_%(model_name)s"
\ No newline at end of file
+        default_related_name = "%(app_label)s_%(model_name)s"
+
+
+class RPublicationSnapshot(models.Model):
+    """
+    Records which RPublication was current for a repository on a given date.
+
+    The newest publication of each day is recorded at publish time. A date without a row of its
+    own resolves to the closest earlier date.
+    """
+    repository = models.ForeignKey(RRepository, on_delete=models.CASCADE)
+    date = models.DateField()
+    publication = models.ForeignKey(RPublication, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('repository', 'date')
+        default_related_name = "%(app_label)s_%(model_name)s"
+
+
+def split_snapshot_path(path):
+    """
+    Split ``<YYYY-MM-DD>/<relative_path>`` into a date and the remaining relative path.
+
+    Returns None when the path does not start with a valid date.
+    """
+    match = SNAPSHOT_PATH_RE.match(path)
+    if match is None:
+        return None
+    try:
+        day = Date.fromisoformat(match.group(1))
+    except ValueError:
+        return None
+    return day, match.group(2) or ''
+
+
+def _lookup_snapshot(repository_id, day):
+    return (
+        RPublicationSnapshot.objects.filter(
+            repository_id=repository_id, date__lte=day, publication__deleting=False
+        )
+        .order_by('-date')
+        .values_list('publication_id', flat=True)
+        .first()
+    )
+
+
+_cached_lookup_snapshot = lru_cache(maxsize=settings.R_SNAPSHOT_CACHE_SIZE)(_lookup_snapshot)
+
+
+def resolve_snapshot(repository_id, day):
+    """
+    Return the pk of the RPublication current for a repository on ``day``.
+
+    Past days can no longer change, so their resolution is kept in an in-memory cache. The
+    current day is always looked up because a later publish may still replace it.
+    """
+    if day >= timezone.now().date():
+        return _lookup_snapshot(repository_id, day)
+    return _cached_lookup_snapshot(repository_id, day)
+
+
+def published_content_artifact(publication_id, relative_path):
+    """
+    Return the ContentArtifact published at ``relative_path`` in a publication, or None.
+
+    Layered publications are resolved in the same single query: a row of the publication itself
+    wins over a row of its base, and base rows hidden by a removed path are skipped.
+    """
+    base_id = RPublication.objects.filter(pk=publication_id).values('base_id')
+    published_artifact = (
+        PublishedArtifact.objects.select_related('content_artifact__artifact')
+        .filter(relative_path=relative_path)
+        .filter(Q(publication_id=publication_id) | Q(publication_id=Subquery(base_id)))
+        .exclude(
+            Exists(
+                RPublicationRemovedPath.objects.filter(
+                    publication_id=publication_id, relative_path=OuterRef('relative_path')
+                )
+            )
+        )
+        .annotate(
+            own=Case(
+                When(publication_id=publication_id, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        .order_by('-own')
+        .first()
+    )
+    if published_artifact is None:
+        return None
+    return published_artifact.content_artifact
+
+
+def newest_packages(repository_version):
+    """
+    Return a queryset of the newest version of each package in ``repository_version``.
+    """
+    return (
+        RPackage.objects.filter(pk__in=repository_version.content)
+        .order_by('name', '-version_key')
+        .distinct('name')
+    )
+
+
+def package_changes(base_version, repository_version, after='', limit=100):
+    """
+    Compare the newest version of each package between two repository versions.
+
+    Both sides are reduced to ``(name, version)`` by name and compared with a single full outer
+    join, so the cost does not depend on how many versions lie between the two.
+
+    Args:
+        base_version (RepositoryVersion): The version to compare against.
+        repository_version (RepositoryVersion): The version to compare.
+        after (str): Only return packages with names sorting after this one.
+        limit (int): The maximum number of packages to return.
+
+    Returns:
+        A list of dicts with the ``name``, the ``change`` (``added``, ``removed``, ``upgraded``,
+        ``downgraded`` or ``changed``), the ``base_version`` and the ``version`` of changed
+        packages, ordered by name.
+    """
+    base_sql, base_params = (
+        newest_packages(base_version)
+        .values('name', 'version', 'version_key').query.sql_with_params()
+    )
+    new_sql, new_params = (
+        newest_packages(repository_version)
+        .values('name', 'version', 'version_key').query.sql_with_params()
+    )
+    sql = f"""
+        SELECT COALESCE(new.name, old.name) AS name,
+               CASE
+                   WHEN old.name IS NULL THEN 'added'
+                   WHEN new.name IS NULL THEN 'removed'
+                   WHEN new.version_key > old.version_key THEN 'upgraded'
+                   WHEN new.version_key < old.version_key THEN 'downgraded'
+                   ELSE 'changed'
+               END AS change,
+               old.version AS base_version,
+               new.version AS version
+        FROM ({base_sql}) AS old
+        FULL OUTER JOIN ({new_sql}) AS new ON old.name = new.name
+        WHERE old.version IS DISTINCT FROM new.version
+          AND COALESCE(new.name, old.name) > %s
+        ORDER BY 1
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*base_params, *new_params, after, limit))
+        columns = [column.name for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def bulk_create_packages(packages, batch_size=LAYER_BATCH_SIZE):
+    """
+    Insert new RPackages in batches.
+
+    Django cannot bulk create multi-table content, so the ``Content`` rows are bulk created
+    first and the ``RPackage`` rows are then inserted with one statement per batch. Packages
+    whose name and version were saved in the meantime, e.g. by a concurrent sync or upload, are
+    skipped by the insert: their ``Content`` rows are deleted again and the stored packages are
+    returned in their place.
+
+    Args:
+        packages (list): Unsaved RPackages, those inserted are saved in place.
+
+    Returns:
+        A list of the saved RPackages in the same order.
+    """
+    for package in packages:
+        package.version_key = utils.version_key(package.version)
+        if not package.pulp_type:
+            package.pulp_type = package.get_pulp_type()
+        package.content_ptr_id = package.pulp_id
+    Content.objects.bulk_create(
+        [
+            Content(**{
+                field.attname: getattr(package, field.attname)
+                for field in Content._meta.concrete_fields
+            })
+            for package in packages
+        ],
+        batch_size=batch_size,
+    )
+
+    fields = RPackage._meta.local_concrete_fields
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    placeholders = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    inserted = set()
+    with connection.cursor() as cursor:
+        for i in range(0, len(packages), batch_size):
+            batch = packages[i:i + batch_size]
+            cursor.execute(
+                f"INSERT INTO {RPackage._meta.db_table} ({columns}) "
+                f"VALUES {', '.join([placeholders] * len(batch))} "
+                f"ON CONFLICT (name, version) DO NOTHING RETURNING content_ptr_id",
+                [
+                    field.get_db_prep_save(getattr(package, field.attname), connection)
+                    for package in batch
+                    for field in fields
+                ],
+            )
+            inserted.update(row[0] for row in cursor.fetchall())
+
+    skipped = [package for package in packages if package.pulp_id not in inserted]
+    stored = {}
+    for i in range(0, len(skipped), batch_size):
+        batch = skipped[i:i + batch_size]
+        Content.objects.filter(pk__in=[package.pulp_id for package in batch]).delete()
+        stored.update(
+            ((package.name, package.version), package)
+            for package in RPackage.objects.filter(name__in={package.name for package in batch})
+        )
+
+    saved = []
+    for package in packages:
+        if package.pulp_id in inserted:
+            package._state.adding = False
+            package._state.db = connection.alias
+            saved.append(package)
+        else:
+            saved.append(stored[(package.name, package.version)])
+    return saved
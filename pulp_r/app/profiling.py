@@ -0,0 +1,90 @@
+"""
+Opt-in profiling of pulp_r tasks.
+
+With ``R_TASK_PROFILE`` set to ``cprofile`` a pstats file, with ``tracemalloc`` a memory
+snapshot is written to ``R_TASK_PROFILE_DIR`` for every run of a profiled task, named after the
+task id. Without the setting profiled tasks run unchanged.
+"""
+
+import cProfile
+import logging
+import os
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from gettext import gettext as _
+
+from django.conf import settings
+from pulpcore.plugin.models import Task
+
+log = logging.getLogger(__name__)
+
+# Frames stored per allocation when tracing memory
+TRACEMALLOC_FRAMES = 25
+
+
+@contextmanager
+def _cprofile(path):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+@contextmanager
+def _tracemalloc(path):
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    try:
+        yield
+    finally:
+        tracemalloc.take_snapshot().dump(path)
+        if started:
+            tracemalloc.stop()
+
+
+PROFILERS = {
+    'cprofile': (_cprofile, 'pstats'),
+    'tracemalloc': (_tracemalloc, 'tracemalloc'),
+}
+
+
+def profile_path(func, extension):
+    """
+    Return the path of the profile of the running task, creating its directory if needed.
+    """
+    directory = settings.R_TASK_PROFILE_DIR or tempfile.gettempdir()
+    os.makedirs(directory, exist_ok=True)
+    task = Task.current()
+    name = str(task.pk) if task else f"{func.__name__}-{os.getpid()}"
+    return os.path.join(directory, f"{name}.{func.__name__}.{extension}")
+
+
+def profiled(func):
+    """
+    Profile ``func`` as configured by ``R_TASK_PROFILE``.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        mode = settings.R_TASK_PROFILE
+        if not mode:
+            return func(*args, **kwargs)
+        if mode not in PROFILERS:
+            log.warning(_("Unknown R_TASK_PROFILE {}, not profiling.").format(mode))
+            return func(*args, **kwargs)
+
+        profiler, extension = PROFILERS[mode]
+        path = profile_path(func, extension)
+        log.info(_("Writing the {mode} profile of this task to {path}").format(
+            mode=mode, path=path
+        ))
+        with profiler(path):
+            return func(*args, **kwargs)
+
+    return wrapper
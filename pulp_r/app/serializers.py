@@ -6,63 +6,362 @@ Check `Plugin Writer's Guide`_ for more details.
 """
 
 import logging
+import os
 from gettext import gettext as _
 
+from django.conf import settings
 from django.urls import reverse
 from pulpcore.plugin import serializers as platform
-from pulpcore.plugin.models import Artifact, ContentArtifact
+from pulpcore.plugin.models import Artifact
 from rest_framework import serializers
 
-from . import models
+from . import models, utils
+from .tasks.publishing import schedule_publish
+from .tasks.uploading import hash_file
 
 logger = logging.getLogger(__name__)
 
 
-class RPackageSerializer(serializers.ModelSerializer):
+class RPackageSerializer(platform.SingleArtifactContentUploadSerializer):
     """
     A Serializer for RPackage.
+
+    Packages are created from an uploaded tarball, all metadata is read from its DESCRIPTION by
+    the task creating the package.
     """
-    name = serializers.CharField(help_text=_("The name of the package"))
-    version = serializers.CharField(help_text=_("The version of the package"))
-    priority = serializers.CharField(help_text=_("The priority of the package"), allow_blank=True)
-    summary = serializers.CharField(help_text=_("A brief summary of the package"))
-    description = serializers.CharField(help_text=_("A longer description of the package"))
-    license = serializers.CharField(help_text=_("The license of the package"))
-    url = serializers.CharField(help_text=_("The URL of the package homepage"))
-    md5sum = serializers.CharField(help_text=_("The MD5 checksum of the package"), allow_blank=True)
-    needs_compilation = serializers.BooleanField(help_text=_("Whether the package needs compilation"))
-    path = serializers.CharField(help_text=_("The path of the package"), allow_blank=True)
-    depends = serializers.JSONField(help_text=_("A list of package dependencies"))
-    imports = serializers.JSONField(help_text=_("A list of imported packages"))
-    suggests = serializers.JSONField(help_text=_("A list of suggested packages"))
-    requires = serializers.JSONField(help_text=_("A list of required packages"))
-    file = serializers.FileField(help_text=_("The package file"), write_only=True)
+    name = serializers.CharField(help_text=_("The name of the package"), read_only=True)
+    version = serializers.CharField(help_text=_("The version of the package"), read_only=True)
+    priority = serializers.CharField(help_text=_("The priority of the package"), read_only=True)
+    summary = serializers.CharField(help_text=_("A brief summary of the package"), read_only=True)
+    description = serializers.CharField(
+        help_text=_("A longer description of the package"), read_only=True
+    )
+    license = serializers.CharField(help_text=_("The license of the package"), read_only=True)
+    url = serializers.CharField(help_text=_("The URL of the package homepage"), read_only=True)
+    md5sum = serializers.CharField(
+        help_text=_("The MD5 checksum of the package"), read_only=True
+    )
+    needs_compilation = serializers.BooleanField(
+        help_text=_("Whether the package needs compilation"), read_only=True
+    )
+    path = serializers.CharField(help_text=_("The path of the package"), read_only=True)
+    depends = serializers.JSONField(help_text=_("A list of package dependencies"), read_only=True)
+    imports = serializers.JSONField(help_text=_("A list of imported packages"), read_only=True)
+    suggests = serializers.JSONField(help_text=_("A list of suggested packages"), read_only=True)
+    requires = serializers.JSONField(help_text=_("A list of required packages"), read_only=True)
+    linking_to = serializers.JSONField(
+        help_text=_("A list of packages whose headers are linked to"), read_only=True
+    )
 
     class Meta:
-        fields = (
+        # The relative path is always <name>_<version>.tar.gz, as listed in PACKAGES
+        fields = tuple(
+            field for field in platform.SingleArtifactContentUploadSerializer.Meta.fields
+            if field != 'relative_path'
+        ) + (
             'name', 'version', 'priority', 'summary', 'description', 'license', 'url', 'md5sum',
-            'needs_compilation', 'path', 'depends', 'imports', 'suggests', 'requires', 'file'
+            'needs_compilation', 'path', 'depends', 'imports', 'suggests', 'requires',
+            'linking_to',
         )
         model = models.RPackage
 
+    def deferred_validate(self, data):
+        """
+        Read the package metadata from the DESCRIPTION of the tarball and hash it for PACKAGES.
+        """
+        data = super().deferred_validate(data)
+        artifact = data['artifact']
+        storage = artifact.file.storage
+        with storage.open(artifact.file.name, 'rb') as fp:
+            _size, digests = hash_file(fp)
+        try:
+            with storage.open(artifact.file.name, 'rb') as fp:
+                description = utils.read_description(fp)
+            fields = utils.package_fields(description)
+        except (KeyError, ValueError) as e:
+            raise serializers.ValidationError(
+                _("Not a valid R source package: {}").format(e)
+            )
+
+        fields['md5sum'] = digests['md5sum']
+        fields['enriched'] = True
+        data.update(fields)
+        data['relative_path'] = f"{fields['name']}_{fields['version']}.tar.gz"
+        return data
+
+    def retrieve(self, validated_data):
+        """
+        Reuse the package with the same name and version, content is never modified.
+        """
+        return models.RPackage.objects.filter(
+            name=validated_data['name'], version=validated_data['version']
+        ).first()
+
     def create(self, validated_data):
-        file = validated_data.pop('file')
-        
-        # Initialize an in-memory Artifact from the provided file
-        artifact = Artifact.init_and_validate(file)
-        artifact.save()
-
-        package = models.RPackage.objects.create(**validated_data)
-        
-        # Create a ContentArtifact to associate the Package with the Artifact
-        ContentArtifact.objects.create(
-            artifact=artifact,
-            content=package,
-            relative_path=file.name
-        )
+        """
+        Create the package and request a publication of the repository it was added to.
+        """
+        repository = validated_data.get('repository')
+        package = super().create(validated_data)
+        if repository is not None:
+            schedule_publish(repository)
         return package
 
 
+class RPackageUploadSerializer(serializers.Serializer):
+    """
+    A Serializer for uploading an R package tarball into a repository.
+    """
+    file = serializers.FileField(
+        help_text=_("An R source package tarball, its metadata is read from its DESCRIPTION."),
+        write_only=True,
+    )
+
+
+class RPackageListSerializer(platform.NoArtifactContentSerializer):
+    """
+    A compact Serializer for lists of RPackages, leaving out the long text and dependencies.
+    """
+
+    class Meta:
+        fields = platform.NoArtifactContentSerializer.Meta.fields + (
+            'name', 'version', 'priority', 'license', 'md5sum', 'needs_compilation', 'path',
+        )
+        model = models.RPackage
+
+
+class RPackageSearchSerializer(RPackageListSerializer):
+    """
+    A Serializer for package search results.
+    """
+    summary = serializers.CharField(help_text=_("A brief summary of the package"), read_only=True)
+    rank = serializers.FloatField(
+        help_text=_("Relevance of the package for the search, higher is better"), read_only=True
+    )
+
+    class Meta:
+        fields = RPackageListSerializer.Meta.fields + ('summary', 'rank')
+        model = models.RPackage
+
+
+class RPackageDependencySerializer(serializers.Serializer):
+    """
+    A Serializer for a package reached while walking the dependency graph.
+    """
+    name = serializers.CharField(help_text=_("The name of the package"))
+    version = serializers.CharField(
+        help_text=_("The newest version in the repository version, null if it is missing"),
+        allow_null=True,
+    )
+    depth = serializers.IntegerField(
+        help_text=_("The number of dependency links between the package and the start")
+    )
+    parent = serializers.CharField(
+        help_text=_("The package through which this package was reached")
+    )
+
+
+class RPackageBulkUploadSerializer(serializers.Serializer):
+    """
+    A Serializer for uploading many R package tarballs into a repository at once.
+    """
+    files = serializers.ListField(
+        child=serializers.FileField(),
+        help_text=_("R source package tarballs to upload."),
+        required=False,
+        write_only=True,
+    )
+    artifacts = serializers.ListField(
+        child=platform.RelatedField(
+            view_name="artifacts-detail", queryset=Artifact.objects.all()
+        ),
+        help_text=_("Hrefs of already uploaded Artifacts of R source package tarballs."),
+        required=False,
+        write_only=True,
+    )
+
+    def validate(self, data):
+        if not data.get('files') and not data.get('artifacts'):
+            raise serializers.ValidationError(
+                _("At least one file or artifact has to be provided.")
+            )
+        return data
+
+
+class RPackageChangeSerializer(serializers.Serializer):
+    """
+    A Serializer for a package that changed between two repository versions.
+    """
+    name = serializers.CharField(help_text=_("The name of the package"))
+    change = serializers.ChoiceField(
+        help_text=_("How the newest version of the package changed"),
+        choices=('added', 'removed', 'upgraded', 'downgraded', 'changed'),
+    )
+    base_version = serializers.CharField(
+        help_text=_("The newest version in the base repository version, null if added"),
+        allow_null=True,
+    )
+    version = serializers.CharField(
+        help_text=_("The newest version in the compared repository version, null if removed"),
+        allow_null=True,
+    )
+
+
+class RInstallPlanRequestSerializer(serializers.Serializer):
+    """
+    A Serializer for the packages an install plan is requested for.
+    """
+    lockfile = serializers.JSONField(
+        help_text=_("The contents of an renv.lock file, its packages are pinned to their "
+                    "locked versions."),
+        required=False,
+    )
+    packages = serializers.ListField(
+        child=serializers.CharField(),
+        help_text=_("Package requirements like 'Rcpp' or 'Rcpp (>= 1.0.10)'."),
+        required=False,
+    )
+
+    def validate(self, data):
+        requirements = {}
+        lockfile = data.get('lockfile')
+        if lockfile is not None:
+            locked = lockfile.get('Packages') if isinstance(lockfile, dict) else None
+            if not isinstance(locked, dict):
+                raise serializers.ValidationError(
+                    {'lockfile': _("The lockfile has no 'Packages' section.")}
+                )
+            invalid = []
+            for name, entry in locked.items():
+                version = entry.get('Version') if isinstance(entry, dict) else None
+                requirements[name] = f"== {version}" if version else None
+                if not self._valid_constraint(requirements[name]):
+                    invalid.append(name)
+            if invalid:
+                raise serializers.ValidationError({
+                    'lockfile': _("Invalid versions locked for: {names}").format(
+                        names=', '.join(invalid)
+                    )
+                })
+
+        for dependency in utils.parse_dependencies(', '.join(data.get('packages', []))):
+            constraint = dependency.get('version')
+            if not self._valid_constraint(constraint):
+                raise serializers.ValidationError({
+                    'packages': _("Invalid version constraint for {name}: {constraint}").format(
+                        name=dependency['package'], constraint=constraint
+                    )
+                })
+            requirements[dependency['package']] = constraint
+
+        if not requirements:
+            raise serializers.ValidationError(
+                _("Either a lockfile or a list of packages has to be provided.")
+            )
+        data['requirements'] = requirements
+        return data
+
+    @staticmethod
+    def _valid_constraint(constraint):
+        """Whether ``constraint`` is empty or can be resolved against package versions."""
+        if not constraint:
+            return True
+        try:
+            utils.version_constraint_q(constraint)
+        except ValueError:
+            return False
+        return True
+
+
+class RInstallPlanPackageSerializer(serializers.Serializer):
+    """
+    A Serializer for a package to install.
+    """
+    name = serializers.CharField(help_text=_("The name of the package"))
+    version = serializers.CharField(help_text=_("The resolved version of the package"))
+    url = serializers.CharField(help_text=_("The URL to download the package tarball from"))
+    md5sum = serializers.CharField(help_text=_("The MD5 checksum of the package tarball"))
+    sha256 = serializers.CharField(
+        help_text=_("The SHA256 checksum of the package tarball, null if not downloaded yet"),
+        allow_null=True,
+    )
+
+
+class RInstallPlanMissingSerializer(serializers.Serializer):
+    """
+    A Serializer for a requirement that could not be satisfied.
+    """
+    name = serializers.CharField(help_text=_("The name of the package"))
+    constraint = serializers.CharField(
+        help_text=_("The required version, null if any version would do"), allow_null=True
+    )
+
+
+class RInstallPlanSerializer(serializers.Serializer):
+    """
+    A Serializer for an install plan.
+    """
+    packages = RInstallPlanPackageSerializer(
+        many=True, help_text=_("The packages to install, dependencies first")
+    )
+    missing = RInstallPlanMissingSerializer(
+        many=True, help_text=_("Requirements not satisfied by the distributed packages")
+    )
+
+
+class RPackageCopySerializer(serializers.Serializer):
+    """
+    A Serializer for copying packages with their dependencies between repositories.
+    """
+    source_repository_version = platform.RepositoryVersionRelatedField(
+        help_text=_("The repository version to copy the packages from."),
+    )
+    packages = serializers.ListField(
+        child=serializers.CharField(),
+        help_text=_("Names of packages to copy the newest version of, or hrefs of package "
+                    "versions."),
+        allow_empty=False,
+    )
+    dependencies = serializers.BooleanField(
+        help_text=_("Also copy everything the packages depend on, import or link to."),
+        default=True,
+    )
+
+
+class RPackageImportSerializer(serializers.Serializer):
+    """
+    A Serializer for importing package tarballs from the filesystem of the Pulp server.
+    """
+    path = serializers.CharField(
+        help_text=_("The root of the tree, or its src/contrib directory, on the Pulp server. "
+                    "It has to be below one of the ALLOWED_IMPORT_PATHS."),
+    )
+    mirror = serializers.BooleanField(
+        help_text=_("Remove the packages that are not imported from the repository."),
+        default=False,
+    )
+    walk = serializers.BooleanField(
+        help_text=_("Import every <name>_<version>.tar.gz found below the path, reading the "
+                    "metadata from the DESCRIPTION files, instead of the packages listed in "
+                    "PACKAGES. Done anyway if there is no PACKAGES index."),
+        default=False,
+    )
+
+    def validate_path(self, value):
+        path = os.path.realpath(value)
+        allowed = (
+            os.path.realpath(allowed_path) for allowed_path in settings.ALLOWED_IMPORT_PATHS
+        )
+        if not any(path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+                   for root in allowed):
+            raise serializers.ValidationError(
+                _("{} is not below any of the ALLOWED_IMPORT_PATHS.").format(value)
+            )
+        if not os.path.isdir(path):
+            raise serializers.ValidationError(_("{} is not a directory.").format(value))
+        return path
+
+
 class RRemoteSerializer(platform.RemoteSerializer):
     """
     A Serializer for RRemote.
@@ -84,9 +383,15 @@ class RRepositorySerializer(platform.RepositorySerializer):
     """
     A Serializer for RRepository.
     """
+    retain_package_versions = serializers.IntegerField(
+        help_text=_("The number of versions of each package to keep in new repository versions, "
+                    "older ones are removed. 0 keeps all versions."),
+        min_value=0,
+        required=False,
+    )
 
     class Meta:
-        fields = platform.RepositorySerializer.Meta.fields
+        fields = platform.RepositorySerializer.Meta.fields + ('retain_package_versions',)
         model = models.RRepository
 
 class RPublicationSerializer(platform.PublicationSerializer):
@@ -117,10 +422,17 @@ class RDistributionSerializer(platform.DistributionSerializer):
         queryset=models.RPublication.objects.exclude(complete=False),
         allow_null=True,
     )
+    snapshots = serializers.BooleanField(
+        help_text=_("Also serve <base_path>/<YYYY-MM-DD>/... from the publication that was "
+                    "current for the repository on that date."),
+        default=False,
+    )
     packages_url = serializers.SerializerMethodField()
 
     class Meta:
-        fields = platform.DistributionSerializer.Meta.fields + ("publication", "packages_url")
+        fields = platform.DistributionSerializer.Meta.fields + (
+            "publication", "snapshots", "packages_url"
+        )
         model = models.RDistribution
 
     def get_packages_url(self, obj):
@@ -128,7 +440,16 @@ class RDistributionSerializer(platform.DistributionSerializer):
 
     def validate(self, data):
         try:
-            return super().validate(data)
+            data = super().validate(data)
         except Exception as e:
             logger.error(f"Validation error in RDistributionSerializer: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+        snapshots = data.get('snapshots', getattr(self.instance, 'snapshots', False))
+        repository = data.get('repository', getattr(self.instance, 'repository', None))
+        publication = data.get('publication', getattr(self.instance, 'publication', None))
+        if snapshots and not (repository or publication):
+            raise serializers.ValidationError(
+                _("Snapshots require either a repository or a publication to be set.")
+            )
+        return data
\ No newline at end of file
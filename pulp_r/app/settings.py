@@ -2,4 +2,37 @@ import socket
 
 PYTHON_GROUP_UPLOADS = False
 PYPI_API_HOSTNAME = 'https://' + socket.getfqdn()
-CONTENT_PATH_PREFIX = '/pulp/api/v3/content/'
\ No newline at end of file
+CONTENT_PATH_PREFIX = '/pulp/api/v3/content/'
+
+# Number of date -> publication resolutions kept in memory per content app process.
+R_SNAPSHOT_CACHE_SIZE = 4096
+
+# A new publication only stores its changes on top of the previous base publication while the
+# number of added and removed packages stays below this fraction of the base. 0 disables deltas.
+R_PUBLICATION_DELTA_MAX_RATIO = 0.25
+
+# Number of worker threads hashing package tarballs and reading their DESCRIPTION on ingest.
+R_INGEST_WORKERS = 4
+
+# Complete synced packages with Title, Description and URL from their tarballs after each sync.
+R_SYNC_ENRICH = False
+# Number of threads reading DESCRIPTION files and packages updated per batch when enriching.
+R_ENRICH_WORKERS = 4
+R_ENRICH_BATCH_SIZE = 500
+
+# Number of repository version dependency graphs kept in memory per API process.
+R_DEPENDENCY_INDEX_CACHE_SIZE = 16
+
+# Number of rows deleted per transaction by cleanup and delete tasks.
+R_DELETE_BATCH_SIZE = 1000
+
+# Profile sync and publish tasks: 'cprofile' writes a pstats file, 'tracemalloc' a memory
+# snapshot per task to R_TASK_PROFILE_DIR (the temporary directory if unset).
+R_TASK_PROFILE = None
+R_TASK_PROFILE_DIR = None
+
+# Hardlink package tarballs imported from the local filesystem into artifact storage instead of
+# reflinking them where supported, else copying them. Linked files are the same files as those
+# of the source tree: storage changes their mode, and modifying the tree in place, e.g. with
+# rsync --inplace, corrupts the artifacts.
+R_IMPORT_HARDLINKS = False
@@ -1,2 +1,7 @@
-from .publishing import publish  # noqa
+from .cleanup import cleanup_publications, delete_publication, delete_repository  # noqa
+from .copying import copy_packages  # noqa
+from .enriching import enrich_packages  # noqa
+from .importing import import_packages  # noqa
+from .publishing import publish, publish_pending, schedule_publish  # noqa
 from .synchronizing import synchronize  # noqa
+from .uploading import upload_packages  # noqa
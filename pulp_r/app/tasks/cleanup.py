@@ -0,0 +1,215 @@
+import logging
+from datetime import timedelta
+from gettext import gettext as _
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from pulpcore.plugin.models import (
+    Artifact,
+    ContentArtifact,
+    Distribution,
+    ProgressReport,
+    PublishedArtifact,
+)
+
+from pulp_r.app.models import (
+    MetadataContent,
+    RPackageRepositoryVersion,
+    RPublication,
+    RPublicationSnapshot,
+    RRepository,
+)
+
+log = logging.getLogger(__name__)
+
+
+def delete_in_batches(queryset, progress_report=None):
+    """
+    Delete the rows of ``queryset`` in batches of ``R_DELETE_BATCH_SIZE``.
+
+    Every batch is deleted in its own short transaction, so locks are only held briefly and
+    concurrent tasks are not blocked by one large delete.
+
+    Returns:
+        The number of deleted rows of the queryset's model.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.values_list('pk', flat=True)[:settings.R_DELETE_BATCH_SIZE])
+            if not pks:
+                return deleted
+            model.objects.filter(pk__in=pks).delete()
+        deleted += len(pks)
+        if progress_report is not None:
+            progress_report.increase_by(len(pks))
+
+
+def _delete_publication(publication, deleted=None, progress_report=None):
+    """
+    Delete a publication, removing its PublishedArtifacts in batches first.
+
+    It is marked as ``deleting`` first, so no new publication is layered on it. Its deltas are
+    rebased while its rows still exist, except those matched by ``deleted`` because they are
+    going to be deleted as well.
+    """
+    RPublication.objects.filter(pk=publication.pk).update(deleting=True)
+    publication.rebase_deltas(exclude=deleted)
+    delete_in_batches(PublishedArtifact.objects.filter(publication=publication), progress_report)
+    with transaction.atomic():
+        RPublication.objects.filter(pk=publication.pk).delete()
+
+
+def delete_publications(publications, progress_report=None):
+    """
+    Delete publications, removing their PublishedArtifacts in batches first.
+
+    Deltas are deleted before the bases they are layered on, so no delta of the set is rebased.
+    """
+    deleted = Q(pk__in=publications.values('pk'))
+    publications.update(deleting=True)
+    ordered = publications.order_by(F('base_id').asc(nulls_last=True), 'pulp_created')
+    for publication in list(ordered.only('pk', 'base_id')):
+        _delete_publication(publication, deleted)
+        if progress_report is not None:
+            progress_report.increment()
+
+
+def delete_publication(publication_pk):
+    """
+    Delete a publication in batches of ``R_DELETE_BATCH_SIZE`` PublishedArtifacts.
+
+    Args:
+        publication_pk (str): The publication to delete.
+    """
+    publication = RPublication.objects.get(pk=publication_pk)
+    with ProgressReport(
+        message=_("Deleting published artifacts"),
+        code="delete.published_artifacts",
+        total=PublishedArtifact.objects.filter(publication=publication).count(),
+    ) as progress_report:
+        _delete_publication(publication, progress_report=progress_report)
+
+
+def delete_repository(repository_pk):
+    """
+    Delete a repository, removing the rows of its publications and package lists in batches.
+
+    Publications and the ``RPackageRepositoryVersion`` rows of the versions are deleted in
+    batches of ``R_DELETE_BATCH_SIZE`` rows, each in its own transaction. The repository is then
+    deleted like pulpcore does, which deletes its versions and their content with it.
+
+    Args:
+        repository_pk (str): The repository to delete.
+    """
+    repository = RRepository.objects.get(pk=repository_pk)
+    publications = RPublication.objects.filter(repository_version__repository=repository)
+    with ProgressReport(
+        message=_("Deleting publications"),
+        code="delete.publications",
+        total=publications.count(),
+    ) as progress_report:
+        delete_publications(publications, progress_report)
+
+    package_versions = RPackageRepositoryVersion.objects.filter(
+        repository_version__repository=repository
+    )
+    with ProgressReport(
+        message=_("Deleting repository package lists"),
+        code="delete.package_versions",
+        total=package_versions.count(),
+    ) as progress_report:
+        delete_in_batches(package_versions, progress_report)
+
+    repository.delete()
+
+
+def retained_publication_ids(repository_pk=None):
+    """
+    Return the pks of the publications that are still needed.
+
+    Those are the latest publication of each repository, the publications served by a
+    distribution or recorded as a date snapshot, and the bases these are layered on.
+    """
+    publications = RPublication.objects.filter(complete=True)
+    if repository_pk:
+        publications = publications.filter(repository_version__repository_id=repository_pk)
+
+    retained = set(
+        publications.order_by(
+            'repository_version__repository_id', '-repository_version__number', '-pulp_created'
+        )
+        .distinct('repository_version__repository_id')
+        .values_list('pk', flat=True)
+    )
+    retained.update(
+        Distribution.objects.filter(publication__isnull=False).values_list(
+            'publication_id', flat=True
+        )
+    )
+    retained.update(RPublicationSnapshot.objects.values_list('publication_id', flat=True))
+    retained.update(
+        RPublication.objects.filter(pk__in=retained, base__isnull=False).values_list(
+            'base_id', flat=True
+        )
+    )
+    return retained
+
+
+def cleanup_publications(repository_pk=None):
+    """
+    Delete superseded publications and the PACKAGES indexes no publication serves anymore.
+
+    Publications that are not retained (see ``retained_publication_ids``) are deleted with
+    their PublishedArtifacts. Then MetadataContent that is not published anymore is deleted
+    with its ContentArtifacts, and finally the Artifacts of those PACKAGES files. MetadataContent
+    younger than ``ORPHAN_PROTECTION_TIME`` is left alone, it may belong to a running publish.
+
+    Args:
+        repository_pk (str): Only delete superseded publications of this repository. Orphaned
+            PACKAGES indexes are always cleaned up for all repositories.
+    """
+    publications = RPublication.objects.filter(complete=True).exclude(
+        pk__in=retained_publication_ids(repository_pk)
+    )
+    if repository_pk:
+        publications = publications.filter(repository_version__repository_id=repository_pk)
+
+    with ProgressReport(
+        message=_("Deleting superseded publications"),
+        code="cleanup.publications",
+        total=publications.count(),
+    ) as progress_report:
+        delete_publications(publications, progress_report)
+
+    protected_since = timezone.now() - timedelta(minutes=settings.ORPHAN_PROTECTION_TIME)
+    orphans = MetadataContent.objects.filter(pulp_created__lt=protected_since).exclude(
+        Exists(PublishedArtifact.objects.filter(content_artifact__content_id=OuterRef('pk')))
+    )
+    artifact_pks = set(
+        ContentArtifact.objects.filter(content__in=orphans, artifact__isnull=False).values_list(
+            'artifact_id', flat=True
+        )
+    )
+    with ProgressReport(
+        message=_("Deleting unpublished PACKAGES indexes"),
+        code="cleanup.metadata",
+        total=orphans.count(),
+    ) as progress_report:
+        delete_in_batches(orphans, progress_report)
+
+    artifacts = Artifact.objects.filter(pk__in=artifact_pks).exclude(
+        Exists(ContentArtifact.objects.filter(artifact_id=OuterRef('pk')))
+    )
+    with ProgressReport(
+        message=_("Deleting unused PACKAGES files"),
+        code="cleanup.artifacts",
+        total=artifacts.count(),
+    ) as progress_report:
+        # Deleted one by one so that their files are removed from storage as well
+        for artifact in artifacts.iterator(chunk_size=settings.R_DELETE_BATCH_SIZE):
+            artifact.delete()
+            progress_report.increment()
@@ -0,0 +1,86 @@
+import logging
+from gettext import gettext as _
+
+from django.db import connection
+from pulpcore.plugin.models import RepositoryVersion
+
+from pulp_r.app.models import RPackage, RRepository, newest_packages
+
+log = logging.getLogger(__name__)
+
+
+def dependency_closure(repository_version, package_pks):
+    """
+    Return the pks of packages and everything they depend on, import or link to.
+
+    The closure is computed in one recursive query. Dependencies resolve to the newest version
+    of the package in ``repository_version``, dependencies it does not contain are skipped.
+
+    Args:
+        repository_version (RepositoryVersion): The version to resolve dependencies in.
+        package_pks (list): The pks of the packages to start from.
+
+    Returns:
+        A set of package pks, including ``package_pks``.
+    """
+    newest_sql, newest_params = (
+        newest_packages(repository_version).values('pk', 'name').query.sql_with_params()
+    )
+    table = RPackage._meta.db_table
+    sql = f"""
+        WITH RECURSIVE newest AS ({newest_sql}),
+        closure (pk) AS (
+            SELECT unnest(%s::uuid[])
+            UNION
+            SELECT newest.content_ptr_id
+            FROM closure
+            JOIN {table} AS package ON package.content_ptr_id = closure.pk
+            CROSS JOIN LATERAL jsonb_array_elements(
+                package.depends || package.imports || package.linking_to
+            ) AS dependency
+            JOIN newest ON newest.name = dependency->>'package'
+        )
+        SELECT pk FROM closure
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*newest_params, [str(pk) for pk in package_pks]))
+        return {row[0] for row in cursor.fetchall()}
+
+
+def copy_packages(source_version_pk, repository_pk, names=(), package_pks=(), dependencies=True):
+    """
+    Copy packages with their dependencies from a repository version into a repository.
+
+    Args:
+        source_version_pk (str): The repository version to copy from.
+        repository_pk (str): The repository to copy into.
+        names (list): Names of packages to copy the newest version of.
+        package_pks (list): Pks of package versions to copy.
+        dependencies (bool): Whether to copy the dependencies of the packages as well.
+    """
+    source_version = RepositoryVersion.objects.get(pk=source_version_pk)
+    repository = RRepository.objects.get(pk=repository_pk)
+
+    seeds = set(
+        newest_packages(source_version).filter(name__in=names).values_list('pk', flat=True)
+    )
+    seeds.update(
+        RPackage.objects.filter(pk__in=package_pks)
+        .filter(pk__in=source_version.content)
+        .values_list('pk', flat=True)
+    )
+    if len(seeds) < len(names) + len(package_pks):
+        log.warning(_("Some of the requested packages are not in the source repository version."))
+
+    pks = dependency_closure(source_version, seeds) if dependencies and seeds else seeds
+    packages = RPackage.objects.filter(pk__in=pks).exclude(
+        pk__in=repository.latest_version().content
+    )
+    new = packages.count()
+    with repository.new_version() as new_version:
+        new_version.add_content(packages)
+    log.info(
+        _("Copied {total} packages into {repository}, {new} of them were not in it yet").format(
+            total=len(pks), repository=repository.name, new=new
+        )
+    )
@@ -0,0 +1,79 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from gettext import gettext as _
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from pulpcore.plugin.models import ContentArtifact, ProgressReport, RepositoryVersion
+
+from pulp_r.app.models import RPackage
+from pulp_r.app.utils import read_description
+
+log = logging.getLogger(__name__)
+
+ENRICHED_FIELDS = {
+    'summary': 'Title',
+    'description': 'Description',
+    'url': 'URL',
+}
+
+
+def _read_missing_fields(file_name):
+    """
+    Read the fields missing from PACKAGES out of a stored package tarball.
+
+    Runs in a worker thread and must not touch the database.
+    """
+    try:
+        with default_storage.open(file_name, 'rb') as fp:
+            description = read_description(fp)
+    except ValueError as e:
+        log.warning(_("Unable to read the DESCRIPTION of {}: {}").format(file_name, e))
+        return None
+    return {field: description.get(dcf_field, '') for field, dcf_field in ENRICHED_FIELDS.items()}
+
+
+def enrich_packages(repository_version_pk=None):
+    """
+    Fill in the metadata missing from PACKAGES using the DESCRIPTION of downloaded tarballs.
+
+    Only packages not enriched yet and whose tarball has been downloaded are handled, so the
+    task can be run again to pick up the remaining ones, e.g. after on_demand content has been
+    downloaded. Tarballs are read by a pool of threads and the results written back with bulk
+    updates per batch. Packages whose DESCRIPTION cannot be read are not marked as enriched,
+    so the next run tries them again.
+
+    Args:
+        repository_version_pk (str): Restrict enrichment to the packages in this version.
+    """
+    packages = RPackage.objects.filter(enriched=False)
+    if repository_version_pk:
+        repository_version = RepositoryVersion.objects.get(pk=repository_version_pk)
+        packages = packages.filter(pk__in=repository_version.content)
+
+    files = list(
+        ContentArtifact.objects.filter(content__in=packages, artifact__isnull=False)
+        .values_list('content_id', 'artifact__file')
+    )
+    batch_size = settings.R_ENRICH_BATCH_SIZE
+
+    with ProgressReport(
+        message=_("Reading package descriptions"),
+        code="enriching.descriptions",
+        total=len(files),
+    ) as progress_report, ThreadPoolExecutor(max_workers=settings.R_ENRICH_WORKERS) as executor:
+        for i in range(0, len(files), batch_size):
+            batch = dict(files[i:i + batch_size])
+            results = dict(zip(batch, executor.map(_read_missing_fields, batch.values())))
+
+            updated = []
+            for package in RPackage.objects.filter(
+                pk__in=[pk for pk, fields in results.items() if fields is not None]
+            ).only('pk', *ENRICHED_FIELDS):
+                for field, value in results[package.pk].items():
+                    if value and not getattr(package, field):
+                        setattr(package, field, value)
+                package.enriched = True
+                updated.append(package)
+            RPackage.objects.bulk_update(updated, [*ENRICHED_FIELDS, 'enriched'])
+            progress_report.increase_by(len(batch))
@@ -0,0 +1,225 @@
+import errno
+import fcntl
+import gzip
+import logging
+import os
+import re
+import tempfile
+from gettext import gettext as _
+
+from django.conf import settings
+from pulpcore.plugin.models import Artifact, ProgressReport
+
+from pulp_r.app.metrics import TaskTimings
+from pulp_r.app.models import RPackage, RRepository
+from pulp_r.app.profiling import profiled
+from pulp_r.app.tasks.publishing import schedule_publish
+from pulp_r.app.tasks.uploading import BATCH_SIZE, hash_file, ingest
+from pulp_r.app.utils import iter_dcf, read_description
+
+log = logging.getLogger(__name__)
+
+# File names of R source packages, e.g. Rcpp_1.0.12.tar.gz
+TARBALL_RE = re.compile(r'^[A-Za-z][A-Za-z0-9.]*_[0-9][0-9.-]*\.tar\.gz$')
+
+# ioctl cloning a whole file on filesystems with copy-on-write extents, like btrfs and XFS
+FICLONE = 0x40049409
+
+
+def reflink(source, destination):
+    """
+    Create ``destination`` as a copy-on-write clone of ``source``.
+
+    Raises:
+        OSError: If the filesystem cannot clone files, or the two paths are on different ones.
+    """
+    with open(source, 'rb') as src, open(destination, 'xb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            os.unlink(destination)
+            raise
+
+
+def link_file(source, directory):
+    """
+    Give ``source`` a new name in ``directory`` without copying its data.
+
+    A reflink is tried, or first a hardlink if ``R_IMPORT_HARDLINKS`` is enabled. A hardlink
+    is the source file itself, storing it changes the mode of the source.
+
+    Returns:
+        The new path, or None if neither works, e.g. across filesystems.
+    """
+    with tempfile.NamedTemporaryFile(dir=directory, suffix='.tar.gz', delete=False) as fp:
+        destination = fp.name
+    os.unlink(destination)
+
+    if settings.R_IMPORT_HARDLINKS:
+        try:
+            os.link(source, destination)
+            return destination
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+    try:
+        reflink(source, destination)
+        return destination
+    except OSError:
+        return None
+
+
+def _ingest_local_file(path, directory):
+    """
+    Link or copy a tarball on the local filesystem, hash it and read its DESCRIPTION.
+
+    The Artifact file is linked into ``directory`` when possible, saving the Artifact
+    then moves the link into storage, so the data is not copied if both are on a filesystem
+    with reflinks, like the tarball. Runs in a worker thread and must not touch the database.
+    """
+    local_path = link_file(path, directory)
+    if local_path is None:
+        with open(path, 'rb') as source:
+            with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as local_file:
+                size, digests = hash_file(source, local_file)
+        local_path = local_file.name
+    else:
+        with open(local_path, 'rb') as source:
+            size, digests = hash_file(source)
+    try:
+        with open(local_path, 'rb') as fp:
+            description = read_description(fp)
+    except ValueError:
+        os.unlink(local_path)
+        raise
+    md5sum = digests.pop('md5sum')
+    artifact = Artifact(file=local_path, size=size, **digests)
+    return artifact, description, md5sum
+
+
+def contrib_directory(path):
+    """
+    Return the directory holding the package tarballs of a CRAN-like tree at ``path``.
+    """
+    contrib = os.path.join(path, 'src', 'contrib')
+    return contrib if os.path.isdir(contrib) else path
+
+
+def read_index(contrib):
+    """
+    Read the stanzas of the ``PACKAGES.gz`` or ``PACKAGES`` file in ``contrib``.
+
+    Raises:
+        FileNotFoundError: If there is no index.
+    """
+    gzipped = os.path.join(contrib, 'PACKAGES.gz')
+    if os.path.exists(gzipped):
+        with gzip.open(gzipped, 'rt', encoding='utf-8', errors='replace') as fp:
+            return list(iter_dcf(fp))
+    with open(os.path.join(contrib, 'PACKAGES'), encoding='utf-8', errors='replace') as fp:
+        return list(iter_dcf(fp))
+
+
+def indexed_files(contrib):
+    """
+    Return the paths of the tarballs listed in the index of ``contrib`` that exist.
+
+    Tarballs are looked up relative to the ``Path`` of their stanza, paths leaving ``contrib``
+    are ignored.
+    """
+    root = os.path.realpath(contrib)
+    paths = []
+    for stanza in read_index(contrib):
+        if 'Package' not in stanza or 'Version' not in stanza:
+            continue
+        file_name = f"{stanza['Package']}_{stanza['Version']}.tar.gz"
+        path = os.path.realpath(os.path.join(root, stanza.get('Path', ''), file_name))
+        if not path.startswith(root + os.sep):
+            log.warning(_("Ignoring {} outside of the imported tree.").format(path))
+        elif not os.path.isfile(path):
+            log.warning(_("Ignoring {} listed in PACKAGES but missing.").format(path))
+        else:
+            paths.append(path)
+    return paths
+
+
+def walk_files(path):
+    """
+    Return the paths of all package tarballs below ``path``, like ``<name>_<version>.tar.gz``.
+
+    Symlinked directories are not followed, symlinked files leaving ``path`` are ignored.
+    """
+    root = os.path.realpath(path)
+    paths = []
+    for directory, directories, files in os.walk(root):
+        directories.sort()
+        for name in sorted(files):
+            if not TARBALL_RE.match(name):
+                continue
+            file_path = os.path.realpath(os.path.join(directory, name))
+            if file_path.startswith(root + os.sep) and os.path.isfile(file_path):
+                paths.append(file_path)
+    return paths
+
+
+def import_files(repository, paths, mirror, timings):
+    """
+    Ingest package tarballs from the local filesystem into a new version of ``repository``.
+
+    Tarballs are ingested in batches, hashed in parallel by ``R_INGEST_WORKERS`` threads.
+    Tarballs without a valid DESCRIPTION are logged and skipped.
+    """
+    packages = []
+    with ProgressReport(
+        message=_("Importing R packages"), code='import.packages', total=len(paths)
+    ) as progress_report:
+        for i in range(0, len(paths), BATCH_SIZE):
+            with timings.timer('ingest'):
+                batch, created = ingest(
+                    paths[i:i + BATCH_SIZE], _ingest_local_file, skip_invalid=True
+                )
+            packages.extend(batch)
+            timings.count('created', len(created))
+            progress_report.increase_by(len(paths[i:i + BATCH_SIZE]))
+    timings.count('packages', len(packages))
+
+    with timings.timer('new_version'), repository.new_version() as new_version:
+        if mirror:
+            new_version.remove_content(new_version.content.exclude(pk__in=[p.pk for p in packages]))
+        new_version.add_content(RPackage.objects.filter(pk__in=[p.pk for p in packages]))
+    return new_version
+
+
+@profiled
+def import_packages(repository_pk, path, mirror=False, walk=False):
+    """
+    Import package tarballs from the local filesystem into a new repository version.
+
+    By default the packages listed in the ``PACKAGES`` index of a CRAN-like tree are read
+    straight from disk, e.g. from an rsync'd mirror on an air-gapped site. With ``walk``, or if
+    there is no index, every ``<name>_<version>.tar.gz`` below ``path`` is imported instead, as
+    kept in drat or miniCRAN directories whose index may be stale. Tarballs without a valid
+    ``DESCRIPTION`` are skipped either way. The new version is published.
+
+    Args:
+        repository_pk (str): The repository to import into.
+        path (str): The root of the tree, or its ``src/contrib`` directory.
+        mirror (bool): True to remove the packages that are not imported from the repository.
+        walk (bool): True to import every tarball found instead of the indexed ones.
+    """
+    repository = RRepository.objects.get(pk=repository_pk)
+    timings = TaskTimings('import')
+    contrib = contrib_directory(path)
+    if not walk and not any(
+        os.path.exists(os.path.join(contrib, name)) for name in ('PACKAGES.gz', 'PACKAGES')
+    ):
+        log.info(_("No PACKAGES index in {}, importing all tarballs found.").format(contrib))
+        walk = True
+
+    with timings.timer('list_files'):
+        paths = walk_files(path) if walk else indexed_files(contrib)
+    log.info(_("Importing {count} packages from {path}").format(count=len(paths), path=path))
+
+    import_files(repository, paths, mirror, timings)
+    timings.record()
+    schedule_publish(repository)
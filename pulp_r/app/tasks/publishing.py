@@ -3,20 +3,36 @@ import json
 import logging
 import os
 import tempfile
+from itertools import islice
 from gettext import gettext as _
 
-from django.db import IntegrityError
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from pulpcore.plugin.constants import TASK_FINAL_STATES
 from pulpcore.plugin.models import (
     Artifact,
     ContentArtifact,
     PublishedArtifact,
     RepositoryVersion,
 )
+from pulpcore.plugin.tasking import dispatch
 
-from pulp_r.app.models import MetadataContent, RPublication
+from pulp_r.app.metrics import TaskTimings
+from pulp_r.app.models import (
+    LAYER_BATCH_SIZE,
+    MetadataContent,
+    RPackage,
+    RPublication,
+    RPublicationRemovedPath,
+    RPublicationSnapshot,
+    RRepository,
+)
+from pulp_r.app.profiling import profiled
 
 log = logging.getLogger(__name__)
 
+
 def format_dependencies(deps):
     """
     Format dependencies list as a comma-separated string.
@@ -33,38 +49,138 @@ def format_dependencies(deps):
         for dep in deps
     )
 
-def generate_packages_file_content(repository_version):
-    """
-    Generate the content for the PACKAGES file based on the repository version.
-    """
-    packages_content = ""
-    content_artifacts = list(ContentArtifact.objects.filter(
-        content__pk__in=repository_version.content.values_list('pk', flat=True)
-    ))
-
-    # Sort content_artifacts based on the name of the package
-    content_artifacts.sort(key=lambda ca: ca.content.cast().name)
-
-    for content_artifact in content_artifacts:
-        package = content_artifact.content.cast()
-        package_entry = f"Package: {package.name}\nVersion: {package.version}\n"
-        
-        if package.depends and json.loads(package.depends):
-            package_entry += f"Depends: {format_dependencies(package.depends)}\n"
-        if package.imports and json.loads(package.imports):
-            package_entry += f"Imports: {format_dependencies(package.imports)}\n"
-        if package.suggests and json.loads(package.suggests):
-            package_entry += f"Suggests: {format_dependencies(package.suggests)}\n"
-        
-        package_entry += (
-            f"License: {package.license}\n"
-            f"MD5sum: {package.md5sum}\n"
-            f"NeedsCompilation: {'yes' if package.needs_compilation else 'no'}\n\n"
+
+def format_stanza(name, version, depends, imports, linking_to, suggests, license, md5sum,
+                  needs_compilation):
+    """
+    Format the PACKAGES stanza of a package from the fields of ``PACKAGES_FIELDS``.
+    """
+    stanza = f"Package: {name}\nVersion: {version}\n"
+
+    for field, dependencies in (
+        ('Depends', depends),
+        ('Imports', imports),
+        ('LinkingTo', linking_to),
+        ('Suggests', suggests),
+    ):
+        formatted = format_dependencies(dependencies)
+        if formatted:
+            stanza += f"{field}: {formatted}\n"
+
+    stanza += (
+        f"License: {license}\n"
+        f"MD5sum: {md5sum}\n"
+        f"NeedsCompilation: {'yes' if needs_compilation else 'no'}\n"
+    )
+    return stanza
+
+
+PACKAGES_FIELDS = (
+    'name', 'version', 'depends', 'imports', 'linking_to', 'suggests', 'license', 'md5sum',
+    'needs_compilation',
+)
+
+
+def write_packages_file(repository_version, fileobj, timings=None):
+    """
+    Write the PACKAGES index of ``repository_version`` to the binary file object ``fileobj``.
+
+    The stanza fields of all packages are read in one query, streamed and written
+    ``LAYER_BATCH_SIZE`` stanzas at a time, so memory use does not grow with the repository.
+
+    Args:
+        repository_version (RepositoryVersion): The repository version to index.
+        fileobj: The binary file object, e.g. a ``GzipFile``.
+        timings (TaskTimings): Collects the time spent in the query, rendering and writing.
+    """
+    timings = timings or TaskTimings('publish')
+    rows = (
+        RPackage.objects.filter(pk__in=repository_version.content)
+        .order_by('name', 'version_key')
+        .values_list(*PACKAGES_FIELDS)
+        .iterator(chunk_size=LAYER_BATCH_SIZE)
+    )
+    separator = b''
+    while True:
+        with timings.timer('stanza_query'):
+            batch = list(islice(rows, LAYER_BATCH_SIZE))
+        if not batch:
+            break
+        with timings.timer('render'):
+            data = "\n".join(format_stanza(*row) for row in batch).encode('utf-8')
+        with timings.timer('compress'):
+            fileobj.write(separator + data)
+        separator = b'\n'
+        timings.count('stanzas', len(batch))
+
+
+def find_delta_base(repository_version):
+    """
+    Find the full publication that a new publication of ``repository_version`` can be layered on.
+
+    The base is the one of the latest earlier publication of the repository. Returns None, so
+    that a full publication is created, if there is no such publication, if its base is being
+    deleted or if the churn since the base exceeds ``R_PUBLICATION_DELTA_MAX_RATIO`` of its size.
+    """
+    max_ratio = settings.R_PUBLICATION_DELTA_MAX_RATIO
+    if max_ratio <= 0:
+        return None
+
+    previous = (
+        RPublication.objects.filter(
+            complete=True,
+            deleting=False,
+            repository_version__repository_id=repository_version.repository_id,
+            repository_version__number__lte=repository_version.number,
         )
-        packages_content += package_entry
+        .select_related('base__repository_version', 'repository_version')
+        .order_by('-repository_version__number', '-pulp_created')
+        .first()
+    )
+    if previous is None:
+        return None
+    base = previous.base or previous
+    if base.deleting:
+        return None
+
+    base_size = PublishedArtifact.objects.filter(publication=base).count()
+    churn = (
+        repository_version.added(base_version=base.repository_version).count()
+        + repository_version.removed(base_version=base.repository_version).count()
+    )
+    if churn > max_ratio * base_size:
+        return None
+    return base
 
-    return packages_content.strip()
 
+def record_snapshot(publication):
+    """
+    Record ``publication`` as the current publication of its repository for today.
+
+    A publication of an older repository version does not replace one of a newer version that
+    was already recorded for the same day.
+    """
+    repository_version = publication.repository_version
+    today = timezone.now().date()
+    with transaction.atomic():
+        snapshot = (
+            RPublicationSnapshot.objects.select_for_update()
+            .select_related('publication__repository_version')
+            .filter(repository_id=repository_version.repository_id, date=today)
+            .first()
+        )
+        if snapshot is None:
+            RPublicationSnapshot.objects.create(
+                repository_id=repository_version.repository_id,
+                date=today,
+                publication=publication,
+            )
+        elif snapshot.publication.repository_version.number <= repository_version.number:
+            snapshot.publication = publication
+            snapshot.save(update_fields=['publication'])
+
+
+@profiled
 def publish(repository_version_pk):
     """
     Create a Publication based on a RepositoryVersion.
@@ -80,39 +196,73 @@ def publish(repository_version_pk):
         )
     )
 
+    timings = TaskTimings('publish')
     with RPublication.create(repository_version) as publication:
-        # Get all content artifacts associated with the repository version
-        content_artifacts = ContentArtifact.objects.filter(
-            content__pk__in=repository_version.content.values_list('pk', flat=True)
-        )
-
-        # Create PublishedArtifacts for each ContentArtifact
-        published_artifacts = []
-        for content_artifact in content_artifacts:
-            # Published Artifacts are served at path: <CONTENT_PATH_PREFIX>/<distribution_path>/<relative_path>
-            published_artifact = PublishedArtifact(
-                relative_path=content_artifact.relative_path,
-                publication=publication,
-                content_artifact=content_artifact
+        with timings.timer('find_base'):
+            base = find_delta_base(repository_version)
+        if base is None:
+            # Get all content artifacts associated with the repository version
+            content_artifacts = ContentArtifact.objects.filter(
+                content__pk__in=repository_version.content.values_list('pk', flat=True)
+            )
+        else:
+            # Only publish what changed since the base publication
+            publication.base = base
+            publication.save(update_fields=['base'])
+            content_artifacts = ContentArtifact.objects.filter(
+                content__pk__in=repository_version.added(
+                    base_version=base.repository_version
+                ).values_list('pk', flat=True)
+            )
+            removed_paths = (
+                ContentArtifact.objects.filter(
+                    content__pk__in=repository_version.removed(
+                        base_version=base.repository_version
+                    ).values_list('pk', flat=True)
+                )
+                .exclude(relative_path__in=content_artifacts.values('relative_path'))
+                .values_list('relative_path', flat=True)
+                .distinct()
+            )
+            RPublicationRemovedPath.objects.bulk_create(
+                [
+                    RPublicationRemovedPath(publication=publication, relative_path=path)
+                    for path in removed_paths
+                ],
+                batch_size=LAYER_BATCH_SIZE,
             )
-            published_artifacts.append(published_artifact)
-
-        # Bulk create the PublishedArtifacts
-        PublishedArtifact.objects.bulk_create(published_artifacts)
 
-        # Generate the PACKAGES file content
-        packages_content = generate_packages_file_content(repository_version)
+        # Create PublishedArtifacts for each ContentArtifact, a batch at a time
+        rows = content_artifacts.values_list('pk', 'relative_path').iterator(
+            chunk_size=LAYER_BATCH_SIZE
+        )
+        while True:
+            with timings.timer('query'):
+                batch = list(islice(rows, LAYER_BATCH_SIZE))
+            if not batch:
+                break
+            # Published Artifacts are served at path: <CONTENT_PATH_PREFIX>/<distribution_path>/<relative_path>
+            with timings.timer('published_artifacts'):
+                PublishedArtifact.objects.bulk_create(
+                    PublishedArtifact(
+                        relative_path=relative_path,
+                        publication=publication,
+                        content_artifact_id=content_artifact_pk,
+                    )
+                    for content_artifact_pk, relative_path in batch
+                )
+            timings.count('published_artifacts', len(batch))
 
         # Save the compressed PACKAGES file
         metadata_file_path = 'PACKAGES'
         try:
             with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                with gzip.open(temp_file.name, 'wb') as gzip_file:
-                    gzip_file.write(packages_content.encode('utf-8'))
+                with gzip.GzipFile(fileobj=temp_file, mode='wb') as gzip_file:
+                    write_packages_file(repository_version, gzip_file, timings)
                 temp_file_path = temp_file.name
 
             # Create a new Artifact for the PACKAGES file
-            with open(temp_file_path, 'rb') as temp_file:
+            with timings.timer('artifact_save'), open(temp_file_path, 'rb') as temp_file:
                 artifact = Artifact.init_and_validate(temp_file_path)
                 artifact.save()
 
@@ -154,4 +304,59 @@ def publish(repository_version_pk):
         except Exception as e:
             log.error(f"Error creating PublishedMetadata for {metadata_file_path}: {str(e)}")
 
+    record_snapshot(publication)
+    timings.record()
     log.info(_("Publication: {publication} created").format(publication=publication.pk))
+
+
+def schedule_publish(repository):
+    """
+    Request a publication of the latest version of ``repository``.
+
+    Requests are coalesced: at most one ``publish_pending`` task is queued or running per
+    repository and every request reuses it. Uploads of a burst queue up behind each other, so
+    the task only runs once the burst is done and publishes it as a whole.
+
+    Returns:
+        The task that will publish the requested version.
+    """
+    with transaction.atomic():
+        repository = RRepository.objects.select_for_update().get(pk=repository.pk)
+        repository.publish_requested_at = timezone.now()
+        task = repository.publish_task
+        if task is None or task.state in TASK_FINAL_STATES:
+            task = dispatch(
+                publish_pending,
+                shared_resources=[repository],
+                kwargs={'repository_pk': str(repository.pk)},
+            )
+            repository.publish_task = task
+        repository.save(update_fields=['publish_requested_at', 'publish_task'])
+    return task
+
+
+def publish_pending(repository_pk):
+    """
+    Publish the latest version of a repository until no publish request is left.
+
+    A request that arrives while publishing finds this task still running and relies on it, so
+    the newer version is published by another round of this task rather than by a new one.
+
+    Args:
+        repository_pk (str): The repository to publish.
+    """
+    while True:
+        started = timezone.now()
+        latest_version = RRepository.objects.get(pk=repository_pk).latest_version()
+        already_published = RPublication.objects.filter(
+            repository_version=latest_version, complete=True
+        ).exists()
+        if not already_published:
+            publish(latest_version.pk)
+
+        with transaction.atomic():
+            repository = RRepository.objects.select_for_update().get(pk=repository_pk)
+            if repository.publish_requested_at <= started:
+                repository.publish_task = None
+                repository.save(update_fields=['publish_task'])
+                return
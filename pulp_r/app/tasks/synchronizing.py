@@ -1,36 +1,41 @@
-import asyncio
 import gzip
-import hashlib
-import json
 import logging
-import os
-import shutil
-import tempfile
 from gettext import gettext as _
 
-import httpx
-from asgiref.sync import sync_to_async
-from django.db.models import Q
+from django.conf import settings
 from pulpcore.plugin.models import (
     Artifact,
     ContentArtifact,
     ProgressReport,
     Remote,
-    RemoteArtifact,
 )
 from pulpcore.plugin.stages import (
+    ArtifactDownloader,
+    ArtifactSaver,
+    ContentSaver,
     DeclarativeArtifact,
     DeclarativeContent,
     DeclarativeVersion,
+    QueryExistingArtifacts,
+    QueryExistingContents,
+    RemoteArtifactSaver,
     Stage,
 )
+from pulpcore.plugin.tasking import dispatch
 
-from pulp_r.app.models import RPackage, RRemote, RRepository
+from pulp_r.app.metrics import TaskTimings
+from pulp_r.app.models import RPackage, RRemote, RRepository, bulk_create_packages
+from pulp_r.app.profiling import profiled
+from pulp_r.app.tasks.enriching import enrich_packages
+from pulp_r.app.utils import iter_dcf, package_fields
 
 log = logging.getLogger(__name__)
 
-CHUNK_SIZE = 50
+# Number of emitted packages per progress report update
+PROGRESS_BATCH_SIZE = 500
 
+
+@profiled
 def synchronize(remote_pk, repository_pk, mirror):
     """
     Sync content from the remote repository.
@@ -54,262 +59,233 @@ def synchronize(remote_pk, repository_pk, mirror):
     # Interpret policy to download Artifacts or not
     deferred_download = remote.policy != Remote.IMMEDIATE
 
-    first_stage = RFirstStage(remote, deferred_download)
+    timings = TaskTimings('sync')
+    first_stage = RFirstStage(remote, deferred_download, timings)
     # Run pipeline and create a new repository version with the content units associated
-    DeclarativeVersion(first_stage, repository, mirror=mirror).create()
-
-async def fetch_and_calculate_checksums(url):
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            response.raise_for_status()  # Raises an exception for 4xx/5xx responses
-
-            data = response.content
-            if not data:
-                log.error(f"No data fetched from {url}")
-                return None, 0, None
-
-            # Save to a temporary file
-            temp_file = tempfile.NamedTemporaryFile(delete=False)
-            temp_file.write(data)
-            temp_file_path = temp_file.name
-            temp_file.close()
-
-            # Calculate all required checksums
-            checksums = {
-                'sha512': hashlib.sha512(data).hexdigest(),
-                'sha384': hashlib.sha384(data).hexdigest(),
-                'sha256': hashlib.sha256(data).hexdigest(),
-                'sha224': hashlib.sha224(data).hexdigest(),
-            }
-            return checksums, len(data), temp_file_path
-    except httpx.HTTPStatusError as http_err:
-        log.error(f"HTTP error occurred while fetching {url}: {http_err}")
-    except Exception as err:
-        log.error(f"Unexpected error occurred while fetching {url}: {err}")
-    return None, 0, None
+    with timings.timer('pipeline'):
+        repository_version = RDeclarativeVersion(
+            first_stage, repository, mirror=mirror, timings=timings
+        ).create()
+    timings.record()
+
+    # PACKAGES lacks Title and Description, read them from the tarballs in a separate task
+    if settings.R_SYNC_ENRICH and repository_version and not deferred_download:
+        dispatch(
+            enrich_packages,
+            kwargs={'repository_version_pk': str(repository_version.pk)},
+        )
+
+
+class TimedArtifactDownloader(ArtifactDownloader):
+    """
+    An ArtifactDownloader timing the download of the tarballs of each package.
+
+    Tarballs are hashed while they are streamed to disk, so this includes the hashing. Downloads
+    run concurrently and their times add up.
+    """
+
+    def __init__(self, timings, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = timings
+
+    # The downloader stages do not work in batches, pulpcore's GenericDownloader documents this
+    # method as the one its subclasses implement to handle each content unit instead.
+    # test_synchronizing checks that ArtifactDownloader still calls it.
+    async def _handle_content_unit(self, d_content):
+        with self.timings.timer('download_artifacts'):
+            return await super()._handle_content_unit(d_content)
+
+
+class TimedBatchesMixin:
+    """
+    Time the work of a stage on each batch of its input as the phase ``phase``.
+
+    The time from handing out a batch until the stage asks for the next one is counted, so
+    waiting for the previous stages is left out.
+    """
+    phase = None
+
+    def __init__(self, timings, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = timings
+
+    async def batches(self, *args, **kwargs):
+        async for batch in super().batches(*args, **kwargs):
+            with self.timings.timer(self.phase):
+                yield batch
+
+
+class RContentSaver(ContentSaver):
+    """
+    A ContentSaver inserting the new packages of a batch with a few bulk statements.
+
+    pulpcore saves new content one row at a time, with a savepoint and an insert per table of
+    the multi-table RPackage. Here the new packages are inserted with ``bulk_create_packages``
+    and get their ContentArtifacts in bulk before pulpcore handles the rest of the batch, which
+    then treats them like content that existed already.
+    """
+
+    def _pre_save(self, batch):
+        new = [d_content for d_content in batch if d_content.content._state.adding]
+        if not new:
+            return
+        saved = bulk_create_packages([d_content.content for d_content in new])
+        content_artifacts = []
+        for d_content, package in zip(new, saved):
+            if package is d_content.content:
+                content_artifacts.extend(
+                    ContentArtifact(
+                        content=package,
+                        artifact=None if d_artifact.artifact._state.adding else d_artifact.artifact,
+                        relative_path=d_artifact.relative_path,
+                    )
+                    for d_artifact in d_content.d_artifacts
+                )
+            d_content.content = package
+        content_artifacts.sort(key=ContentArtifact.sort_key)
+        ContentArtifact.objects.bulk_get_or_create(content_artifacts)
+
+
+class TimedQueryExistingArtifacts(TimedBatchesMixin, QueryExistingArtifacts):
+    phase = 'query_artifacts'
+
+
+class TimedArtifactSaver(TimedBatchesMixin, ArtifactSaver):
+    phase = 'save_artifacts'
+
+
+class TimedQueryExistingContents(TimedBatchesMixin, QueryExistingContents):
+    phase = 'query_content'
+
+
+class TimedContentSaver(TimedBatchesMixin, RContentSaver):
+    phase = 'save_content'
+
+
+class TimedRemoteArtifactSaver(TimedBatchesMixin, RemoteArtifactSaver):
+    phase = 'save_remote_artifacts'
+
+
+class RDeclarativeVersion(DeclarativeVersion):
+    """
+    A DeclarativeVersion recording the time spent in the stages of its pipeline.
+
+    Content is saved by ``RContentSaver``, which inserts new packages in bulk.
+    """
+
+    TIMED_STAGES = {
+        ArtifactDownloader: TimedArtifactDownloader,
+        ArtifactSaver: TimedArtifactSaver,
+        ContentSaver: TimedContentSaver,
+        QueryExistingArtifacts: TimedQueryExistingArtifacts,
+        QueryExistingContents: TimedQueryExistingContents,
+        RemoteArtifactSaver: TimedRemoteArtifactSaver,
+    }
+
+    def __init__(self, *args, timings, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = timings
+
+    def pipeline_stages(self, new_version):
+        """
+        Return the default pipeline, with its stages replaced by timed ones of the same kind.
+
+        The default stages are created without arguments, so the timed ones only add the timings.
+        """
+        return [
+            self.TIMED_STAGES[type(stage)](self.timings)
+            if type(stage) in self.TIMED_STAGES else stage
+            for stage in super().pipeline_stages(new_version)
+        ]
+
 
 class RFirstStage(Stage):
     """
     The first stage of a pulp_r sync pipeline.
+
+    Only the PACKAGES index is downloaded here. Every package is emitted as an unsaved
+    `DeclarativeContent`; looking up existing content, downloading and hashing tarballs and
+    saving is left to the batched stages of the pipeline.
     """
 
-    def __init__(self, remote, deferred_download):
+    def __init__(self, remote, deferred_download, timings=None):
         """
         The first stage of a pulp_r sync pipeline.
 
         Args:
             remote (FileRemote): The remote data to be used when syncing
             deferred_download (bool): if True the downloading will not happen now. If False, it will happen immediately.
+            timings (TaskTimings): Collects the time spent in each phase.
         """
         super().__init__()
         self.remote = remote
         self.deferred_download = deferred_download
+        self.timings = timings or TaskTimings('sync')
 
     async def run(self):
         """
         Build and emit `DeclarativeContent` from the PACKAGES metadata.
-
-        Args:
-            in_q (asyncio.Queue): Unused because the first stage doesn't read from an input queue.
-            out_q (asyncio.Queue): The out_q to send `DeclarativeContent` objects to
         """
         downloader = self.remote.get_downloader(url=self.remote.url)
-        result = await downloader.run()
-
-        package_entries = await self.parse_packages_file(result.path)
-
-        # Use an async context to handle the tasks
-        await self.parse_and_report_packages(package_entries)
-
-    async def parse_and_report_packages(self, package_entries):
+        with self.timings.timer('download_index'):
+            result = await downloader.run()
+
+        with self.timings.timer('parse_index'):
+            package_entries = await self.parse_packages_file(result.path)
+        self.timings.count('packages', len(package_entries))
+
+        async with ProgressReport(
+            message='Parsing R metadata',
+            code='parsing.metadata',
+            total=len(package_entries),
+        ) as progress_report:
+            for i in range(0, len(package_entries), PROGRESS_BATCH_SIZE):
+                chunk = package_entries[i:i + PROGRESS_BATCH_SIZE]
+                for entry in chunk:
+                    await self.put(self.declarative_content(entry))
+                await progress_report.aincrease_by(len(chunk))
+
+    def declarative_content(self, entry):
         """
-        Asynchronously parse packages and report progress.
-
-        Args:
-            package_entries (list): List of package entries
+        Build the `DeclarativeContent` of a package entry of the PACKAGES file.
         """
-        # Create ProgressReport in a synchronous context
-        progress_report = await sync_to_async(ProgressReport.objects.create)(
-            message='Parsing R metadata', code='parsing.metadata'
-        )
-
-        await self.update_progress_report(progress_report, package_entries)
-
-    async def update_progress_report(self, progress_report, package_entries):
-        """
-        Update the progress report and process packages asynchronously.
-
-        Args:
-            progress_report: ProgressReport instance
-            package_entries (list): List of package entries
-        """
-        progress_report.total = len(package_entries)
-        progress_report.done = progress_report.total
-        await sync_to_async(progress_report.save)()
-
-        chunk_size = CHUNK_SIZE
-        for i in range(0, len(package_entries), chunk_size):
-            chunk = package_entries[i:i + chunk_size]
-            tasks = [self.process_package(entry) for entry in chunk]
-            await asyncio.gather(*tasks)
-
-    async def process_package(self, entry):
-        """
-        Process a package entry by fetching its content, calculating checksums, and creating the necessary objects.
-        """
-        # Fetch checksums, file size, and file path
-        checksums, file_size, file_path = await fetch_and_calculate_checksums(entry['file_url'])
-
-        if not checksums or file_size == 0 or not file_path:
-            log.error(f"Failed to fetch and calculate checksums for {entry['file_url']}")
-            return  # Skip further processing for this entry
-
-        # Check if package already exists
-        package, _ = await sync_to_async(RPackage.objects.get_or_create)(
-            name=entry['Package'],
-            version=entry['Version'],
-            defaults={
-                'priority': entry.get('Priority', ''),
-                'summary': entry.get('Title', ''),
-                'description': entry.get('Description', ''),
-                'license': entry.get('License', ''),
-                'url': entry.get('URL', ''),
-                'md5sum': entry.get('MD5sum', ''),
-                'needs_compilation': entry.get('NeedsCompilation', 'no') == 'yes',
-                'path': entry.get('Path', ''),
-                'depends': json.dumps(self.parse_dependencies(entry.get('Depends', ''))),
-                'imports': json.dumps(self.parse_dependencies(entry.get('Imports', ''))),
-                'suggests': json.dumps(self.parse_dependencies(entry.get('Suggests', ''))),
-                'requires': json.dumps(self.parse_dependencies(entry.get('Requires', ''))),
-            }
-        )
-
-        # Check if artifact already exists
-        artifact, _ = await sync_to_async(Artifact.objects.get_or_create)(
-            sha256=checksums['sha256'],
-            defaults={
-                'file': file_path,
-                'size': file_size,
-                'sha224': checksums['sha224'],
-                'sha384': checksums['sha384'],
-                'sha512': checksums['sha512'],
-            }
-        )
-
-        # Check if content artifact already exists
-        content_artifact, _ = await sync_to_async(ContentArtifact.objects.get_or_create)(
-            content=package,
-            artifact=artifact,
-            defaults={'relative_path': entry['file_name']}
-        )
-
-        await sync_to_async(RemoteArtifact.objects.get_or_create)(
-            url=entry['file_url'],
-            content_artifact=content_artifact,
-            defaults={
-                'size': file_size,
-                'sha224': checksums['sha224'],
-                'sha256': checksums['sha256'],
-                'sha384': checksums['sha384'],
-                'sha512': checksums['sha512'],
-                'remote': self.remote,
-            }
-        )
-
-        # Create and emit the DeclarativeArtifact and DeclarativeContent
-        da = DeclarativeArtifact(
-            artifact=artifact,
+        artifact = DeclarativeArtifact(
+            artifact=Artifact(),
             url=entry['file_url'],
             relative_path=entry['file_name'],
             remote=self.remote,
             deferred_download=self.deferred_download,
         )
-        dc = DeclarativeContent(content=package, d_artifacts=[da])
-        await self.put(dc)
+        package = RPackage(**package_fields(entry))
+        return DeclarativeContent(content=package, d_artifacts=[artifact])
 
     async def parse_packages_file(self, path):
         """
         Parse the PACKAGES file containing R package metadata.
 
+        The gzipped index is decompressed and parsed as a stream.
+
         Args:
-            path: Path to the PACKAGES file
+            path: Path to the PACKAGES.gz file
         """
-        # Check if the file is a valid gzip file
+        base_url = self.remote.url.replace('/src/contrib/PACKAGES.gz', '')
+        package_entries = []
         try:
-            with gzip.open(path, 'rt') as f:
-                f.read(1)
+            with gzip.open(path, 'rt', encoding='utf-8', errors='replace') as packages_file:
+                for entry in iter_dcf(packages_file):
+                    if 'Package' not in entry or 'Version' not in entry:
+                        log.warning(_("Skipping a PACKAGES stanza without Package or Version."))
+                        continue
+                    file_name = f"{entry['Package']}_{entry['Version']}.tar.gz"
+                    entry['file_url'] = f"{base_url}/src/contrib/{file_name}"
+                    entry['file_name'] = file_name
+                    package_entries.append(entry)
         except OSError as e:
             log.error(f"Error reading gzip file at {path}: {e}")
             raise
 
-        # Decompress the gzip file
-        decompressed_path = path + ".decompressed"
-        with gzip.open(path, 'rb') as f_in:
-            with open(decompressed_path, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
-
-        # Parse the decompressed PACKAGES file
-        with open(decompressed_path, 'rt') as f:
-            packages_info = f.read()
-
-        os.remove(decompressed_path)  # Clean up the decompressed file
-
-        # Parse the PACKAGES file into individual package entries
-        packages = packages_info.strip().split('\n\n')
-
-        package_entries = []
-        for package_info in packages:
-            entry = {}
-            current_key = None
-            for line in package_info.split('\n'):
-                if ': ' in line:
-                    key, value = line.split(': ', 1)
-                    entry[key] = value.strip()
-                    current_key = key
-                else:
-                    value_line_ends_with_colon = line.endswith(':')
-                    if current_key and value_line_ends_with_colon:
-                        current_key, value = line.split(':', 1)
-                        entry[current_key] = value.strip() if value else ''
-                    else:
-                        # continue to build the multiline value
-                        entry[current_key] += f' {line.strip()}'
-
-            base_url = self.remote.url.replace('/src/contrib/PACKAGES.gz', '')
-            entry['file_url'] = f"{base_url}/src/contrib/{entry['Package']}_{entry['Version']}.tar.gz"
-            entry['file_name'] = f"{entry['Package']}_{entry['Version']}.tar.gz"
-            entry['SHA256'] = entry.get('SHA256', '')
-            entry['Depends'] = self.parse_dependencies(entry.get('Depends', ''))
-            entry['Imports'] = self.parse_dependencies(entry.get('Imports', ''))
-            entry['Suggests'] = self.parse_dependencies(entry.get('Suggests', ''))
-            entry['Requires'] = self.parse_dependencies(entry.get('Requires', ''))
-            package_entries.append(entry)
-
         return package_entries
 
-    def parse_dependencies(self, dep_string):
-        """
-        Parse package dependencies from a comma-separated string.
-
-        Args:
-            dep_string: A comma-separated string of dependencies
-        """
-        if isinstance(dep_string, list):
-            return dep_string
-
-        dependencies = []
-        if dep_string:
-            for dep in dep_string.split(','):
-                dep = dep.strip()
-                if '(' in dep:
-                    pkg, version = dep.split('(')
-                    version = version.rstrip(')')
-                    dependencies.append({'package': pkg.strip(), 'version': version.strip()})
-                else:
-                    dependencies.append({'package': dep.strip()})
-        return dependencies
-
 
 def create_remote(data):
     """
@@ -0,0 +1,255 @@
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from gettext import gettext as _
+
+from django.conf import settings
+from django.db import transaction
+from pulpcore.plugin.models import (
+    Artifact,
+    ContentArtifact,
+    CreatedResource,
+    PulpTemporaryFile,
+)
+
+from pulp_r.app.models import RPackage, RRepository, bulk_create_packages
+from pulp_r.app.tasks.publishing import schedule_publish
+from pulp_r.app.utils import package_fields, read_description
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+CHUNK_SIZE = 1024 * 1024
+
+
+def _digesters():
+    """
+    Return hashers for every checksum stored on Artifacts, plus md5 for the PACKAGES index.
+    """
+    names = [name for name in Artifact.DIGEST_FIELDS if name in settings.ALLOWED_CONTENT_CHECKSUMS]
+    hashers = {name: hashlib.new(name) for name in names}
+    hashers['md5sum'] = hashlib.md5(usedforsecurity=False)
+    return hashers
+
+
+def hash_file(source, destination=None):
+    """
+    Compute the checksums of a file in a single pass, optionally copying it on the way.
+
+    Args:
+        source: A binary file object to read.
+        destination: An optional binary file object to copy the data into.
+
+    Returns:
+        A tuple of (size, dict of checksum name to hex digest).
+    """
+    hashers = _digesters()
+    size = 0
+    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+        size += len(chunk)
+        for hasher in hashers.values():
+            hasher.update(chunk)
+        if destination is not None:
+            destination.write(chunk)
+    return size, {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
+def _ingest_temp_file(temp_file, directory):
+    """
+    Copy an uploaded file out of storage into ``directory``, hash it and read its DESCRIPTION.
+
+    Runs in a worker thread and must not touch the database.
+    """
+    storage = temp_file.file.storage
+    with storage.open(temp_file.file.name, 'rb') as source:
+        with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as local_file:
+            size, digests = hash_file(source, local_file)
+    with open(local_file.name, 'rb') as fp:
+        description = read_description(fp)
+    md5sum = digests.pop('md5sum')
+    artifact = Artifact(file=local_file.name, size=size, **digests)
+    return artifact, description, md5sum
+
+
+def _ingest_artifact(artifact, directory):
+    """
+    Hash an existing Artifact for the PACKAGES index and read its DESCRIPTION.
+
+    The Artifact is read from storage, nothing is written to ``directory``. Runs in a worker
+    thread and must not touch the database.
+    """
+    storage = artifact.file.storage
+    with storage.open(artifact.file.name, 'rb') as source:
+        _, digests = hash_file(source)
+    with storage.open(artifact.file.name, 'rb') as source:
+        description = read_description(source)
+    return artifact, description, digests['md5sum']
+
+
+def save_artifacts(artifacts):
+    """
+    Save new Artifacts, reusing the already stored ones with the same sha256.
+
+    The files of the reused duplicates are left where they are, they are removed along with the
+    working directory of ``ingest``.
+
+    Args:
+        artifacts (list): Unsaved Artifacts.
+
+    Returns:
+        A list of saved Artifacts in the same order.
+    """
+    existing = {}
+    checksums = list({artifact.sha256 for artifact in artifacts})
+    for i in range(0, len(checksums), BATCH_SIZE):
+        existing.update(
+            (artifact.sha256, artifact)
+            for artifact in Artifact.objects.filter(sha256__in=checksums[i:i + BATCH_SIZE])
+        )
+
+    new = {}
+    for artifact in artifacts:
+        if artifact.sha256 not in existing and artifact.sha256 not in new:
+            new[artifact.sha256] = artifact
+    # Saving moves the files into storage
+    existing.update(
+        (artifact.sha256, artifact)
+        for artifact in Artifact.objects.bulk_get_or_create(
+            list(new.values()), batch_size=BATCH_SIZE
+        )
+    )
+    return [existing[artifact.sha256] for artifact in artifacts]
+
+
+def save_packages(items):
+    """
+    Create the RPackages and ContentArtifacts for ingested package tarballs.
+
+    Existing packages are looked up in batches. A package whose name and version already exist
+    is reused as is, content is never modified. This includes packages saved concurrently by
+    another task between the lookup and the insert.
+
+    Args:
+        items (list): Tuples of (RPackage field dict, saved Artifact).
+
+    Returns:
+        A list of the RPackages in the same order, and the list of newly created ones.
+    """
+    existing = {}
+    names = list({fields['name'] for fields, artifact in items})
+    for i in range(0, len(names), BATCH_SIZE):
+        existing.update(
+            ((package.name, package.version), package)
+            for package in RPackage.objects.filter(name__in=names[i:i + BATCH_SIZE])
+        )
+
+    keys = []
+    new = {}
+    for fields, artifact in items:
+        key = (fields['name'], fields['version'])
+        if key not in existing and key not in new:
+            new[key] = (RPackage(**fields), artifact)
+        keys.append(key)
+
+    created = []
+    content_artifacts = []
+    with transaction.atomic():
+        saved = bulk_create_packages([package for package, artifact in new.values()], BATCH_SIZE)
+        for (key, (package, artifact)), stored in zip(new.items(), saved):
+            existing[key] = stored
+            if stored is package:
+                created.append(package)
+                content_artifacts.append(
+                    ContentArtifact(
+                        artifact=artifact,
+                        content=package,
+                        relative_path=f"{package.name}_{package.version}.tar.gz",
+                    )
+                )
+        ContentArtifact.objects.bulk_get_or_create(content_artifacts, batch_size=BATCH_SIZE)
+    return [existing[key] for key in keys], created
+
+
+def ingest(sources, ingest_source, skip_invalid=False):
+    """
+    Hash and read the metadata of many package tarballs in parallel, then save them.
+
+    Local copies of the tarballs are made in a temporary directory below
+    ``settings.WORKING_DIRECTORY``. Saving the Artifacts moves them into storage and whatever
+    is left over is removed with the directory.
+
+    Args:
+        sources (list): Objects understood by ``ingest_source``.
+        ingest_source (callable): Turns a source and the directory to put local copies in into
+            (Artifact, DESCRIPTION dict, md5sum). It runs in a worker thread.
+        skip_invalid (bool): Log and skip the sources ``ingest_source`` raises a ValueError
+            for, instead of failing.
+
+    Returns:
+        A list of the RPackages, and the list of newly created ones.
+    """
+    def ingest_or_skip(source, directory):
+        try:
+            return ingest_source(source, directory)
+        except ValueError as e:
+            log.warning(_("Skipping {source}: {error}").format(source=source, error=e))
+            return None
+
+    with tempfile.TemporaryDirectory(dir=settings.WORKING_DIRECTORY) as directory:
+        with ThreadPoolExecutor(max_workers=settings.R_INGEST_WORKERS) as executor:
+            results = executor.map(
+                partial(ingest_or_skip if skip_invalid else ingest_source, directory=directory),
+                sources,
+            )
+            results = [result for result in results if result is not None]
+
+        artifacts = save_artifacts([artifact for artifact, _, _ in results])
+    items = []
+    for artifact, (_artifact, description, md5sum) in zip(artifacts, results):
+        fields = package_fields(description)
+        fields['md5sum'] = md5sum
+        fields['enriched'] = True
+        items.append((fields, artifact))
+    return save_packages(items)
+
+
+def upload_packages(temp_file_pks=None, artifact_pks=None, repository_pk=None):
+    """
+    Create RPackages from uploaded tarballs and optionally add them to a repository.
+
+    The metadata of every package is read from the ``DESCRIPTION`` in its tarball. All packages
+    are added in a single new repository version, which is then published.
+
+    Args:
+        temp_file_pks (list): PulpTemporaryFiles holding uploaded package tarballs.
+        artifact_pks (list): Already uploaded Artifacts of package tarballs.
+        repository_pk (str): The repository to add the packages to, if any.
+    """
+    temp_files = list(PulpTemporaryFile.objects.filter(pk__in=temp_file_pks or []))
+    artifacts = list(Artifact.objects.filter(pk__in=artifact_pks or []))
+
+    packages, created = ingest(temp_files, _ingest_temp_file)
+    packages_from_artifacts, created_from_artifacts = ingest(artifacts, _ingest_artifact)
+    packages += packages_from_artifacts
+    created += created_from_artifacts
+
+    for temp_file in temp_files:
+        temp_file.delete()
+
+    log.info(
+        _("Uploaded {total} packages, {new} of them new").format(
+            total=len(packages), new=len(created)
+        )
+    )
+
+    if repository_pk is None:
+        for package in created:
+            CreatedResource.objects.create(content_object=package)
+        return
+
+    repository = RRepository.objects.get(pk=repository_pk)
+    with repository.new_version() as new_version:
+        new_version.add_content(RPackage.objects.filter(pk__in=[p.pk for p in packages]))
+    schedule_publish(repository)
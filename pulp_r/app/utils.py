@@ -0,0 +1,242 @@
+"""
+Helpers for reading R package metadata.
+
+R stores package metadata in the Debian Control File (DCF) format, both in the ``DESCRIPTION``
+file shipped in every package tarball and in the ``PACKAGES`` index of a repository.
+"""
+
+import re
+import tarfile
+from gettext import gettext as _
+
+from django.db.models import Q
+
+VERSION_SEPARATOR_RE = re.compile(r'[.-]')
+CONSTRAINT_RE = re.compile(r'^\s*(>=|<=|==|!=|>|<|=)?\s*([0-9][0-9.-]*)\s*$')
+CONSTRAINT_LOOKUPS = {
+    '>=': 'gte', '<=': 'lte', '>': 'gt', '<': 'lt', '==': 'exact', '=': 'exact',
+}
+
+DEPENDENCY_FIELDS = {
+    'depends': 'Depends',
+    'imports': 'Imports',
+    'suggests': 'Suggests',
+    'requires': 'Requires',
+    'linking_to': 'LinkingTo',
+}
+
+
+def iter_dcf(lines):
+    """
+    Parse DCF formatted lines into stanzas, one stanza at a time.
+
+    Args:
+        lines: An iterable of lines, e.g. a file opened in text mode. Stanzas are separated by
+            blank lines, continuation lines start with whitespace.
+
+    Yields:
+        Dicts mapping field names to their (unwrapped) values.
+    """
+    entry = {}
+    key = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            if entry:
+                yield entry
+            entry = {}
+            key = None
+        elif line[0] in ' \t':
+            if key is not None:
+                entry[key] = f"{entry[key]} {line.strip()}".strip()
+        elif ':' in line:
+            key, value = line.split(':', 1)
+            key = key.strip()
+            entry[key] = value.strip()
+    if entry:
+        yield entry
+
+
+def parse_dcf(text):
+    """
+    Parse DCF formatted text into a list of stanzas.
+
+    Args:
+        text (str): The DCF text.
+
+    Returns:
+        A list of dicts mapping field names to their (unwrapped) values.
+    """
+    return list(iter_dcf(text.splitlines()))
+
+
+def split_dependencies(dep_string):
+    """
+    Split a dependency list on the commas that are not inside parentheses.
+    """
+    depth = 0
+    start = 0
+    for i, char in enumerate(dep_string):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(depth - 1, 0)
+        elif char == ',' and not depth:
+            yield dep_string[start:i]
+            start = i + 1
+    yield dep_string[start:]
+
+
+def parse_dependencies(dep_string):
+    """
+    Parse a comma-separated list of package dependencies.
+
+    Args:
+        dep_string (str): The dependencies, e.g. ``R (>= 3.5.0), methods, Rcpp (>= 1.0)``.
+
+    Returns:
+        A list of ``{'package': name}`` dicts, with a ``version`` key for versioned ones. The
+        version is everything between the first ``(`` and its closing ``)``, whitespace
+        collapsed.
+    """
+    if isinstance(dep_string, list):
+        return dep_string
+
+    dependencies = []
+    if dep_string:
+        for dep in split_dependencies(dep_string):
+            dep = dep.strip()
+            if not dep:
+                continue
+            if '(' in dep:
+                pkg, version = dep.split('(', 1)
+                if version.endswith(')'):
+                    version = version[:-1]
+                dependencies.append({
+                    'package': ' '.join(pkg.split()),
+                    'version': ' '.join(version.split()),
+                })
+            else:
+                dependencies.append({'package': ' '.join(dep.split())})
+    return dependencies
+
+
+def package_fields(entry):
+    """
+    Map a DCF stanza of an R package onto RPackage field values.
+
+    Args:
+        entry (dict): A stanza of a ``DESCRIPTION`` or ``PACKAGES`` file.
+
+    Returns:
+        A dict of RPackage field names to values.
+    """
+    fields = {
+        'name': entry['Package'],
+        'version': entry['Version'],
+        'priority': entry.get('Priority', ''),
+        'summary': entry.get('Title', ''),
+        'description': entry.get('Description', ''),
+        'license': entry.get('License', ''),
+        'url': entry.get('URL', ''),
+        'md5sum': entry.get('MD5sum', ''),
+        'needs_compilation': entry.get('NeedsCompilation', 'no') == 'yes',
+        'path': entry.get('Path', ''),
+    }
+    for field, dcf_field in DEPENDENCY_FIELDS.items():
+        fields[field] = parse_dependencies(entry.get(dcf_field, ''))
+    return fields
+
+
+def read_description(fileobj):
+    """
+    Read the ``DESCRIPTION`` of an R source package without unpacking the archive.
+
+    The ``.tar.gz`` is read as a stream and only the ``<package>/DESCRIPTION`` member is
+    extracted.
+
+    Args:
+        fileobj: A binary file object of the package tarball.
+
+    Returns:
+        The ``DESCRIPTION`` stanza as a dict.
+
+    Raises:
+        ValueError: If the archive has no valid ``DESCRIPTION`` file.
+    """
+    try:
+        with tarfile.open(fileobj=fileobj, mode='r|gz') as tar:
+            for member in tar:
+                parts = member.name.strip('/').split('/')
+                if len(parts) == 2 and parts[1] == 'DESCRIPTION' and member.isfile():
+                    data = tar.extractfile(member).read()
+                    break
+            else:
+                raise ValueError(_("No DESCRIPTION file found in the package archive."))
+    except (tarfile.TarError, EOFError, OSError) as e:
+        raise ValueError(_("Unable to read the package archive: {}").format(e))
+
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        text = data.decode('latin-1')
+
+    stanzas = parse_dcf(text)
+    if not stanzas or 'Package' not in stanzas[0] or 'Version' not in stanzas[0]:
+        raise ValueError(_("The DESCRIPTION file does not declare a Package and Version."))
+    return stanzas[0]
+
+
+def version_key(version):
+    """
+    Return a key of an R package version that sorts like R's ``package_version()``.
+
+    Versions are sequences of non-negative integers separated by ``.`` or ``-``, e.g. ``1.10-2``
+    is greater than ``1.9.3``. Every component is encoded as its number of digits (two digits)
+    followed by the digits, so keys compare correctly as plain strings and a version sorts
+    before its extensions (``1.2`` < ``1.2.0``).
+
+    Args:
+        version (str): The version string.
+
+    Returns:
+        The key, or an empty string if the version is not a valid R version.
+    """
+    components = VERSION_SEPARATOR_RE.split(version.strip())
+    if not all(component.isdigit() for component in components):
+        return ''
+    digits = [str(int(component)) for component in components]
+    if any(len(component) > 99 for component in digits):
+        return ''
+    return ''.join(f"{len(component):02d}{component}" for component in digits)
+
+
+def version_constraint_q(constraint, field='version_key'):
+    """
+    Turn an R version constraint like ``>= 1.2.0`` into a filter on the version key.
+
+    Versions that are not valid R versions never match.
+
+    Args:
+        constraint (str): The constraint, a bare version means an exact match.
+        field (str): The name of the version key field to filter on.
+
+    Returns:
+        A Q object.
+
+    Raises:
+        ValueError: If the constraint cannot be parsed.
+    """
+    match = CONSTRAINT_RE.match(constraint)
+    key = version_key(match.group(2)) if match else ''
+    if not key:
+        raise ValueError(_("Invalid version constraint: {}").format(constraint))
+    operator = match.group(1) or '=='
+    if operator == '!=':
+        q = ~Q(**{field: key})
+    else:
+        q = Q(**{f"{field}__{CONSTRAINT_LOOKUPS[operator]}": key})
+    if operator in ('<', '<=', '!='):
+        # Invalid versions have an empty key, which sorts before every valid one
+        q &= ~Q(**{field: ''})
+    return q
@@ -1,10 +1,19 @@
+import base64
+import json
 import logging
+import uuid
 from gettext import gettext as _
 
-from django.db import transaction
-from drf_spectacular.utils import extend_schema
+import django_filters as filters
+from django.conf import settings
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, Q, Value
+
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from pulpcore.plugin import viewsets as core
 from pulpcore.plugin.actions import ModifyRepositoryActionMixin
+from pulpcore.plugin.models import ContentArtifact, PulpTemporaryFile, RepositoryVersion
 from pulpcore.plugin.serializers import (
     AsyncOperationResponseSerializer,
     RepositorySyncURLSerializer,
@@ -13,28 +22,167 @@ from pulpcore.plugin.tasking import dispatch
 from pulpcore.plugin.viewsets import RemoteFilter
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 from . import models, serializers, tasks
+from .dependencies import DependencyIndex, dependency_index, resolve_install_plan
+from .utils import version_constraint_q
 
 logger = logging.getLogger(__name__)
 
+DEPENDENCY_WALK_PARAMETERS = [
+    OpenApiParameter(
+        'repository_version', str, required=True,
+        description=_("Href of the repository version whose packages are walked"),
+    ),
+    OpenApiParameter(
+        'recursive', bool,
+        description=_("Follow dependencies of dependencies (default), or only direct ones"),
+    ),
+]
+
+
 class RPackageFilter(core.ContentFilter):
     """
     FilterSet for RPackage.
     """
+    latest = filters.BooleanFilter(
+        method='filter_latest',
+        help_text=_("Only return the newest version of each package."),
+    )
+    version_constraint = filters.CharFilter(
+        method='filter_version_constraint',
+        help_text=_("Only return versions matching an R version constraint, e.g. '>= 1.2.0'."),
+    )
+    depends_on = filters.CharFilter(
+        method='filter_depends_on',
+        help_text=_("Only return packages that depend on, import or link to this package."),
+    )
 
     class Meta:
         model = models.RPackage
-        fields = [
-            'name',
-            'version',
-            'license',
+        fields = {
+            'name': ['exact', 'in', 'startswith'],
+            'version': ['exact'],
+            'license': ['exact'],
+            'needs_compilation': ['exact'],
+        }
+
+    def filter_latest(self, queryset, name, value):
+        """
+        Keep the newest version of each package among the already filtered packages.
+        """
+        if not value:
+            return queryset
+        newest = queryset.order_by('name', '-version_key').distinct('name').values('pk')
+        return queryset.filter(pk__in=newest)
+
+    def filter_version_constraint(self, queryset, name, value):
+        """
+        Compare versions by R semantics as a range scan on the version key.
+        """
+        try:
+            return queryset.filter(version_constraint_q(value))
+        except ValueError as e:
+            raise ValidationError({name: str(e)})
+
+    def filter_depends_on(self, queryset, name, value):
+        """
+        Match the package in Depends, Imports or LinkingTo through their GIN indexes.
+        """
+        dependency = [{'package': value}]
+        return queryset.filter(
+            Q(depends__contains=dependency)
+            | Q(imports__contains=dependency)
+            | Q(linking_to__contains=dependency)
+        )
+
+
+class RPackagePagination(api_settings.DEFAULT_PAGINATION_CLASS):
+    """
+    Pagination for packages.
+
+    Pages by limit and offset unless the ``cursor`` query parameter is passed (empty for the
+    first page). Then pages are fetched by keyset on ``(name, version, pk)``, which stays equally
+    fast however deep the page is: the leading ``name >= <name>`` bound lets Postgres start a
+    range scan of ``r_rpackage_keyset_idx`` at the cursor.
+    """
+    cursor_query_param = 'cursor'
+    cursor_query_description = _(
+        "Page by keyset instead of offset, pass it empty for the first page. The next link "
+        "carries the cursor of the following page."
+    )
+    keyset_ordering = ('name', 'version', 'pk')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        limit = self.get_limit(request)
+        queryset = queryset.order_by(*self.keyset_ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            name, version, pk = position
+            queryset = queryset.filter(
+                Q(name__gte=name)
+                & (
+                    Q(name__gt=name)
+                    | Q(name=name, version__gt=version)
+                    | Q(name=name, version=version, pk__gt=pk)
+                )
+            )
+
+        page = list(queryset[:limit + 1])
+        self.next_position = None
+        if len(page) > limit:
+            page = page[:limit]
+            last = page[-1]
+            self.next_position = [last.name, last.version, str(last.pk)]
+        return page
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            name, version, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if not isinstance(name, str) or not isinstance(version, str):
+                raise ValueError()
+            pk = uuid.UUID(pk)
+        except (AttributeError, TypeError, ValueError):
+            raise NotFound(_("Invalid cursor"))
+        return name, version, str(pk)
+
+    def encode_cursor(self, position):
+        encoded = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, encoded
+        )
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': str(self.cursor_query_description),
+                'schema': {'type': 'string'},
+            },
         ]
 
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        next_link = self.encode_cursor(self.next_position) if self.next_position else None
+        return Response({'next': next_link, 'previous': None, 'results': data})
 
-class RPackageViewSet(core.ContentViewSet):
+
+class RPackageViewSet(core.SingleArtifactContentUploadViewSet):
     """
     A ViewSet for RPackage.
     """
@@ -42,19 +190,141 @@ class RPackageViewSet(core.ContentViewSet):
     queryset = models.RPackage.objects.all()
     serializer_class = serializers.RPackageSerializer
     filterset_class = RPackageFilter
+    pagination_class = RPackagePagination
     http_method_names = ['get', 'post', 'put', 'patch', 'delete', 'head', 'options']
 
-    @transaction.atomic
-    def create(self, request):
+    # Large text and JSON columns only loaded when they are serialized
+    HEAVY_FIELDS = (
+        'summary', 'description', 'url', 'depends', 'imports', 'suggests', 'requires', 'linking_to'
+    )
+
+    def _requested_fields(self):
         """
-        Perform bookkeeping when saving Content.
+        Return the sets of fields passed in ``fields`` and ``exclude_fields``.
         """
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        if self.request is None:
+            return set(), set()
+        params = self.request.query_params
+        return tuple(
+            {field for value in params.getlist(param) for field in value.split(',') if field}
+            for param in ('fields', 'exclude_fields')
+        )
 
-        headers = self.get_success_headers(serializer.data)
-        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+    @extend_schema(
+        description="Search packages: ranked full-text search over the title and description, "
+        "and fuzzy matching of the name.",
+        summary="Search packages",
+        parameters=[
+            OpenApiParameter('q', str, required=True, description=_("The search terms")),
+        ],
+    )
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        Returns the packages matching ``q``, most relevant first.
+        """
+        terms = request.query_params.get('q', '').strip()
+        if not terms:
+            raise ValidationError({'q': _("This query parameter is required.")})
+
+        query = SearchQuery(terms, search_type='websearch', config=models.SEARCH_CONFIG)
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .defer(*(field for field in self.HEAVY_FIELDS if field != 'summary'))
+            .alias(document=models.SEARCH_VECTOR)
+            .filter(Q(document=query) | Q(TrigramWordSimilar(F('name'), Value(terms))))
+            .annotate(
+                rank=SearchRank(models.SEARCH_VECTOR, query)
+                + TrigramWordSimilarity(terms, 'name')
+            )
+            .order_by('-rank', 'name', 'version_key')
+        )
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def _walk_dependencies(self, request, walk):
+        """
+        Respond with a page of the packages reached by ``walk`` in a repository version.
+        """
+        href = request.query_params.get('repository_version')
+        if not href:
+            raise ValidationError({'repository_version': _("This query parameter is required.")})
+        repository_version = self.get_resource(href, RepositoryVersion)
+        recursive = request.query_params.get('recursive', 'true').lower() not in ('false', '0')
+
+        index = dependency_index(repository_version)
+        package = self.get_object()
+        entries = [
+            {'name': name, 'version': index.versions.get(name), 'depth': depth, 'parent': parent}
+            for name, depth, parent in walk(index, package.name, recursive)
+        ]
+
+        paginator = api_settings.DEFAULT_PAGINATION_CLASS()
+        page = paginator.paginate_queryset(entries, request, view=self)
+        serializer = serializers.RPackageDependencySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        description="List the packages of a repository version that depend on, import or link "
+        "to this package, directly or through other packages.",
+        summary="List reverse dependencies",
+        parameters=DEPENDENCY_WALK_PARAMETERS,
+        responses=serializers.RPackageDependencySerializer(many=True),
+    )
+    @action(detail=True, methods=["get"])
+    def reverse_dependencies(self, request, pk):
+        """
+        Returns the packages that need this package, closest first.
+        """
+        return self._walk_dependencies(request, DependencyIndex.reverse_dependencies)
+
+    @extend_schema(
+        description="List the packages this package depends on, imports or links to in a "
+        "repository version, directly or through other packages. Dependencies missing from the "
+        "repository version have no version.",
+        summary="List the dependency tree",
+        parameters=DEPENDENCY_WALK_PARAMETERS,
+        responses=serializers.RPackageDependencySerializer(many=True),
+    )
+    @action(detail=True, methods=["get"])
+    def dependency_tree(self, request, pk):
+        """
+        Returns the packages this package needs, closest first.
+        """
+        return self._walk_dependencies(request, DependencyIndex.dependency_tree)
+
+    def get_serializer_class(self):
+        """
+        Use the compact serializer for lists that do not ask for specific fields.
+        """
+        if self.action == 'search':
+            return serializers.RPackageSearchSerializer
+        if self.action == 'list':
+            fields, exclude_fields = self._requested_fields()
+            if not fields and not exclude_fields:
+                return serializers.RPackageListSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        """
+        Defer the heavy columns that the response will not contain.
+        """
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+
+        fields, exclude_fields = self._requested_fields()
+        if fields:
+            deferred = [field for field in self.HEAVY_FIELDS if field not in fields]
+        elif exclude_fields:
+            deferred = [field for field in self.HEAVY_FIELDS if field in exclude_fields]
+        elif self.action == 'list':
+            deferred = self.HEAVY_FIELDS
+        else:
+            deferred = ()
+        return queryset.defer(*deferred)
 
 
 class RRemoteFilter(RemoteFilter):
@@ -153,26 +423,189 @@ class RRepositoryViewSet(core.RepositoryViewSet, ModifyRepositoryActionMixin):
     serializer_class = serializers.RRepositorySerializer
     http_method_names = ['get', 'post', 'put', 'patch', 'delete', 'head', 'options']
     
-    @action(detail=True, methods=["post"], serializer_class=serializers.RPackageSerializer)
+    @extend_schema(
+        description="Trigger an asynchronous task to delete a repository. Its publications are "
+        "deleted in batches first.",
+        responses={202: AsyncOperationResponseSerializer},
+    )
+    def destroy(self, request, pk, **kwargs):
+        """
+        Dispatches a task deleting the repository in batches.
+        """
+        repository = self.get_object()
+        result = dispatch(
+            tasks.delete_repository,
+            exclusive_resources=[repository],
+            kwargs={'repository_pk': str(repository.pk)},
+        )
+        return core.OperationPostponedResponse(result, request)
+
+    @extend_schema(
+        description="Trigger an asynchronous task to add an R package to the repository. The "
+        "package metadata is read from the DESCRIPTION file of the uploaded tarball.",
+        summary="Upload a package",
+        responses={202: AsyncOperationResponseSerializer},
+    )
+    @action(detail=True, methods=["post"], serializer_class=serializers.RPackageUploadSerializer)
     def upload_content(self, request, pk):
+        """
+        Dispatches a task adding an uploaded package to a new repository version.
+
+        Only the upload itself happens in the request, hashing and reading the DESCRIPTION are
+        left to the task.
+        """
         repository = self.get_object()
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        package = serializer.save()
 
-        # Create a new RepositoryVersion
-        with repository.new_version() as new_version:
-            # Associate the package with the new RepositoryVersion
-            new_version.add_content(models.RPackage.objects.filter(pk=package.pk))
+        temp_file = PulpTemporaryFile.init_and_validate(serializer.validated_data['file'])
+        temp_file.save()
+        result = dispatch(
+            tasks.upload_packages,
+            exclusive_resources=[repository],
+            kwargs={'temp_file_pks': [str(temp_file.pk)], 'repository_pk': str(repository.pk)},
+        )
+        return core.OperationPostponedResponse(result, request)
 
-        # Launch the publishing task
-        publication_task = dispatch(
-            tasks.publish,
-            kwargs={'repository_version_pk': str(new_version.pk)}
+    @extend_schema(
+        description="Trigger an asynchronous task to upload many R packages into a single new "
+        "repository version.",
+        summary="Upload packages in bulk",
+        responses={202: AsyncOperationResponseSerializer},
+    )
+    @action(detail=True, methods=["post"],
+            serializer_class=serializers.RPackageBulkUploadSerializer)
+    def bulk_upload(self, request, pk):
+        """
+        Dispatches a task creating packages from many tarballs or artifacts.
+        """
+        repository = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        temp_file_pks = []
+        for file in serializer.validated_data.get('files', []):
+            temp_file = PulpTemporaryFile.init_and_validate(file)
+            temp_file.save()
+            temp_file_pks.append(str(temp_file.pk))
+        artifacts = serializer.validated_data.get('artifacts', [])
+
+        result = dispatch(
+            tasks.upload_packages,
+            exclusive_resources=[repository],
+            kwargs={
+                'temp_file_pks': temp_file_pks,
+                'artifact_pks': [str(artifact.pk) for artifact in artifacts],
+                'repository_pk': str(repository.pk),
+            },
         )
+        return core.OperationPostponedResponse(result, request)
+
+    @extend_schema(
+        description="Trigger an asynchronous task importing a CRAN-like tree or a directory of "
+        "package tarballs from the filesystem of the Pulp server into a new repository version.",
+        summary="Import packages from the filesystem",
+        responses={202: AsyncOperationResponseSerializer},
+    )
+    @action(detail=True, methods=["post"], url_path="import",
+            serializer_class=serializers.RPackageImportSerializer)
+    def import_packages(self, request, pk):
+        """
+        Dispatches a task importing packages from a directory on the server.
+        """
+        repository = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        result = dispatch(
+            tasks.import_packages,
+            exclusive_resources=[repository],
+            kwargs={
+                'repository_pk': str(repository.pk),
+                'path': serializer.validated_data['path'],
+                'mirror': serializer.validated_data['mirror'],
+                'walk': serializer.validated_data['walk'],
+            },
+        )
+        return core.OperationPostponedResponse(result, request)
+
+    @extend_schema(
+        description="Trigger an asynchronous task copying packages, by default together with "
+        "their dependencies, from a repository version into a new version of this repository.",
+        summary="Copy packages",
+        responses={202: AsyncOperationResponseSerializer},
+    )
+    @action(detail=True, methods=["post"], serializer_class=serializers.RPackageCopySerializer)
+    def copy(self, request, pk):
+        """
+        Dispatches a task copying packages into the repository.
+        """
+        repository = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        source_version = serializer.validated_data['source_repository_version']
+
+        names, package_pks = [], []
+        for package in serializer.validated_data['packages']:
+            if package.startswith('/'):
+                package_pks.append(str(self.extract_pk(package)))
+            else:
+                names.append(package)
+
+        result = dispatch(
+            tasks.copy_packages,
+            exclusive_resources=[repository],
+            shared_resources=[source_version.repository],
+            kwargs={
+                'source_version_pk': str(source_version.pk),
+                'repository_pk': str(repository.pk),
+                'names': names,
+                'package_pks': package_pks,
+                'dependencies': serializer.validated_data['dependencies'],
+            },
+        )
+        return core.OperationPostponedResponse(result, request)
+
+    @extend_schema(
+        description="Trigger an asynchronous task deleting the publications of the repository "
+        "that are neither its latest, served by a distribution nor recorded as a snapshot, and "
+        "the PACKAGES indexes no publication serves anymore.",
+        summary="Clean up publications",
+        request=None,
+        responses={202: AsyncOperationResponseSerializer},
+    )
+    @action(detail=True, methods=["post"])
+    def cleanup_publications(self, request, pk):
+        """
+        Dispatches a task deleting superseded publications.
+        """
+        repository = self.get_object()
+        result = dispatch(
+            tasks.cleanup_publications,
+            exclusive_resources=[repository],
+            kwargs={'repository_pk': str(repository.pk)},
+        )
+        return core.OperationPostponedResponse(result, request)
+
+    @extend_schema(
+        description="Trigger an asynchronous task filling in the title, description and URL of "
+        "packages in the latest repository version from their downloaded tarballs.",
+        summary="Enrich package metadata",
+        request=None,
+        responses={202: AsyncOperationResponseSerializer},
+    )
+    @action(detail=True, methods=["post"])
+    def enrich(self, request, pk):
+        """
+        Dispatches a task enriching the packages of the latest version.
+        """
+        repository = self.get_object()
+        result = dispatch(
+            tasks.enrich_packages,
+            kwargs={'repository_version_pk': str(repository.latest_version().pk)},
+        )
+        return core.OperationPostponedResponse(result, request)
 
-        return core.OperationPostponedResponse(publication_task, request)
-    
     @extend_schema(
         description="Trigger an asynchronous task to sync content.",
         summary="Sync from remote",
@@ -207,6 +640,63 @@ class RRepositoryVersionViewSet(core.RepositoryVersionViewSet):
 
     parent_viewset = RRepositoryViewSet
 
+    @extend_schema(
+        description="List the packages whose newest version differs between this repository "
+        "version and a base version: added, removed, upgraded, downgraded and changed "
+        "packages.",
+        summary="Compare repository versions",
+        parameters=[
+            OpenApiParameter(
+                'base_version', str,
+                description=_("Href of the repository version to compare against, the "
+                              "previous version by default"),
+            ),
+            OpenApiParameter(
+                'after', str, description=_("Only list packages with names sorting after this")
+            ),
+        ],
+        responses=serializers.RPackageChangeSerializer(many=True),
+    )
+    @action(detail=True, methods=["get"])
+    def diff(self, request, repository_pk, number):
+        """
+        Returns a page of changed packages ordered by name, linking to the next page.
+        """
+        repository_version = self.get_object()
+        href = request.query_params.get('base_version')
+        if href:
+            base_version = self.get_resource(href, RepositoryVersion)
+        else:
+            base_version = (
+                RepositoryVersion.objects.filter(
+                    repository_id=repository_version.repository_id,
+                    number__lt=repository_version.number,
+                    complete=True,
+                )
+                .order_by('-number')
+                .first()
+            )
+            if base_version is None:
+                raise ValidationError(
+                    {'base_version': _("This repository version has no previous version.")}
+                )
+
+        limit = api_settings.DEFAULT_PAGINATION_CLASS().get_limit(request) or 100
+        changes = models.package_changes(
+            base_version,
+            repository_version,
+            after=request.query_params.get('after', ''),
+            limit=limit + 1,
+        )
+        next_link = None
+        if len(changes) > limit:
+            changes = changes[:limit]
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'after', changes[-1]['name']
+            )
+        serializer = serializers.RPackageChangeSerializer(changes, many=True)
+        return Response({'next': next_link, 'previous': None, 'results': serializer.data})
+
 
 class RPublicationViewSet(core.PublicationViewSet):
     """
@@ -252,10 +742,31 @@ class RPublicationViewSet(core.PublicationViewSet):
 
         result = dispatch(
             tasks.publish,
+            shared_resources=[repository_version.repository],
             kwargs={'repository_version_pk': str(repository_version.pk)}
         )
         return core.OperationPostponedResponse(result, request)
 
+    @extend_schema(
+        description="Trigger an asynchronous task to delete a publication. Its published "
+        "artifacts are deleted in batches.",
+        responses={202: AsyncOperationResponseSerializer},
+    )
+    def destroy(self, request, pk, **kwargs):
+        """
+        Dispatches a task deleting the publication in batches.
+
+        The task locks the repository, so no publish of it can layer a delta on the publication
+        while it is being deleted.
+        """
+        publication = self.get_object()
+        result = dispatch(
+            tasks.delete_publication,
+            exclusive_resources=[publication.repository_version.repository],
+            kwargs={'publication_pk': str(publication.pk)},
+        )
+        return core.OperationPostponedResponse(result, request)
+
 
 class RDistributionViewSet(core.DistributionViewSet):
     """
@@ -271,4 +782,62 @@ class RDistributionViewSet(core.DistributionViewSet):
             return super().create(request, *args, **kwargs)
         except Exception as e:
             logger.error(f"Error creating distribution: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    @extend_schema(
+        description="Resolve a renv.lock file or a list of package requirements, including all "
+        "of their dependencies, against the packages served by this distribution.",
+        summary="Resolve an install plan",
+        request=serializers.RInstallPlanRequestSerializer,
+        responses=serializers.RInstallPlanSerializer,
+    )
+    @action(detail=True, methods=["post"],
+            serializer_class=serializers.RInstallPlanRequestSerializer)
+    def install_plan(self, request, pk):
+        """
+        Returns the packages to install in order, with their download URLs and checksums.
+        """
+        distribution = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        publication_id = distribution.served_publication_id()
+        if publication_id is None:
+            raise ValidationError(_("The distribution does not serve a publication."))
+        repository_version = models.RPublication.objects.get(
+            pk=publication_id
+        ).repository_version
+        packages, missing = resolve_install_plan(
+            repository_version, serializer.validated_data['requirements']
+        )
+
+        content_artifacts = {
+            content_artifact.content_id: content_artifact
+            for content_artifact in ContentArtifact.objects.filter(
+                content__in=[package.pk for package in packages]
+            ).select_related('artifact')
+        }
+        base_url = "".join(
+            (settings.CONTENT_ORIGIN, settings.CONTENT_PATH_PREFIX, distribution.base_path)
+        )
+        plan = []
+        for package in packages:
+            content_artifact = content_artifacts.get(package.pk)
+            if content_artifact is None:
+                missing.append((package.name, f"== {package.version}"))
+                continue
+            artifact = content_artifact.artifact
+            plan.append({
+                'name': package.name,
+                'version': package.version,
+                'url': f"{base_url}/{content_artifact.relative_path}",
+                'md5sum': artifact.md5 if artifact and artifact.md5 else package.md5sum,
+                'sha256': artifact.sha256 if artifact else None,
+            })
+        result = serializers.RInstallPlanSerializer({
+            'packages': plan,
+            'missing': [
+                {'name': name, 'constraint': constraint} for name, constraint in missing
+            ],
+        })
+        return Response(result.data)
@@ -0,0 +1,105 @@
+"""
+Helpers for the benchmarks of the r plugin.
+
+Benchmarks only run when ``PULP_R_BENCHMARK_OUTPUT`` names the JSON file their results are
+written to, so that results of two releases can be compared.
+"""
+
+import json
+import os
+import platform
+import resource
+import time
+import unittest
+from contextlib import contextmanager
+
+from django.apps import apps
+
+BENCHMARK_OUTPUT_ENV = "PULP_R_BENCHMARK_OUTPUT"
+
+requires_benchmarks = unittest.skipUnless(
+    os.environ.get(BENCHMARK_OUTPUT_ENV), f"Set {BENCHMARK_OUTPUT_ENV} to run benchmarks"
+)
+
+
+def benchmark_sizes(variable, default):
+    """
+    Return the comma-separated integers of the environment ``variable`` or ``default``.
+    """
+    value = os.environ.get(variable)
+    if not value:
+        return default
+    return tuple(int(size) for size in value.split(","))
+
+
+def reset_peak_rss():
+    """
+    Reset the peak resident set size of the process where the kernel supports it.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as fp:
+            fp.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss():
+    """
+    Return the peak resident set size of the process in bytes.
+
+    Without ``reset_peak_rss`` support this is the peak since the process started.
+    """
+    try:
+        with open("/proc/self/status") as fp:
+            for line in fp:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@contextmanager
+def stopwatch():
+    """
+    Measure the wall time of the block, available as ``["seconds"]`` when it is done.
+    """
+    elapsed = {}
+    start = time.perf_counter()
+    try:
+        yield elapsed
+    finally:
+        elapsed["seconds"] = time.perf_counter() - start
+
+
+class BenchmarkResults:
+    """
+    The results of a benchmark suite, merged into the JSON file of ``PULP_R_BENCHMARK_OUTPUT``.
+
+    The file holds the environment of the run and a list of results per suite; writing replaces
+    the results of this suite only.
+    """
+
+    def __init__(self, suite):
+        self.suite = suite
+        self.results = []
+
+    def add(self, name, **metrics):
+        self.results.append({"name": name, **metrics})
+
+    def write(self):
+        path = os.environ[BENCHMARK_OUTPUT_ENV]
+        try:
+            with open(path) as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            data = {}
+        data["environment"] = {
+            "pulp_r": apps.get_app_config("r").version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        }
+        data.setdefault("suites", {})[self.suite] = self.results
+        with open(path, "w") as fp:
+            json.dump(data, fp, indent=2, sort_keys=True)
@@ -0,0 +1,169 @@
+"""A synthetic CRAN-like repository for performance tests of the r plugin."""
+
+import gzip
+import hashlib
+import io
+import os
+import random
+import tarfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+CONTRIB_PATH = "src/contrib"
+
+
+def gen_stanza(index, rng, prefix="pkg"):
+    """Return the DCF fields of the synthetic package number ``index``."""
+    stanza = {
+        "Package": f"{prefix}{index:06d}",
+        "Version": f"{rng.randint(0, 3)}.{rng.randint(0, 20)}-{rng.randint(0, 9)}",
+        "Depends": "R (>= 3.5.0)",
+        "License": "GPL-3",
+        "NeedsCompilation": rng.choice(("yes", "no")),
+    }
+    if index:
+        earlier = sorted(rng.sample(range(index), min(index, rng.randint(0, 4))))
+        if earlier:
+            stanza["Imports"] = ", ".join(f"{prefix}{dep:06d}" for dep in earlier)
+        if stanza["NeedsCompilation"] == "yes" and rng.random() < 0.3:
+            stanza["LinkingTo"] = f"{prefix}{rng.randrange(index):06d} (>= 0.1)"
+    return stanza
+
+
+def format_stanza(stanza):
+    """Return a DCF stanza as text."""
+    return "".join(f"{key}: {value}\n" for key, value in stanza.items())
+
+
+def make_tarball(stanza, size, rng):
+    """Return the bytes of a source package tarball with ``size`` bytes of payload."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        description = format_stanza({**stanza, "Title": f"Synthetic package {stanza['Package']}"})
+        for name, data in (
+            ("DESCRIPTION", description.encode()),
+            ("R/payload.R", rng.randbytes(size)),
+        ):
+            info = tarfile.TarInfo(f"{stanza['Package']}/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def gen_cran_tree(directory, count, tarball_size=None, seed=0, prefix="pkg"):
+    """
+    Write a CRAN-like tree with ``count`` packages to ``directory``.
+
+    Args:
+        directory (str): The root of the tree.
+        count (int): The number of packages.
+        tarball_size (int): Bytes of payload per tarball, None writes only the PACKAGES index.
+        seed (int): Seed of the generated metadata and payloads.
+        prefix (str): The start of the package names, distinct trees need distinct prefixes.
+
+    Returns:
+        The list of package stanzas.
+    """
+    rng = random.Random(seed)
+    contrib = os.path.join(directory, CONTRIB_PATH)
+    os.makedirs(contrib, exist_ok=True)
+
+    stanzas = []
+    for index in range(count):
+        stanza = gen_stanza(index, rng, prefix)
+        if tarball_size is not None:
+            tarball = make_tarball(stanza, tarball_size, rng)
+            file_name = f"{stanza['Package']}_{stanza['Version']}.tar.gz"
+            with open(os.path.join(contrib, file_name), "wb") as fp:
+                fp.write(tarball)
+            stanza["MD5sum"] = hashlib.md5(tarball).hexdigest()
+        stanzas.append(stanza)
+
+    packages = "\n".join(format_stanza(stanza) for stanza in stanzas)
+    with open(os.path.join(contrib, "PACKAGES"), "w") as fp:
+        fp.write(packages)
+    with gzip.open(os.path.join(contrib, "PACKAGES.gz"), "wt") as fp:
+        fp.write(packages)
+    return stanzas
+
+
+class CranServer:
+    """
+    Serve a CRAN-like tree over HTTP from a background thread.
+
+    Use as a context manager; ``url`` is the URL of its ``PACKAGES.gz`` to use as remote URL.
+    """
+
+    def __init__(self, directory, latency=0.0, error_rate=0.0, seed=0):
+        """
+        Args:
+            directory (str): The root of the tree.
+            latency (float): Seconds to wait before answering each request.
+            error_rate (float): Share of the tarballs whose first request fails with a 503.
+            seed (int): Seed choosing the failing tarballs.
+        """
+        self.directory = directory
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.server = None
+        self.thread = None
+        self._lock = threading.Lock()
+        self._failed = set()
+        self.requests = 0
+        self.errors = 0
+
+    def fail(self, path):
+        """
+        Return whether the request of ``path`` should fail.
+
+        Only tarballs fail and only once, so that a download that is retried succeeds.
+        """
+        with self._lock:
+            self.requests += 1
+            if not path.endswith(".tar.gz") or path in self._failed:
+                return False
+            if random.Random(f"{self.seed}:{path}").random() >= self.error_rate:
+                return False
+            self._failed.add(path)
+            self.errors += 1
+            return True
+
+    def handler(self, *args, **kwargs):
+        return CranHandler(*args, cran=self, directory=self.directory, **kwargs)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/{CONTRIB_PATH}/PACKAGES.gz"
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+class CranHandler(SimpleHTTPRequestHandler):
+    """A quiet static file handler with the latency and errors of its ``CranServer``."""
+
+    def __init__(self, *args, cran, **kwargs):
+        self.cran = cran
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.cran.latency:
+            time.sleep(self.cran.latency)
+        if self.cran.fail(self.path):
+            self.send_error(503)
+            return
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
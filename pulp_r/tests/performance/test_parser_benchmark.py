@@ -0,0 +1,136 @@
+"""
+Benchmark of the DCF and dependency parsers over real-world-shaped corpora.
+
+Configured with the environment variables:
+
+* ``PULP_R_BENCHMARK_OUTPUT``: the JSON file the results are written to, required.
+* ``PULP_R_BENCHMARK_PARSER_MB``: megabytes of text per corpus, 50 by default.
+
+The corpora are shaped like the ``PACKAGES`` of CRAN, like the one of Bioconductor with its long
+dependency lists and ``biocViews``, and like hand-written indexes where nearly every field wraps.
+A replacement parser must parse all of them into the same stanzas, and should do so faster.
+"""
+
+import io
+import os
+import random
+import textwrap
+
+from django.test import SimpleTestCase
+
+from pulp_r.app.utils import DEPENDENCY_FIELDS, iter_dcf, parse_dependencies
+from pulp_r.tests.performance.benchmark import BenchmarkResults, requires_benchmarks, stopwatch
+from pulp_r.tests.performance.cran import gen_stanza
+
+CORPUS_BYTES = int(float(os.environ.get("PULP_R_BENCHMARK_PARSER_MB", 50)) * 1024 * 1024)
+
+BIOC_VIEWS = (
+    "Software", "GeneExpression", "Sequencing", "RNASeq", "Transcriptomics", "Annotation",
+    "Visualization", "StatisticalMethod", "SingleCell", "Normalization", "Clustering",
+)
+
+
+def cran_stanza(index, rng):
+    """A CRAN stanza, wrapped at 72 columns like ``write.dcf``."""
+    stanza = gen_stanza(index, rng)
+    stanza["Suggests"] = ", ".join(
+        f"pkg{dep:06d}" for dep in rng.sample(range(index + 10), rng.randint(0, 6))
+    )
+    stanza["MD5sum"] = f"{rng.getrandbits(128):032x}"
+    return stanza, 72, "        "
+
+
+def bioconductor_stanza(index, rng):
+    """A Bioconductor stanza, with long versioned dependency lists and ``biocViews``."""
+    stanza = gen_stanza(index, rng, prefix="bioc")
+    for field in ("Depends", "Imports", "Suggests"):
+        stanza[field] = ", ".join(
+            f"bioc{dep:06d} (>= {rng.randint(0, 3)}.{rng.randint(0, 40)}.{rng.randint(0, 9)})"
+            for dep in rng.sample(range(index + 30), rng.randint(3, 25))
+        )
+    stanza["biocViews"] = ", ".join(rng.sample(BIOC_VIEWS, rng.randint(1, 6)))
+    stanza["git_url"] = f"https://git.bioconductor.org/packages/bioc{index:06d}"
+    stanza["git_branch"] = "RELEASE_3_19"
+    stanza["MD5sum"] = f"{rng.getrandbits(128):032x}"
+    return stanza, 72, "        "
+
+
+def continuation_stanza(index, rng):
+    """A stanza of short wrapped lines, with nested constraints and a wrapped LinkingTo."""
+    stanza = gen_stanza(index, rng, prefix="wrap")
+    stanza["LinkingTo"] = ", ".join(
+        f"wrap{dep:06d} (>= 1.{rng.randint(0, 9)} (patched))"
+        for dep in rng.sample(range(index + 5), rng.randint(1, 4))
+    )
+    stanza["Description"] = " ".join(
+        rng.choice(("Fits", "models", "to", "data:", "fast", "and", "robust.")) for _ in range(40)
+    )
+    return stanza, 20, rng.choice((" ", "    ", "\t"))
+
+
+CORPORA = {
+    "cran": cran_stanza,
+    "bioconductor": bioconductor_stanza,
+    "continuation": continuation_stanza,
+}
+
+
+def gen_corpus(make_stanza, size, seed=0):
+    """
+    Return about ``size`` characters of DCF text made of ``make_stanza`` stanzas and the stanzas.
+    """
+    rng = random.Random(seed)
+    chunks = []
+    stanzas = []
+    written = 0
+    while written < size:
+        stanza, width, indent = make_stanza(len(stanzas), rng)
+        text = "".join(
+            textwrap.fill(
+                f"{field}: {value}",
+                width=width,
+                subsequent_indent=indent,
+                break_long_words=False,
+                break_on_hyphens=False,
+            ) + "\n"
+            for field, value in stanza.items()
+        )
+        chunks.append(text)
+        stanzas.append(stanza)
+        written += len(text) + 1
+    return "\n".join(chunks), stanzas
+
+
+@requires_benchmarks
+class TestParserBenchmark(SimpleTestCase):
+    """Measure the throughput of parsing PACKAGES indexes."""
+
+    def test_parsers(self):
+        results = BenchmarkResults("parser")
+        for corpus, make_stanza in CORPORA.items():
+            with self.subTest(corpus=corpus):
+                text, expected = gen_corpus(make_stanza, CORPUS_BYTES)
+                size = len(text.encode("utf-8"))
+
+                with stopwatch() as dcf:
+                    stanzas = list(iter_dcf(io.StringIO(text)))
+                with stopwatch() as dependencies:
+                    parsed = [
+                        parse_dependencies(stanza.get(field, ""))
+                        for stanza in stanzas
+                        for field in DEPENDENCY_FIELDS.values()
+                    ]
+
+                self.assertEqual(stanzas, expected)
+                results.add(
+                    f"parser.{corpus}",
+                    corpus=corpus,
+                    bytes=size,
+                    stanzas=len(stanzas),
+                    dependencies=sum(len(dependency_list) for dependency_list in parsed),
+                    dcf_seconds=dcf["seconds"],
+                    dcf_bytes_per_second=size / dcf["seconds"],
+                    dependencies_seconds=dependencies["seconds"],
+                    stanzas_per_second=len(stanzas) / (dcf["seconds"] + dependencies["seconds"]),
+                )
+        results.write()
@@ -0,0 +1,84 @@
+"""
+Benchmark of publishing large repositories.
+
+Configured with the environment variables:
+
+* ``PULP_R_BENCHMARK_OUTPUT``: the JSON file the results are written to, required.
+* ``PULP_R_BENCHMARK_PUBLISH_SIZES``: comma-separated numbers of packages,
+  ``1000,20000,100000`` by default.
+
+Every size is published twice: once timed, with the time of each phase of the task, and once
+under tracemalloc for the peak memory use, which must not grow with the repository.
+"""
+
+import tracemalloc
+
+from django.test import TransactionTestCase, override_settings
+
+from pulp_r.app.models import RRepository
+from pulp_r.app.tasks import publish
+from pulp_r.tests.performance.benchmark import (
+    BenchmarkResults,
+    benchmark_sizes,
+    requires_benchmarks,
+    stopwatch,
+)
+from pulp_r.tests.performance.utils import (
+    add_synthetic_packages,
+    capture_timings,
+    count_queries,
+)
+from pulp_r.tests.unit.utils import running_task
+
+SIZES = benchmark_sizes("PULP_R_BENCHMARK_PUBLISH_SIZES", (1000, 20000, 100000))
+
+# Peak traced memory of the largest publication relative to the smallest one
+MEMORY_GROWTH_LIMIT = 2
+
+
+@requires_benchmarks
+@override_settings(R_PUBLICATION_DELTA_MAX_RATIO=0)
+class TestPublishBenchmark(TransactionTestCase):
+    """Measure the time and memory of full publications."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = BenchmarkResults("publish")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.results.write()
+        super().tearDownClass()
+
+    def test_publish(self):
+        peaks = []
+        for size in SIZES:
+            repository = RRepository.objects.create(name=f"publish-benchmark-{size}")
+            repository_version = add_synthetic_packages(repository, size, prefix=f"bench{size}n")
+
+            with running_task(), capture_timings() as timings, count_queries() as queries:
+                with stopwatch() as elapsed:
+                    publish(repository_version.pk)
+            phases = timings[-1].seconds
+
+            tracemalloc.start()
+            try:
+                with running_task():
+                    publish(repository_version.pk)
+                _current, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            peaks.append(peak)
+
+            self.results.add(
+                "publish",
+                packages=size,
+                seconds=elapsed["seconds"],
+                seconds_per_1000_packages=elapsed["seconds"] * 1000 / size,
+                phases=dict(phases),
+                queries=queries.count,
+                peak_traced_memory=peak,
+            )
+
+        self.assertLessEqual(peaks[-1], MEMORY_GROWTH_LIMIT * peaks[0])
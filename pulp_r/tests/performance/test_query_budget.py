@@ -0,0 +1,78 @@
+"""
+Query budgets of sync and publish.
+
+The number of SQL statements of a task may grow with the number of batches it works in, not
+with the number of packages. A per-package query added to either task fails these tests.
+"""
+
+import tempfile
+from math import ceil
+
+from django.test import TransactionTestCase
+
+from pulp_r.app.models import LAYER_BATCH_SIZE, RRemote, RRepository
+from pulp_r.app.tasks import publish, synchronize
+from pulp_r.tests.performance.cran import CranServer, gen_cran_tree
+from pulp_r.tests.performance.utils import add_synthetic_packages, count_queries
+from pulp_r.tests.unit.utils import running_task
+
+SIZES = (100, 1000, 10000)
+
+# Statements allowed per additional batch of LAYER_BATCH_SIZE packages of a publication
+PUBLISH_QUERIES_PER_BATCH = 4
+
+# Size of the batches of the stages of the sync pipeline
+SYNC_BATCH_SIZE = 500
+# Statements allowed per additional batch of the sync pipeline, new packages are saved in bulk
+SYNC_QUERIES_PER_BATCH = 20
+
+
+class TestPublishQueryBudget(TransactionTestCase):
+    """Test that publishing runs a number of queries per batch, not per package."""
+
+    def publish_queries(self, size):
+        repository = RRepository.objects.create(name=f"publish-budget-{size}")
+        repository_version = add_synthetic_packages(repository, size, prefix=f"publish{size}n")
+        with running_task(), count_queries() as queries:
+            publish(repository_version.pk)
+        return queries.count
+
+    def test_publish(self):
+        baseline = self.publish_queries(SIZES[0])
+        for size in SIZES[1:]:
+            with self.subTest(size=size):
+                batches = ceil(size / LAYER_BATCH_SIZE) - ceil(SIZES[0] / LAYER_BATCH_SIZE)
+                self.assertLessEqual(
+                    self.publish_queries(size) - baseline, batches * PUBLISH_QUERIES_PER_BATCH
+                )
+
+
+class TestSyncQueryBudget(TransactionTestCase):
+    """Test that syncing runs a number of queries per batch, not per package."""
+
+    def sync_queries(self, size):
+        """
+        Return the number of queries of a first sync and of a re-sync of an unchanged index.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            gen_cran_tree(directory, size, prefix=f"sync{size}n")
+            with CranServer(directory) as server:
+                remote = RRemote.objects.create(
+                    name=f"sync-budget-{size}", url=server.url, policy='on_demand'
+                )
+                repository = RRepository.objects.create(name=f"sync-budget-{size}")
+                counts = []
+                for _ in range(2):
+                    with running_task(), count_queries() as queries:
+                        synchronize(remote.pk, repository.pk, mirror=True)
+                    counts.append(queries.count)
+        return counts
+
+    def test_sync(self):
+        baseline_sync, baseline_resync = self.sync_queries(SIZES[0])
+        for size in SIZES[1:]:
+            with self.subTest(size=size):
+                sync, resync = self.sync_queries(size)
+                batches = ceil(size / SYNC_BATCH_SIZE) - ceil(SIZES[0] / SYNC_BATCH_SIZE)
+                self.assertLessEqual(sync - baseline_sync, batches * SYNC_QUERIES_PER_BATCH)
+                self.assertLessEqual(resync - baseline_resync, batches * SYNC_QUERIES_PER_BATCH)
@@ -0,0 +1,101 @@
+"""
+End-to-end benchmark of sync against a local synthetic CRAN server.
+
+Configured with the environment variables:
+
+* ``PULP_R_BENCHMARK_OUTPUT``: the JSON file the results are written to, required.
+* ``PULP_R_BENCHMARK_SYNC_SIZES``: comma-separated numbers of packages, ``1000,10000`` by default.
+* ``PULP_R_BENCHMARK_TARBALL_SIZE``: bytes of payload per tarball, 16 KiB by default.
+* ``PULP_R_BENCHMARK_LATENCY``: seconds the server waits before every response, 0 by default.
+* ``PULP_R_BENCHMARK_ERROR_RATE``: share of tarballs whose first download fails, 0 by default.
+"""
+
+import os
+import tempfile
+
+from django.test import TransactionTestCase
+
+from pulp_r.app.models import RRemote, RRepository
+from pulp_r.app.tasks import synchronize
+from pulp_r.tests.performance.benchmark import (
+    BenchmarkResults,
+    benchmark_sizes,
+    peak_rss,
+    requires_benchmarks,
+    reset_peak_rss,
+    stopwatch,
+)
+from pulp_r.tests.performance.cran import CONTRIB_PATH, CranServer, gen_cran_tree
+from pulp_r.tests.performance.utils import count_queries
+from pulp_r.tests.unit.utils import running_task
+
+SIZES = benchmark_sizes("PULP_R_BENCHMARK_SYNC_SIZES", (1000, 10000))
+TARBALL_SIZE = int(os.environ.get("PULP_R_BENCHMARK_TARBALL_SIZE", 16 * 1024))
+LATENCY = float(os.environ.get("PULP_R_BENCHMARK_LATENCY", 0))
+ERROR_RATE = float(os.environ.get("PULP_R_BENCHMARK_ERROR_RATE", 0))
+
+
+def tree_bytes(directory, policy):
+    """
+    Return the bytes a sync with ``policy`` downloads from the tree in ``directory``.
+    """
+    contrib = os.path.join(directory, CONTRIB_PATH)
+    return sum(
+        os.path.getsize(os.path.join(contrib, name))
+        for name in os.listdir(contrib)
+        if name == "PACKAGES.gz" or (policy == "immediate" and name.endswith(".tar.gz"))
+    )
+
+
+@requires_benchmarks
+class TestSyncBenchmark(TransactionTestCase):
+    """Measure the throughput of immediate and on_demand syncs."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = BenchmarkResults("sync")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.results.write()
+        super().tearDownClass()
+
+    def benchmark(self, policy):
+        for size in SIZES:
+            prefix = f"{policy.replace('_', '')}{size}n"
+            with tempfile.TemporaryDirectory() as directory:
+                gen_cran_tree(directory, size, tarball_size=TARBALL_SIZE, prefix=prefix)
+                with CranServer(directory, latency=LATENCY, error_rate=ERROR_RATE) as server:
+                    remote = RRemote.objects.create(name=prefix, url=server.url, policy=policy)
+                    repository = RRepository.objects.create(name=prefix)
+
+                    reset_peak_rss()
+                    with running_task(), count_queries() as queries, stopwatch() as elapsed:
+                        synchronize(remote.pk, repository.pk, mirror=True)
+
+                    repository.refresh_from_db()
+                    self.assertEqual(repository.latest_version().content.count(), size)
+                    downloaded = tree_bytes(directory, policy)
+                    self.results.add(
+                        f"sync.{policy}",
+                        policy=policy,
+                        packages=size,
+                        tarball_size=TARBALL_SIZE,
+                        latency=LATENCY,
+                        error_rate=ERROR_RATE,
+                        seconds=elapsed["seconds"],
+                        packages_per_second=size / elapsed["seconds"],
+                        bytes=downloaded,
+                        bytes_per_second=downloaded / elapsed["seconds"],
+                        peak_rss=peak_rss(),
+                        queries=queries.count,
+                        requests=server.requests,
+                        errors=server.errors,
+                    )
+
+    def test_immediate(self):
+        self.benchmark("immediate")
+
+    def test_on_demand(self):
+        self.benchmark("on_demand")
@@ -0,0 +1,105 @@
+"""Helpers for the performance tests of the r plugin."""
+
+import threading
+from contextlib import contextmanager
+from unittest import mock
+
+from django.db.backends.utils import CursorWrapper
+from pulpcore.plugin.models import ContentArtifact
+
+from pulp_r.app.metrics import TaskTimings
+from pulp_r.app.models import LAYER_BATCH_SIZE, RPackage, bulk_create_packages
+
+
+class QueryCounter:
+    """The number of SQL statements run by any thread while counting."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self):
+        with self._lock:
+            self.count += 1
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the SQL statements run in the block.
+
+    Unlike ``CaptureQueriesContext`` this also counts the statements of other threads and
+    connections, like those of the stages of a sync pipeline.
+    """
+    counter = QueryCounter()
+    execute = CursorWrapper._execute_with_wrappers
+
+    def counting_execute(self, *args, **kwargs):
+        counter.add()
+        return execute(self, *args, **kwargs)
+
+    with mock.patch.object(CursorWrapper, '_execute_with_wrappers', counting_execute):
+        yield counter
+
+
+@contextmanager
+def capture_timings():
+    """
+    Collect the ``TaskTimings`` of the tasks that finish in the block.
+    """
+    captured = []
+    record = TaskTimings.record
+
+    def capturing_record(self):
+        captured.append(self)
+        return record(self)
+
+    with mock.patch.object(TaskTimings, 'record', capturing_record):
+        yield captured
+
+
+def create_synthetic_packages(count, prefix='pkg'):
+    """
+    Insert ``count`` packages, ``LAYER_BATCH_SIZE`` rows per statement.
+
+    Returns:
+        The list of the inserted ``RPackage`` instances.
+    """
+    packages = [
+        RPackage(
+            name=f"{prefix}{index:06d}",
+            version='1.0-0',
+            summary='',
+            description='',
+            license='GPL-3',
+            url='',
+            imports=[{'package': f"{prefix}{index - 1:06d}"}] if index else [],
+        )
+        for index in range(count)
+    ]
+    bulk_create_packages(packages)
+    return packages
+
+
+def add_synthetic_packages(repository, count, prefix='pkg'):
+    """
+    Create ``count`` packages and add them in a new version of ``repository``.
+
+    The packages have no artifacts, as if they were synced on demand.
+
+    Returns:
+        The new repository version.
+    """
+    packages = create_synthetic_packages(count, prefix)
+    ContentArtifact.objects.bulk_create(
+        (
+            ContentArtifact(
+                content_id=package.pk, artifact=None, relative_path=f"{package.name}_1.0-0.tar.gz"
+            )
+            for package in packages
+        ),
+        batch_size=LAYER_BATCH_SIZE,
+    )
+    with repository.new_version() as new_version:
+        new_version.add_content(RPackage.objects.filter(pk__in=[p.pk for p in packages]))
+    return new_version
@@ -0,0 +1,115 @@
+from datetime import date
+
+from django.test import TestCase, override_settings
+from pulpcore.plugin.models import ContentArtifact, PublishedArtifact, RepositoryVersion
+
+from pulp_r.app.models import (
+    RDistribution,
+    RPackage,
+    RPublication,
+    RPublicationSnapshot,
+    RRepository,
+)
+from pulp_r.app.tasks.cleanup import delete_repository, retained_publication_ids
+from pulp_r.tests.unit.utils import create_package, create_version, running_task
+
+
+class TestRetainedPublications(TestCase):
+    """Test which publications cleanup keeps."""
+
+    def setUp(self):
+        self.repository = RRepository.objects.create(name='cleanup')
+        versions = [
+            create_version(self.repository, add=[create_package(f'pkg{number}', '1.0')])
+            for number in range(5)
+        ]
+        self.superseded = self.publish(versions[0])
+        self.base = self.publish(versions[1])
+        self.distributed = self.publish(versions[2], base=self.base)
+        self.snapshot = self.publish(versions[3])
+        self.latest = self.publish(versions[4], base=self.base)
+
+        RDistribution.objects.create(
+            name='cleanup', base_path='cleanup', publication=self.distributed
+        )
+        RPublicationSnapshot.objects.create(
+            repository=self.repository, date=date(2026, 1, 1), publication=self.snapshot
+        )
+
+    def publish(self, repository_version, base=None):
+        return RPublication.objects.create(
+            repository_version=repository_version, base=base, complete=True
+        )
+
+    def test_retained(self):
+        """Test that latest, distributed and snapshot publications and their bases are kept."""
+        expected = {self.base.pk, self.distributed.pk, self.snapshot.pk, self.latest.pk}
+        self.assertEqual(retained_publication_ids(self.repository.pk), expected)
+        self.assertEqual(retained_publication_ids(), expected)
+
+    def test_latest_per_repository(self):
+        """Test that the latest publication of every repository is kept."""
+        other = RRepository.objects.create(name='cleanup-other')
+        latest = self.publish(create_version(other, add=[create_package('other', '1.0')]))
+
+        self.assertIn(latest.pk, retained_publication_ids())
+        self.assertNotIn(latest.pk, retained_publication_ids(self.repository.pk))
+        self.assertNotIn(self.superseded.pk, retained_publication_ids())
+
+    def test_latest_of_same_version(self):
+        """Test that of two publications of the latest version only the newer one is latest."""
+        newer = self.publish(self.latest.repository_version)
+
+        retained = retained_publication_ids(self.repository.pk)
+        self.assertIn(newer.pk, retained)
+        self.assertNotIn(self.latest.pk, retained)
+        self.assertIn(self.base.pk, retained)
+
+    def test_incomplete(self):
+        """Test that an incomplete publication does not count as the latest one."""
+        RPublication.objects.create(repository_version=self.latest.repository_version)
+
+        self.assertIn(self.latest.pk, retained_publication_ids(self.repository.pk))
+
+
+@override_settings(R_DELETE_BATCH_SIZE=1)
+class TestDeleteRepository(TestCase):
+    """Test deleting a repository with its publications in batches."""
+
+    def setUp(self):
+        self.repository = RRepository.objects.create(name='delete')
+        self.packages = [create_package(f'pkg{number}', '1.0') for number in range(3)]
+        base = self.publish(create_version(self.repository, add=self.packages[:2]))
+        self.publish(create_version(self.repository, add=self.packages[2:]), base=base)
+        self.other = RRepository.objects.create(name='delete-other')
+        self.kept = self.publish(create_version(self.other, add=self.packages[:1]))
+
+    def publish(self, repository_version, base=None):
+        publication = RPublication.objects.create(
+            repository_version=repository_version, complete=True
+        )
+        publication.write_layer(
+            {
+                content_artifact.relative_path: content_artifact.pk
+                for content_artifact in ContentArtifact.objects.filter(
+                    content__in=repository_version.content
+                )
+            },
+            base=base,
+        )
+        return publication
+
+    def test_delete(self):
+        """Test that the repository goes with its versions and publications, not its content."""
+        with running_task():
+            delete_repository(str(self.repository.pk))
+
+        self.assertFalse(RRepository.objects.filter(pk=self.repository.pk).exists())
+        self.assertFalse(RepositoryVersion.objects.filter(repository=self.repository).exists())
+        self.assertEqual(list(RPublication.objects.all()), [self.kept])
+        self.assertEqual(
+            list(PublishedArtifact.objects.values_list('publication_id', flat=True)),
+            [self.kept.pk],
+        )
+        self.assertEqual(RPackage.objects.count(), 3)
+        self.assertEqual(self.other.latest_version().number, 1)
@@ -0,0 +1,50 @@
+from django.test import TestCase
+
+from pulp_r.app.models import RRepository
+from pulp_r.app.tasks.copying import dependency_closure
+from pulp_r.tests.unit.utils import create_package, create_version
+
+
+class TestDependencyClosure(TestCase):
+    """Test resolving everything packages depend on within a repository version."""
+
+    def setUp(self):
+        self.repository = RRepository.objects.create(name='closure')
+        self.a = create_package(
+            'a', '1.0',
+            depends=[{'package': 'R', 'version': '>= 4.0'}, {'package': 'b'}],
+            imports=[{'package': 'x'}],
+            suggests=[{'package': 's'}],
+        )
+        self.b = create_package('b', '1.0', imports=[{'package': 'c'}])
+        # Newer, but not in the repository version
+        self.b_new = create_package('b', '2.0', imports=[{'package': 'd'}])
+        self.c_old = create_package('c', '1.9', linking_to=[{'package': 'd'}])
+        self.c = create_package('c', '1.10', linking_to=[{'package': 'a'}])
+        self.d = create_package('d', '1.0')
+        self.s = create_package('s', '1.0')
+        self.version = create_version(
+            self.repository, add=[self.a, self.b, self.c_old, self.c, self.d, self.s]
+        )
+
+    def closure(self, *packages):
+        return dependency_closure(self.version, [package.pk for package in packages])
+
+    def test_transitive(self):
+        """Test that dependencies of dependencies resolve to the newest version in the version."""
+        self.assertEqual(self.closure(self.a), {self.a.pk, self.b.pk, self.c.pk})
+
+    def test_cycle(self):
+        """Test that a dependency cycle is followed once around."""
+        self.assertEqual(self.closure(self.c), {self.c.pk, self.a.pk, self.b.pk})
+
+    def test_missing(self):
+        """Test that packages missing from the version are skipped, even if they exist."""
+        closure = self.closure(self.a, self.d)
+        self.assertNotIn(self.b_new.pk, closure)
+        self.assertEqual(closure, {self.a.pk, self.b.pk, self.c.pk, self.d.pk})
+
+    def test_suggests(self):
+        """Test that suggested packages are not copied along."""
+        self.assertNotIn(self.s.pk, self.closure(self.a))
+        self.assertEqual(self.closure(self.s), {self.s.pk})
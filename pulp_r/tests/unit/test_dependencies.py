@@ -0,0 +1,122 @@
+from django.test import TestCase
+
+from pulp_r.app.dependencies import DependencyIndex, install_order, resolve_install_plan
+from pulp_r.app.models import RRepository
+from pulp_r.tests.unit.utils import create_package, create_version
+
+
+class TestDependencyIndex(TestCase):
+    """Test walking the dependency graph of a repository version."""
+
+    def setUp(self):
+        self.index = DependencyIndex([
+            ('Rcpp', '1.0.12', [{'package': 'R', 'version': '>= 3.5'}], [{'package': 'utils'}], []),
+            ('RcppEigen', '0.3.4', [], [{'package': 'Rcpp'}], [{'package': 'Rcpp'}]),
+            ('lme4', '1.1-35', [{'package': 'Matrix'}], [], [{'package': 'RcppEigen'}]),
+            ('glmmTMB', '1.1.9', [], [{'package': 'lme4'}], [{'package': 'RcppEigen'}]),
+            ('jsonlite', '1.8.8', None, None, None),
+        ])
+
+    def test_direct_reverse_dependencies(self):
+        """Test that only direct dependents are returned when not recursive."""
+        self.assertEqual(
+            self.index.reverse_dependencies('RcppEigen', recursive=False),
+            [('glmmTMB', 1, 'RcppEigen'), ('lme4', 1, 'RcppEigen')],
+        )
+
+    def test_recursive_reverse_dependencies(self):
+        """Test that every package is reached once, at its shortest distance."""
+        self.assertEqual(
+            self.index.reverse_dependencies('Rcpp'),
+            [('RcppEigen', 1, 'Rcpp'), ('glmmTMB', 2, 'RcppEigen'), ('lme4', 2, 'RcppEigen')],
+        )
+
+    def test_dependency_tree(self):
+        """Test that missing dependencies are listed and base packages are left out."""
+        self.assertEqual(
+            self.index.dependency_tree('lme4'),
+            [('Matrix', 1, 'lme4'), ('RcppEigen', 1, 'lme4'), ('Rcpp', 2, 'RcppEigen')],
+        )
+        self.assertNotIn('Matrix', self.index)
+        self.assertEqual(self.index.dependency_tree('Rcpp'), [])
+
+    def test_no_dependencies(self):
+        """Test that a package without dependency fields has no edges."""
+        self.assertEqual(self.index.dependency_tree('jsonlite'), [])
+        self.assertEqual(self.index.reverse_dependencies('jsonlite'), [])
+
+
+class TestInstallOrder(TestCase):
+    """Test ordering packages for installation."""
+
+    def test_dependencies_first(self):
+        """Test that every package comes after its dependencies, ignoring missing ones."""
+        self.assertEqual(
+            install_order({
+                'lme4': {'Matrix', 'RcppEigen'},
+                'RcppEigen': {'Rcpp'},
+                'Rcpp': set(),
+                'Matrix': {'lattice'},
+            }),
+            ['Matrix', 'Rcpp', 'RcppEigen', 'lme4'],
+        )
+
+    def test_cycle(self):
+        """Test that packages in a cycle are still returned."""
+        self.assertEqual(
+            install_order({'a': {'b'}, 'b': {'a'}, 'c': set()}),
+            ['c', 'a', 'b'],
+        )
+
+
+class TestResolveInstallPlan(TestCase):
+    """Test resolving requirements and their dependencies against a repository version."""
+
+    def setUp(self):
+        self.repository = RRepository.objects.create(name='install-plan')
+        self.rcpp_old = create_package('Rcpp', '1.0.9')
+        self.rcpp = create_package('Rcpp', '1.0.10', imports=[{'package': 'utils'}])
+        self.eigen = create_package(
+            'RcppEigen', '0.3.4',
+            imports=[{'package': 'Rcpp', 'version': '>= 1.0.10'}],
+            linking_to=[{'package': 'Rcpp'}],
+        )
+        self.lme4 = create_package(
+            'lme4', '1.1-35',
+            depends=[{'package': 'R', 'version': '>= 4.0'}, {'package': 'Matrix'}],
+            linking_to=[{'package': 'RcppEigen'}],
+        )
+        self.broken = create_package('broken', '1.0', imports=[{'package': 'Rcpp', 'version': 'x'}])
+        self.version = create_version(
+            self.repository, add=[self.rcpp_old, self.rcpp, self.eigen, self.lme4, self.broken]
+        )
+
+    def test_dependencies(self):
+        """Test that dependencies are resolved to their newest version and ordered first."""
+        packages, missing = resolve_install_plan(self.version, {'lme4': None})
+
+        self.assertEqual(packages, [self.rcpp, self.eigen, self.lme4])
+        self.assertEqual(missing, [('Matrix', None)])
+
+    def test_requirements_first(self):
+        """Test that a requirement takes precedence over the constraint of a dependency."""
+        packages, missing = resolve_install_plan(
+            self.version, {'RcppEigen': None, 'Rcpp': '== 1.0.9'}
+        )
+
+        self.assertEqual(packages, [self.rcpp_old, self.eigen])
+        self.assertEqual(missing, [])
+
+    def test_unsatisfied(self):
+        """Test that a requirement no version satisfies is missing."""
+        packages, missing = resolve_install_plan(self.version, {'Rcpp': '>= 2.0'})
+
+        self.assertEqual(packages, [])
+        self.assertEqual(missing, [('Rcpp', '>= 2.0')])
+
+    def test_invalid_dependency_constraint(self):
+        """Test that a dependency with an unparsable constraint is missing."""
+        packages, missing = resolve_install_plan(self.version, {'broken': None})
+
+        self.assertEqual(packages, [self.broken])
+        self.assertEqual(missing, [('Rcpp', 'x')])
@@ -0,0 +1,153 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from pulp_r.app.models import RPackage, RRepository
+from pulp_r.app.tasks.importing import (
+    import_packages,
+    indexed_files,
+    link_file,
+    reflink,
+    walk_files,
+)
+from pulp_r.tests.unit.utils import running_task, write_tarball
+
+
+def touch(path, data=b''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as fp:
+        fp.write(data)
+
+
+class TestImportFiles(TestCase):
+    """Test finding the tarballs to import from a directory."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_walk_files(self):
+        """Test that every source package below the root is found, and nothing else."""
+        outside = tempfile.NamedTemporaryFile(suffix='_1.0.tar.gz')
+        self.addCleanup(outside.close)
+        touch(os.path.join(self.root, 'src/contrib/a_1.0.tar.gz'))
+        touch(os.path.join(self.root, 'src/contrib/Archive/a/a_0.9.tar.gz'))
+        touch(os.path.join(self.root, 'src/contrib/PACKAGES'))
+        touch(os.path.join(self.root, 'bin/macosx/contrib/4.3/a_1.0.tgz'))
+        os.symlink(outside.name, os.path.join(self.root, 'src/contrib/b_1.0.tar.gz'))
+
+        self.assertEqual(
+            walk_files(self.root),
+            [
+                os.path.join(self.root, 'src/contrib/a_1.0.tar.gz'),
+                os.path.join(self.root, 'src/contrib/Archive/a/a_0.9.tar.gz'),
+            ],
+        )
+
+    def test_indexed_files(self):
+        """Test that listed tarballs are found relative to their Path, if inside the tree."""
+        contrib = os.path.join(self.root, 'src/contrib')
+        touch(os.path.join(contrib, 'a_1.0.tar.gz'))
+        touch(os.path.join(contrib, '4.3.0/Recommended/b_2.0.tar.gz'))
+        touch(os.path.join(self.root, 'c_3.0.tar.gz'))
+        touch(
+            os.path.join(contrib, 'PACKAGES'),
+            b"Package: a\nVersion: 1.0\n\n"
+            b"Package: b\nVersion: 2.0\nPath: 4.3.0/Recommended\n\n"
+            b"Package: c\nVersion: 3.0\nPath: ..\n\n"
+            b"Package: d\nVersion: 4.0\n",
+        )
+
+        self.assertEqual(
+            indexed_files(contrib),
+            [
+                os.path.join(contrib, 'a_1.0.tar.gz'),
+                os.path.join(contrib, '4.3.0/Recommended/b_2.0.tar.gz'),
+            ],
+        )
+
+
+class TestLinkFile(TestCase):
+    """Test linking tarballs into the working directory."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = os.path.join(self.tmp.name, 'a_1.0.tar.gz')
+        touch(self.source, b'tarball')
+        self.directory = os.path.join(self.tmp.name, 'work')
+        os.mkdir(self.directory)
+
+    def read(self, path):
+        with open(path, 'rb') as fp:
+            return fp.read()
+
+    def test_reflink(self):
+        """Test that a reflink is an independent copy, or is refused with an OSError."""
+        destination = os.path.join(self.directory, 'clone.tar.gz')
+        try:
+            reflink(self.source, destination)
+        except OSError:
+            self.assertFalse(os.path.exists(destination))
+            return
+        self.assertEqual(self.read(destination), b'tarball')
+        self.assertNotEqual(os.stat(destination).st_ino, os.stat(self.source).st_ino)
+
+    def test_no_hardlinks(self):
+        """Test that by default the source is never linked to, only cloned or left to copy."""
+        destination = link_file(self.source, self.directory)
+
+        if destination is not None:
+            self.assertEqual(os.path.dirname(destination), self.directory)
+            self.assertEqual(self.read(destination), b'tarball')
+            self.assertNotEqual(os.stat(destination).st_ino, os.stat(self.source).st_ino)
+        self.assertEqual(os.stat(self.source).st_nlink, 1)
+
+    @override_settings(R_IMPORT_HARDLINKS=True)
+    def test_hardlinks(self):
+        """Test that with R_IMPORT_HARDLINKS the source is hardlinked."""
+        destination = link_file(self.source, self.directory)
+
+        self.assertEqual(os.path.dirname(destination), self.directory)
+        self.assertEqual(os.stat(destination).st_ino, os.stat(self.source).st_ino)
+
+
+class TestImportPackages(TestCase):
+    """Test importing the tarballs of a directory into a repository."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.contrib = os.path.join(self.tmp.name, 'src', 'contrib')
+        os.makedirs(self.contrib)
+        write_tarball(self.contrib, 'a', '1.0')
+        touch(os.path.join(self.contrib, 'b_1.0.tar.gz'), b'not a tarball')
+        touch(
+            os.path.join(self.contrib, 'PACKAGES'),
+            b"Package: a\nVersion: 1.0\n\nPackage: b\nVersion: 1.0\n",
+        )
+        self.repository = RRepository.objects.create(name='import')
+        schedule_publish = mock.patch('pulp_r.app.tasks.importing.schedule_publish')
+        self.schedule_publish = schedule_publish.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_skip_invalid_indexed(self):
+        """Test that an invalid tarball listed in the index is skipped like a walked one."""
+        for walk in (False, True):
+            with self.subTest(walk=walk), running_task():
+                import_packages(str(self.repository.pk), self.tmp.name, walk=walk)
+
+                latest_version = self.repository.latest_version()
+                self.assertEqual(
+                    list(
+                        RPackage.objects.filter(pk__in=latest_version.content).values_list(
+                            'name', flat=True
+                        )
+                    ),
+                    ['a'],
+                )
@@ -0,0 +1,25 @@
+from django.test import TestCase
+
+from pulp_r.app.metrics import TaskTimings
+
+
+class TestTaskTimings(TestCase):
+    """Test collecting phase timings of a task."""
+
+    def test_timer(self):
+        """Test that every block is counted as a call, also when it raises."""
+        timings = TaskTimings('sync')
+        with timings.timer('parse_index'):
+            pass
+        with self.assertRaises(ValueError), timings.timer('parse_index'):
+            raise ValueError()
+        self.assertEqual(timings.calls['parse_index'], 2)
+        self.assertGreaterEqual(timings.seconds['parse_index'], 0)
+
+    def test_count(self):
+        """Test that counters add up."""
+        timings = TaskTimings('sync')
+        timings.count('packages', 10)
+        timings.count('packages')
+        self.assertEqual(timings.counters['packages'], 11)
+
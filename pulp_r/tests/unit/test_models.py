@@ -1,4 +1,25 @@
+from datetime import date, timedelta
+from importlib import import_module
+
+from django.apps import apps
 from django.test import TestCase
+from django.utils import timezone
+from pulpcore.plugin.models import Content, ContentArtifact, PublishedArtifact
+
+from pulp_r.app.models import (
+    RDistribution,
+    RPackage,
+    RPublication,
+    RPublicationSnapshot,
+    RRepository,
+    _cached_lookup_snapshot,
+    bulk_create_packages,
+    package_changes,
+    resolve_snapshot,
+    split_snapshot_path,
+)
+from pulp_r.app.utils import version_key
+from pulp_r.tests.unit.utils import create_package, create_version
 
 
 class TestNothing(TestCase):
@@ -7,3 +28,308 @@ class TestNothing(TestCase):
     def test_nothing_at_all(self):
         """Test that the tests are running and that's it."""
         self.assertTrue(True)
+
+
+class TestSplitSnapshotPath(TestCase):
+    """Test parsing of date-based snapshot paths."""
+
+    def test_dated_path(self):
+        """Test that a leading date is split from the relative path."""
+        self.assertEqual(
+            split_snapshot_path("2026-03-01/src/contrib/PACKAGES.gz"),
+            (date(2026, 3, 1), "src/contrib/PACKAGES.gz"),
+        )
+
+    def test_bare_date(self):
+        """Test that a date without a relative path yields an empty path."""
+        self.assertEqual(split_snapshot_path("2026-03-01"), (date(2026, 3, 1), ""))
+
+    def test_not_a_date(self):
+        """Test that paths not starting with a valid date are ignored."""
+        self.assertIsNone(split_snapshot_path("src/contrib/PACKAGES.gz"))
+        self.assertIsNone(split_snapshot_path("2026-02-30/src/contrib/PACKAGES.gz"))
+        self.assertIsNone(split_snapshot_path("2026-03-01.tar.gz"))
+
+
+class TestResolveSnapshot(TestCase):
+    """Test resolving the publication that was current for a repository on a date."""
+
+    def setUp(self):
+        _cached_lookup_snapshot.cache_clear()
+        self.addCleanup(_cached_lookup_snapshot.cache_clear)
+        self.repository = RRepository.objects.create(name='snapshots')
+        self.today = timezone.now().date()
+        self.first = self.snapshot(self.today - timedelta(days=10))
+        self.second = self.snapshot(self.today - timedelta(days=5))
+
+    def snapshot(self, day):
+        repository_version = create_version(
+            self.repository, add=[create_package(f'pkg{day:%Y%m%d}', '1.0')]
+        )
+        publication = RPublication.objects.create(
+            repository_version=repository_version, complete=True
+        )
+        RPublicationSnapshot.objects.create(
+            repository=self.repository, date=day, publication=publication
+        )
+        return publication
+
+    def test_closest_earlier_date(self):
+        """Test that a date without a snapshot resolves to the closest earlier one."""
+        for days_ago, expected in ((10, self.first), (7, self.first), (5, self.second),
+                                   (0, self.second)):
+            with self.subTest(days_ago=days_ago):
+                day = self.today - timedelta(days=days_ago)
+                self.assertEqual(resolve_snapshot(self.repository.pk, day), expected.pk)
+
+    def test_before_first(self):
+        """Test that dates before the first snapshot resolve to nothing."""
+        self.assertIsNone(resolve_snapshot(self.repository.pk, self.today - timedelta(days=11)))
+
+    def test_deleting(self):
+        """Test that publications being deleted are skipped."""
+        RPublication.objects.filter(pk=self.second.pk).update(deleting=True)
+        self.assertEqual(resolve_snapshot(self.repository.pk, self.today), self.first.pk)
+
+    def test_cached_past_days(self):
+        """Test that past days are cached and the current day is looked up every time."""
+        past = self.today - timedelta(days=1)
+        self.assertEqual(resolve_snapshot(self.repository.pk, past), self.second.pk)
+
+        latest = self.snapshot(self.today - timedelta(days=1))
+
+        self.assertEqual(resolve_snapshot(self.repository.pk, past), self.second.pk)
+        self.assertEqual(resolve_snapshot(self.repository.pk, self.today), latest.pk)
+
+
+class TestSnapshotContentHandler(TestCase):
+    """Test serving the paths of distributions in snapshot mode."""
+
+    def setUp(self):
+        _cached_lookup_snapshot.cache_clear()
+        self.addCleanup(_cached_lookup_snapshot.cache_clear)
+        self.repository = RRepository.objects.create(name='handler')
+        self.day = timezone.now().date() - timedelta(days=3)
+        self.publication, self.content_artifact = self.publish('a', '1.0')
+        self.distribution = RDistribution.objects.create(
+            name='handler', base_path='handler', repository=self.repository, snapshots=True
+        )
+
+    def publish(self, name, version):
+        package = create_package(name, version, relative_path='pkg.tar.gz')
+        publication = RPublication.objects.create(
+            repository_version=create_version(self.repository, add=[package]), complete=True
+        )
+        content_artifact = ContentArtifact.objects.get(content=package)
+        PublishedArtifact.objects.create(
+            publication=publication,
+            relative_path=content_artifact.relative_path,
+            content_artifact=content_artifact,
+        )
+        RPublicationSnapshot.objects.update_or_create(
+            repository=self.repository, date=self.day, defaults={'publication': publication}
+        )
+        return publication, content_artifact
+
+    def test_snapshot_path(self):
+        """Test that a dated path is served from the publication current on that date."""
+        self.assertEqual(
+            self.distribution.content_handler(f'{self.day}/pkg.tar.gz'), self.content_artifact
+        )
+
+    def test_snapshots_off(self):
+        """Test that dated paths are left alone unless snapshots are enabled."""
+        self.distribution.snapshots = False
+        self.assertIsNone(self.distribution.content_handler(f'{self.day}/pkg.tar.gz'))
+        self.assertEqual(self.distribution.content_handler('pkg.tar.gz'), self.content_artifact)
+
+    def test_deleting(self):
+        """Test that a publication being deleted is no longer served at the root."""
+        RPublication.objects.filter(pk=self.publication.pk).update(deleting=True)
+        self.assertIsNone(self.distribution.content_handler('pkg.tar.gz'))
+
+        self.distribution.repository = None
+        self.distribution.publication = self.publication
+        self.assertIsNone(self.distribution.content_handler('pkg.tar.gz'))
+
+    def test_deleted_publication_cached(self):
+        """Test that a cached resolution of a deleted publication is resolved again."""
+        self.distribution.content_handler(f'{self.day}/pkg.tar.gz')
+        self.publication.delete()
+        publication, content_artifact = self.publish('b', '1.0')
+
+        self.assertEqual(
+            self.distribution.content_handler(f'{self.day}/pkg.tar.gz'), content_artifact
+        )
+
+
+class TestBackfillSnapshots(TestCase):
+    """Test recording snapshots of the publications that existed before snapshots."""
+
+    def test_backfill(self):
+        """Test that the newest repository version published on each day is recorded."""
+        migration = import_module(
+            'pulp_r.app.migrations.0005_rdistribution_snapshots_rpublicationsnapshot'
+        )
+        repository = RRepository.objects.create(name='backfill')
+        versions = {
+            number: create_version(repository, add=[create_package(f'pkg{number}', '1.0')])
+            for number in (1, 2, 3)
+        }
+        publications = {}
+        # Version 1 is published after version 2 on the first day
+        for number, day, hour in ((2, 1, 9), (1, 1, 12), (3, 2, 9)):
+            publications[number] = RPublication.objects.create(
+                repository_version=versions[number], complete=True
+            )
+            created = timezone.now().replace(year=2026, month=1, day=day, hour=hour)
+            RPublication.objects.filter(pk=publications[number].pk).update(pulp_created=created)
+        RPublication.objects.create(repository_version=repository.latest_version())
+        RPublicationSnapshot.objects.all().delete()
+
+        migration.backfill_snapshots(apps, None)
+
+        self.assertEqual(
+            dict(RPublicationSnapshot.objects.values_list('date', 'publication_id')),
+            {date(2026, 1, 1): publications[2].pk, date(2026, 1, 2): publications[3].pk},
+        )
+
+
+class TestRetainPackageVersions(TestCase):
+    """Test keeping only the newest versions of each package in new repository versions."""
+
+    def setUp(self):
+        self.packages = [create_package('a', version) for version in ('1.2.3', '1.9', '1.10')]
+        self.packages.append(create_package('b', '0.1'))
+
+    def versions(self, repository_version):
+        return {
+            (package.name, package.version)
+            for package in RPackage.objects.filter(pk__in=repository_version.content)
+        }
+
+    def test_keep_all(self):
+        """Test that 0, the default, keeps every version."""
+        everything = {('a', '1.2.3'), ('a', '1.9'), ('a', '1.10'), ('b', '0.1')}
+        default = RRepository.objects.create(name='retain-default')
+        zero = RRepository.objects.create(name='retain-0', retain_package_versions=0)
+
+        self.assertEqual(default.retain_package_versions, 0)
+        self.assertEqual(self.versions(create_version(default, add=self.packages)), everything)
+        self.assertEqual(self.versions(create_version(zero, add=self.packages)), everything)
+
+    def test_keep_newest(self):
+        """Test that versions are ranked like R's package_version(), not as strings."""
+        for retain, expected in (
+            (1, {('a', '1.10'), ('b', '0.1')}),
+            (2, {('a', '1.10'), ('a', '1.9'), ('b', '0.1')}),
+        ):
+            with self.subTest(retain=retain):
+                repository = RRepository.objects.create(
+                    name=f'retain-{retain}', retain_package_versions=retain
+                )
+                repository_version = create_version(repository, add=self.packages)
+                self.assertEqual(self.versions(repository_version), expected)
+
+    def test_later_versions(self):
+        """Test that a newer upload supersedes the oldest retained version."""
+        repository = RRepository.objects.create(name='retain-later', retain_package_versions=2)
+        first = create_version(repository, add=self.packages)
+        second = create_version(repository, add=[create_package('a', '1.10.1')])
+
+        self.assertEqual(
+            self.versions(second), {('a', '1.10.1'), ('a', '1.10'), ('b', '0.1')}
+        )
+        self.assertEqual(self.versions(first), {('a', '1.10'), ('a', '1.9'), ('b', '0.1')})
+
+
+class TestBulkCreatePackages(TestCase):
+    """Test inserting packages in batches."""
+
+    def test_insert(self):
+        """Test that the rows of new packages are complete."""
+        packages = [
+            RPackage(name='a', version='1.10-2', imports=[{'package': 'b'}]),
+            RPackage(name='b', version='0.9'),
+        ]
+        self.assertEqual(bulk_create_packages(packages, batch_size=1), packages)
+
+        stored = RPackage.objects.get(name='a')
+        self.assertEqual(stored.pk, packages[0].pk)
+        self.assertEqual(stored.version_key, version_key('1.10-2'))
+        self.assertEqual(stored.pulp_type, RPackage.get_pulp_type())
+        self.assertEqual(stored.imports, [{'package': 'b'}])
+        self.assertEqual(Content.objects.get(pk=stored.pk).pulp_type, RPackage.get_pulp_type())
+        self.assertFalse(packages[0]._state.adding)
+
+    def test_existing(self):
+        """Test that packages stored already, or twice in the batch, are reused."""
+        existing = RPackage.objects.create(name='a', version='1.0')
+        packages = [
+            RPackage(name='a', version='1.0'),
+            RPackage(name='b', version='2.0'),
+            RPackage(name='b', version='2.0'),
+        ]
+
+        saved = bulk_create_packages(packages)
+
+        self.assertEqual(
+            [package.pk for package in saved], [existing.pk, packages[1].pk, packages[1].pk]
+        )
+        self.assertIs(saved[1], packages[1])
+        self.assertEqual(RPackage.objects.count(), 2)
+        self.assertFalse(
+            Content.objects.filter(pk__in=[packages[0].pulp_id, packages[2].pulp_id]).exists()
+        )
+
+
+class TestPackageChanges(TestCase):
+    """Test comparing the newest package versions of two repository versions."""
+
+    def setUp(self):
+        repository = RRepository.objects.create(name='changes')
+        a_old, b, c, d, e_old = (
+            create_package(name, version)
+            for name, version in (
+                ('a', '1.9'), ('b', '1.0'), ('c', '2.0'), ('d', '1.0-1'), ('e', '1.0')
+            )
+        )
+        self.base = create_version(repository, add=[a_old, b, c, d, e_old])
+        self.version = create_version(
+            repository,
+            add=[
+                create_package('a', '1.10'),
+                create_package('c', '1.0'),
+                create_package('d', '1.0.1'),
+                create_package('f', '0.1'),
+            ],
+            remove=[a_old, c, d, e_old],
+        )
+
+    def test_changes(self):
+        """Test that every changed package is reported once, ordered by name."""
+        self.assertEqual(
+            [
+                (change['name'], change['change'], change['base_version'], change['version'])
+                for change in package_changes(self.base, self.version)
+            ],
+            [
+                ('a', 'upgraded', '1.9', '1.10'),
+                ('c', 'downgraded', '2.0', '1.0'),
+                ('d', 'changed', '1.0-1', '1.0.1'),
+                ('e', 'removed', '1.0', None),
+                ('f', 'added', None, '0.1'),
+            ],
+        )
+
+    def test_pages(self):
+        """Test that the changes are paged by name."""
+        first = package_changes(self.base, self.version, limit=2)
+        rest = package_changes(self.base, self.version, after=first[-1]['name'])
+
+        self.assertEqual([change['name'] for change in first], ['a', 'c'])
+        self.assertEqual([change['name'] for change in rest], ['d', 'e', 'f'])
+
+    def test_same_version(self):
+        """Test that a version compared to itself has no changes."""
+        self.assertEqual(package_changes(self.version, self.version), [])
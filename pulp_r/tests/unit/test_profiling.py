@@ -0,0 +1,43 @@
+import os
+import pstats
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from pulp_r.app.profiling import profiled
+
+
+@profiled
+def add(a, b):
+    return a + b
+
+
+class TestProfiled(TestCase):
+    """Test the opt-in task profiler."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_disabled(self):
+        """Test that nothing is written without R_TASK_PROFILE."""
+        with override_settings(R_TASK_PROFILE=None, R_TASK_PROFILE_DIR=self.directory.name):
+            self.assertEqual(add(1, 2), 3)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_cprofile(self):
+        """Test that a pstats file named after the task function is written."""
+        with override_settings(R_TASK_PROFILE='cprofile', R_TASK_PROFILE_DIR=self.directory.name):
+            self.assertEqual(add(1, 2), 3)
+        (name,) = os.listdir(self.directory.name)
+        self.assertTrue(name.endswith('.add.pstats'))
+        pstats.Stats(os.path.join(self.directory.name, name))
+
+    def test_tracemalloc(self):
+        """Test that a memory snapshot is written."""
+        with override_settings(
+            R_TASK_PROFILE='tracemalloc', R_TASK_PROFILE_DIR=self.directory.name
+        ):
+            self.assertEqual(add(1, 2), 3)
+        (name,) = os.listdir(self.directory.name)
+        self.assertTrue(name.endswith('.add.tracemalloc'))
@@ -0,0 +1,298 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from pulpcore.plugin.models import ContentArtifact, PublishedArtifact, Task
+
+from pulp_r.app.models import (
+    RPublication,
+    RPublicationSnapshot,
+    RRepository,
+    published_content_artifact,
+)
+from pulp_r.app.tasks.cleanup import delete_publications
+from pulp_r.app.tasks.publishing import (
+    find_delta_base,
+    publish,
+    publish_pending,
+    record_snapshot,
+    schedule_publish,
+)
+from pulp_r.tests.unit.utils import create_package, create_version, running_task
+
+
+def package_paths(publication):
+    """The package paths served by a publication, leaving out its PACKAGES index."""
+    return {
+        path: content_artifact
+        for path, content_artifact in publication.effective_paths().items()
+        if path.endswith('.tar.gz')
+    }
+
+
+@override_settings(R_PUBLICATION_DELTA_MAX_RATIO=1)
+class TestDeltaPublications(TestCase):
+    """Test layering publications on a base publication."""
+
+    def setUp(self):
+        self.repository = RRepository.objects.create(name='deltas')
+        self.a, self.b, self.c, self.d = (
+            create_package(name, '1.0') for name in ('a', 'b', 'c', 'd')
+        )
+        self.base = self.publish(create_version(self.repository, add=[self.a, self.b, self.c]))
+
+    def publish(self, repository_version):
+        with running_task():
+            publish(repository_version.pk)
+        return RPublication.objects.get(repository_version=repository_version)
+
+    def content_artifact(self, package):
+        return ContentArtifact.objects.get(content=package).pk
+
+    def test_full_base(self):
+        """Test that the first publication stores every path."""
+        self.assertIsNone(self.base.base)
+        self.assertEqual(
+            package_paths(self.base),
+            {
+                'a_1.0.tar.gz': self.content_artifact(self.a),
+                'b_1.0.tar.gz': self.content_artifact(self.b),
+                'c_1.0.tar.gz': self.content_artifact(self.c),
+            },
+        )
+
+    def test_delta_over_base(self):
+        """Test that a delta only stores the added paths and serves those of its base too."""
+        delta = self.publish(create_version(self.repository, add=[self.d]))
+
+        self.assertEqual(delta.base, self.base)
+        self.assertEqual(
+            set(
+                PublishedArtifact.objects.filter(publication=delta)
+                .exclude(relative_path='PACKAGES')
+                .values_list('relative_path', flat=True)
+            ),
+            {'d_1.0.tar.gz'},
+        )
+        self.assertEqual(set(package_paths(delta)), {f'{n}_1.0.tar.gz' for n in 'abcd'})
+        self.assertEqual(
+            published_content_artifact(delta.pk, 'a_1.0.tar.gz').pk, self.content_artifact(self.a)
+        )
+
+    def test_removed_paths(self):
+        """Test that paths of removed packages are hidden instead of copied."""
+        delta = self.publish(create_version(self.repository, remove=[self.b]))
+
+        self.assertEqual(delta.base, self.base)
+        self.assertEqual(
+            list(delta.removed_paths.values_list('relative_path', flat=True)), ['b_1.0.tar.gz']
+        )
+        self.assertEqual(set(package_paths(delta)), {'a_1.0.tar.gz', 'c_1.0.tar.gz'})
+        self.assertIsNone(published_content_artifact(delta.pk, 'b_1.0.tar.gz'))
+
+    def test_replaced_path(self):
+        """Test that a path removed with one package and added with another is not hidden."""
+        replacement = create_package('b', '1.0-1', relative_path='b_1.0.tar.gz')
+        delta = self.publish(
+            create_version(self.repository, add=[replacement], remove=[self.b])
+        )
+
+        self.assertFalse(delta.removed_paths.exists())
+        self.assertEqual(package_paths(delta)['b_1.0.tar.gz'], self.content_artifact(replacement))
+        self.assertEqual(
+            published_content_artifact(delta.pk, 'b_1.0.tar.gz').pk,
+            self.content_artifact(replacement),
+        )
+
+    def test_delete_base_with_deltas(self):
+        """Test that the oldest delta becomes the full base of the others when the base goes."""
+        first = self.publish(create_version(self.repository, add=[self.d]))
+        second = self.publish(create_version(self.repository, remove=[self.a]))
+        expected = {first.pk: package_paths(first), second.pk: package_paths(second)}
+
+        self.base.delete()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNone(first.base)
+        self.assertFalse(first.removed_paths.exists())
+        self.assertEqual(second.base, first)
+        self.assertEqual(package_paths(first), expected[first.pk])
+        self.assertEqual(package_paths(second), expected[second.pk])
+
+    def test_rebase_in_batches(self):
+        """Test that deltas rebased one row at a time serve the same paths."""
+        first = self.publish(create_version(self.repository, add=[self.d]))
+        second = self.publish(create_version(self.repository, remove=[self.a, self.b]))
+        expected = {first.pk: package_paths(first), second.pk: package_paths(second)}
+
+        with override_settings(R_DELETE_BATCH_SIZE=1):
+            self.base.rebase_deltas()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNone(first.base)
+        self.assertEqual(second.base, first)
+        self.assertEqual(
+            set(second.removed_paths.values_list('relative_path', flat=True)),
+            {'a_1.0.tar.gz', 'b_1.0.tar.gz'},
+        )
+        self.assertEqual(package_paths(first), expected[first.pk])
+        self.assertEqual(package_paths(second), expected[second.pk])
+
+    def test_delete_base_and_deltas(self):
+        """Test that deltas deleted along with their base are not rebased first."""
+        first = self.publish(create_version(self.repository, add=[self.d]))
+        second = self.publish(create_version(self.repository, remove=[self.a]))
+        expected = package_paths(second)
+
+        delete_publications(RPublication.objects.filter(pk__in=[self.base.pk, first.pk]))
+
+        second.refresh_from_db()
+        self.assertEqual(list(RPublication.objects.all()), [second])
+        self.assertIsNone(second.base)
+        self.assertEqual(package_paths(second), expected)
+
+    def test_delete_all(self):
+        """Test that a base and all of its deltas can be deleted in one go."""
+        self.publish(create_version(self.repository, add=[self.d]))
+        self.publish(create_version(self.repository, remove=[self.a]))
+
+        RPublication.objects.filter(repository_version__repository=self.repository).delete()
+
+        self.assertFalse(RPublication.objects.exists())
+
+    def test_max_ratio(self):
+        """Test that a delta is only layered while the churn stays within the ratio."""
+        e = create_package('e', '1.0')
+        repository_version = create_version(self.repository, add=[self.d, e])
+
+        self.assertEqual(find_delta_base(repository_version), self.base)
+        with override_settings(R_PUBLICATION_DELTA_MAX_RATIO=0.25):
+            self.assertIsNone(find_delta_base(repository_version))
+        with override_settings(R_PUBLICATION_DELTA_MAX_RATIO=0):
+            self.assertIsNone(find_delta_base(repository_version))
+
+    def test_base_being_deleted(self):
+        """Test that nothing is layered on a publication that is being deleted."""
+        delta = self.publish(create_version(self.repository, add=[self.d]))
+        repository_version = create_version(self.repository, remove=[self.c])
+
+        RPublication.objects.filter(pk=delta.pk).update(deleting=True)
+        self.assertEqual(find_delta_base(repository_version), self.base)
+        RPublication.objects.filter(pk=self.base.pk).update(deleting=True)
+        self.assertIsNone(find_delta_base(repository_version))
+
+    def test_base_of_previous_delta(self):
+        """Test that a delta is layered on the base of the previous delta, not on the delta."""
+        self.publish(create_version(self.repository, add=[self.d]))
+        repository_version = create_version(self.repository, remove=[self.c])
+
+        self.assertEqual(find_delta_base(repository_version), self.base)
+
+
+class TestRecordSnapshot(TestCase):
+    """Test recording the publication current for a repository today."""
+
+    def setUp(self):
+        self.repository = RRepository.objects.create(name='snapshot')
+        self.publications = [
+            RPublication.objects.create(
+                repository_version=create_version(
+                    self.repository, add=[create_package(f'pkg{number}', '1.0')]
+                ),
+                complete=True,
+            )
+            for number in range(3)
+        ]
+
+    def snapshots(self):
+        return dict(
+            RPublicationSnapshot.objects.filter(repository=self.repository).values_list(
+                'date', 'publication_id'
+            )
+        )
+
+    def test_record(self):
+        """Test that the first publication of the day is recorded."""
+        record_snapshot(self.publications[0])
+        self.assertEqual(self.snapshots(), {timezone.now().date(): self.publications[0].pk})
+
+    def test_newer_version(self):
+        """Test that a publication of a newer version replaces the one recorded today."""
+        record_snapshot(self.publications[0])
+        record_snapshot(self.publications[2])
+        self.assertEqual(self.snapshots(), {timezone.now().date(): self.publications[2].pk})
+
+    def test_older_version(self):
+        """Test that a publication of an older version does not replace a newer one."""
+        record_snapshot(self.publications[2])
+        record_snapshot(self.publications[1])
+        self.assertEqual(self.snapshots(), {timezone.now().date(): self.publications[2].pk})
+
+
+class TestPublishCoalescing(TestCase):
+    """Test coalescing the publications requested by uploads."""
+
+    def setUp(self):
+        self.repository = RRepository.objects.create(name='coalescing')
+        self.latest_version = create_version(self.repository, add=[create_package('a', '1.0')])
+        dispatch = mock.patch('pulp_r.app.tasks.publishing.dispatch', side_effect=self.dispatch)
+        publish = mock.patch('pulp_r.app.tasks.publishing.publish')
+        self.dispatch = dispatch.start()
+        self.publish = publish.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def dispatch(self, *args, **kwargs):
+        return Task.objects.create(name='publish_pending', state='waiting')
+
+    def test_one_task_per_burst(self):
+        """Test that a burst of requests queues a single task."""
+        tasks = {schedule_publish(self.repository) for _ in range(3)}
+
+        self.dispatch.assert_called_once()
+        self.assertEqual(len(tasks), 1)
+        self.repository.refresh_from_db()
+        self.assertEqual(self.repository.publish_task, tasks.pop())
+
+    def test_publish(self):
+        """Test that the latest version is published once and the task is released."""
+        schedule_publish(self.repository)
+
+        publish_pending(str(self.repository.pk))
+
+        self.publish.assert_called_once_with(self.latest_version.pk)
+        self.dispatch.assert_called_once()
+        self.repository.refresh_from_db()
+        self.assertIsNone(self.repository.publish_task)
+
+    def test_request_while_publishing(self):
+        """Test that a request arriving during a publication is published by the same task."""
+        task = schedule_publish(self.repository)
+        later = create_version(self.repository, add=[create_package('b', '1.0')])
+
+        def request_while_publishing(pk):
+            if self.publish.call_count == 1:
+                self.assertEqual(schedule_publish(self.repository), task)
+
+        self.publish.side_effect = request_while_publishing
+
+        publish_pending(str(self.repository.pk))
+
+        self.dispatch.assert_called_once()
+        self.assertEqual(
+            self.publish.call_args_list, [mock.call(later.pk), mock.call(later.pk)]
+        )
+        self.repository.refresh_from_db()
+        self.assertIsNone(self.repository.publish_task)
+
+    def test_already_published(self):
+        """Test that a version that already has a publication is not published again."""
+        RPublication.objects.create(repository_version=self.latest_version, complete=True)
+        schedule_publish(self.repository)
+
+        publish_pending(str(self.repository.pk))
+
+        self.publish.assert_not_called()
+        self.repository.refresh_from_db()
+        self.assertIsNone(self.repository.publish_task)
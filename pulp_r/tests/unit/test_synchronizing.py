@@ -0,0 +1,96 @@
+import asyncio
+import inspect
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from pulpcore.plugin.models import Artifact, ContentArtifact
+from pulpcore.plugin.stages import ArtifactDownloader, DeclarativeArtifact, DeclarativeContent
+
+from pulp_r.app.metrics import TaskTimings
+from pulp_r.app.models import RPackage, RRemote
+from pulp_r.app.tasks.synchronizing import (
+    RContentSaver,
+    TimedArtifactDownloader,
+    TimedBatchesMixin,
+)
+
+
+class ListStage:
+    """A stand-in for a pipeline stage handing out fixed batches."""
+
+    def __init__(self, batches):
+        self._batches = batches
+
+    async def batches(self, minsize=500):
+        for batch in self._batches:
+            yield batch
+
+
+class TimedListStage(TimedBatchesMixin, ListStage):
+    phase = 'save_content'
+
+
+class TestTimedBatches(SimpleTestCase):
+    """Test timing the stages of a sync pipeline."""
+
+    def test_batches(self):
+        """Test that every batch is timed as a call and handed out unchanged."""
+        timings = TaskTimings('sync')
+        stage = TimedListStage(timings, [[1, 2], [3]])
+
+        async def consume():
+            return [batch async for batch in stage.batches()]
+
+        self.assertEqual(asyncio.run(consume()), [[1, 2], [3]])
+        self.assertEqual(timings.calls['save_content'], 2)
+
+    def test_downloads(self):
+        """Test that the hook of pulpcore's downloader stage is still called and is timed."""
+        self.assertIn('self._handle_content_unit(', inspect.getsource(ArtifactDownloader.run))
+        timings = TaskTimings('sync')
+        stage = TimedArtifactDownloader(timings)
+        d_content = DeclarativeContent(content=RPackage(name='a', version='1.0'))
+
+        with mock.patch.object(ArtifactDownloader, 'put', new_callable=mock.AsyncMock) as put:
+            self.assertEqual(asyncio.run(stage._handle_content_unit(d_content)), 0)
+
+        put.assert_awaited_once_with(d_content)
+        self.assertEqual(timings.calls['download_artifacts'], 1)
+
+
+class TestRContentSaver(TestCase):
+    """Test saving the new packages of a sync batch in bulk."""
+
+    def setUp(self):
+        self.remote = RRemote.objects.create(
+            name='saver', url='https://cran.example.org/src/contrib/PACKAGES.gz'
+        )
+
+    def declarative_content(self, name, version):
+        d_artifact = DeclarativeArtifact(
+            artifact=Artifact(),
+            url=f"https://cran.example.org/src/contrib/{name}_{version}.tar.gz",
+            relative_path=f"{name}_{version}.tar.gz",
+            remote=self.remote,
+            deferred_download=True,
+        )
+        return DeclarativeContent(
+            content=RPackage(name=name, version=version), d_artifacts=[d_artifact]
+        )
+
+    def test_new_packages(self):
+        """Test that new packages are inserted with a ContentArtifact each."""
+        on_demand = self.declarative_content('a', '1.0')
+        existing = RPackage.objects.create(name='b', version='2.0')
+        saved_meanwhile = self.declarative_content('b', '2.0')
+
+        RContentSaver()._pre_save([on_demand, saved_meanwhile])
+
+        package = RPackage.objects.get(name='a')
+        self.assertEqual(on_demand.content, package)
+        self.assertFalse(on_demand.content._state.adding)
+        content_artifact = ContentArtifact.objects.get(content=package)
+        self.assertIsNone(content_artifact.artifact)
+        self.assertEqual(content_artifact.relative_path, 'a_1.0.tar.gz')
+        self.assertEqual(saved_meanwhile.content, existing)
+        self.assertFalse(ContentArtifact.objects.filter(content=existing).exists())
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from pulpcore.plugin.models import (
+    Artifact,
+    ContentArtifact,
+    CreatedResource,
+    PulpTemporaryFile,
+    Task,
+)
+from pulpcore.plugin.util import get_url
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from pulp_r.app import tasks
+from pulp_r.app.models import RPackage, RRepository
+from pulp_r.app.tasks.uploading import _ingest_temp_file, ingest, upload_packages
+from pulp_r.app.viewsets import RPackageViewSet, RRepositoryViewSet
+from pulp_r.tests.unit.utils import running_task, write_tarball
+
+
+def uploaded_file(path):
+    with open(path, 'rb') as fp:
+        return SimpleUploadedFile(os.path.basename(path), fp.read())
+
+
+def create_temp_file(path):
+    temp_file = PulpTemporaryFile(file=uploaded_file(path))
+    temp_file.save()
+    return temp_file
+
+
+class TestIngest(TestCase):
+    """Test creating packages from uploaded tarballs."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.a = write_tarball(self.tmp.name, 'a', '1.0', Imports='b (>= 0.9)')
+        self.b = write_tarball(self.tmp.name, 'b', '0.9', NeedsCompilation='yes')
+        schedule_publish = mock.patch('pulp_r.app.tasks.uploading.schedule_publish')
+        self.schedule_publish = schedule_publish.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_ingest(self):
+        """Test that packages are created from their DESCRIPTION with a stored artifact."""
+        packages, created = ingest(
+            [create_temp_file(self.a), create_temp_file(self.b)], _ingest_temp_file
+        )
+
+        self.assertEqual([(p.name, p.version) for p in packages], [('a', '1.0'), ('b', '0.9')])
+        self.assertEqual(created, packages)
+        self.assertEqual(packages[0].imports, [{'package': 'b', 'version': '>= 0.9'}])
+        self.assertTrue(packages[1].needs_compilation)
+        with open(self.a, 'rb') as fp:
+            data = fp.read()
+        self.assertEqual(packages[0].md5sum, hashlib.md5(data).hexdigest())
+        content_artifact = ContentArtifact.objects.get(content=packages[0])
+        self.assertEqual(content_artifact.relative_path, 'a_1.0.tar.gz')
+        self.assertEqual(content_artifact.artifact.sha256, hashlib.sha256(data).hexdigest())
+
+    def test_duplicates(self):
+        """Test that the same tarball uploaded twice creates one artifact and one package."""
+        packages, created = ingest(
+            [create_temp_file(self.a), create_temp_file(self.a)], _ingest_temp_file
+        )
+        again, created_again = ingest([create_temp_file(self.a)], _ingest_temp_file)
+
+        self.assertEqual(packages[0], packages[1])
+        self.assertEqual(created, [packages[0]])
+        self.assertEqual(again, [packages[0]])
+        self.assertEqual(created_again, [])
+        self.assertEqual(Artifact.objects.count(), 1)
+
+    def test_invalid(self):
+        """Test that a tarball without DESCRIPTION fails the ingest."""
+        invalid = os.path.join(self.tmp.name, 'invalid_1.0.tar.gz')
+        with open(invalid, 'wb') as fp:
+            fp.write(b'not a tarball')
+
+        with self.assertRaises(ValueError):
+            ingest([create_temp_file(self.a), create_temp_file(invalid)], _ingest_temp_file)
+
+    def test_skip_invalid(self):
+        """Test that invalid tarballs are skipped with skip_invalid."""
+        invalid = os.path.join(self.tmp.name, 'invalid_1.0.tar.gz')
+        with open(invalid, 'wb') as fp:
+            fp.write(b'not a tarball')
+
+        packages, created = ingest(
+            [create_temp_file(invalid), create_temp_file(self.a)],
+            _ingest_temp_file,
+            skip_invalid=True,
+        )
+
+        self.assertEqual([(p.name, p.version) for p in packages], [('a', '1.0')])
+        self.assertEqual(Artifact.objects.count(), 1)
+
+    def test_upload_packages(self):
+        """Test that uploads and artifacts are added in one repository version and published."""
+        repository = RRepository.objects.create(name='upload')
+        artifact = Artifact.init_and_validate(self.b)
+        artifact.save()
+        temp_file = create_temp_file(self.a)
+
+        upload_packages([str(temp_file.pk)], [str(artifact.pk)], str(repository.pk))
+
+        latest_version = repository.latest_version()
+        self.assertEqual(latest_version.number, 1)
+        self.assertEqual(
+            set(RPackage.objects.filter(pk__in=latest_version.content).values_list('name')),
+            {('a',), ('b',)},
+        )
+        self.assertFalse(PulpTemporaryFile.objects.filter(pk=temp_file.pk).exists())
+        self.schedule_publish.assert_called_once_with(repository)
+
+
+class TestCreatePackage(TestCase):
+    """Test creating a package from a tarball through the packages endpoint."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.repository = RRepository.objects.create(name='create')
+        self.user = get_user_model().objects.create(username='create', is_superuser=True)
+        self.task = Task.objects.create(name='general_create', state='waiting')
+        dispatch = mock.patch('pulpcore.plugin.viewsets.content.dispatch', return_value=self.task)
+        schedule_publish = mock.patch('pulp_r.app.serializers.schedule_publish')
+        self.dispatch = dispatch.start()
+        self.schedule_publish = schedule_publish.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def create(self, data):
+        """Post ``data`` to the packages endpoint, then run the task it dispatched."""
+        request = APIRequestFactory().post('/', data, format='multipart')
+        force_authenticate(request, self.user)
+        response = RPackageViewSet.as_view({'post': 'create'})(request)
+        self.assertEqual(response.status_code, 202)
+        self.dispatch.assert_called_once()
+        task, kwargs = self.dispatch.call_args.args[0], self.dispatch.call_args.kwargs
+        with running_task():
+            task(*kwargs['args'], **kwargs['kwargs'])
+
+    def test_create(self):
+        """Test that the metadata is read from the DESCRIPTION and the package added."""
+        path = write_tarball(
+            self.tmp.name, 'a', '1.0', Title='A package', Depends='R (>= 4.0), b'
+        )
+
+        self.create({'file': uploaded_file(path), 'repository': get_url(self.repository)})
+
+        package = RPackage.objects.get()
+        self.assertEqual((package.name, package.version), ('a', '1.0'))
+        self.assertEqual(package.summary, 'A package')
+        self.assertEqual(package.depends, [{'package': 'R', 'version': '>= 4.0'}, {'package': 'b'}])
+        self.assertTrue(package.md5sum)
+        self.assertEqual(ContentArtifact.objects.get(content=package).relative_path, 'a_1.0.tar.gz')
+        self.assertTrue(CreatedResource.objects.filter(object_id=package.pk).exists())
+        latest_version = self.repository.latest_version()
+        self.assertEqual(latest_version.number, 1)
+        self.assertEqual(list(latest_version.content), [package.content_ptr])
+        self.schedule_publish.assert_called_once()
+        self.assertEqual(self.schedule_publish.call_args.args[0].pk, self.repository.pk)
+
+    def test_existing(self):
+        """Test that uploading a package again reuses it."""
+        path = write_tarball(self.tmp.name, 'a', '1.0')
+        self.create({'file': uploaded_file(path)})
+        self.dispatch.reset_mock()
+        artifact = get_url(Artifact.objects.get())
+
+        self.create({'artifact': artifact})
+
+        self.assertEqual(RPackage.objects.count(), 1)
+        self.schedule_publish.assert_not_called()
+
+    def test_invalid(self):
+        """Test that a file without DESCRIPTION fails the task."""
+        path = os.path.join(self.tmp.name, 'invalid_1.0.tar.gz')
+        with open(path, 'wb') as fp:
+            fp.write(b'not a tarball')
+
+        with self.assertRaises(ValidationError):
+            self.create({'file': uploaded_file(path)})
+        self.assertFalse(RPackage.objects.exists())
+
+
+class TestRepositoryUploadActions(TestCase):
+    """Test the upload_content and bulk_upload actions of repositories."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.repository = RRepository.objects.create(name='bulk')
+        self.user = get_user_model().objects.create(username='bulk', is_superuser=True)
+        self.task = Task.objects.create(name='upload_packages', state='waiting')
+        dispatch = mock.patch('pulp_r.app.viewsets.dispatch', return_value=self.task)
+        self.dispatch = dispatch.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def post(self, data, action='bulk_upload'):
+        request = APIRequestFactory().post('/', data, format='multipart')
+        force_authenticate(request, self.user)
+        view = RRepositoryViewSet.as_view({'post': action})
+        return view(request, pk=self.repository.pk)
+
+    def test_upload_content(self):
+        """Test that an uploaded file is stored and handed to a task with the repository."""
+        path = write_tarball(self.tmp.name, 'a', '1.0')
+
+        response = self.post({'file': uploaded_file(path)}, action='upload_content')
+
+        self.assertEqual(response.status_code, 202)
+        self.dispatch.assert_called_once_with(
+            tasks.upload_packages,
+            exclusive_resources=[self.repository],
+            kwargs={
+                'temp_file_pks': [str(PulpTemporaryFile.objects.get().pk)],
+                'repository_pk': str(self.repository.pk),
+            },
+        )
+
+    def test_files(self):
+        """Test that the uploaded files are stored and handed to a single task."""
+        files = [
+            uploaded_file(write_tarball(self.tmp.name, name, '1.0')) for name in ('a', 'b')
+        ]
+
+        response = self.post({'files': files})
+
+        self.assertEqual(response.status_code, 202)
+        self.dispatch.assert_called_once()
+        args, kwargs = self.dispatch.call_args
+        self.assertEqual(args, (tasks.upload_packages,))
+        self.assertEqual(kwargs['exclusive_resources'], [self.repository])
+        self.assertEqual(
+            set(kwargs['kwargs']['temp_file_pks']),
+            {str(pk) for pk in PulpTemporaryFile.objects.values_list('pk', flat=True)},
+        )
+        self.assertEqual(len(kwargs['kwargs']['temp_file_pks']), 2)
+        self.assertEqual(kwargs['kwargs']['artifact_pks'], [])
+        self.assertEqual(kwargs['kwargs']['repository_pk'], str(self.repository.pk))
+
+    def test_nothing(self):
+        """Test that a request without files or artifacts is rejected."""
+        response = self.post({})
+
+        self.assertEqual(response.status_code, 400)
+        self.dispatch.assert_not_called()
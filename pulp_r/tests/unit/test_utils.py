@@ -0,0 +1,153 @@
+import io
+import tarfile
+
+from django.db.models import Q
+from django.test import TestCase
+
+from pulp_r.app.models import RPackage
+from pulp_r.app.utils import (
+    package_fields,
+    parse_dcf,
+    parse_dependencies,
+    read_description,
+    version_constraint_q,
+    version_key,
+)
+
+DESCRIPTION = b"""Package: mypkg
+Version: 1.2-3
+Title: My Package
+Description: Does things,
+    over several lines.
+Depends: R (>= 3.5.0), methods
+Imports: Rcpp (>= 1.0.0),
+    jsonlite
+License: MIT + file LICENSE
+NeedsCompilation: yes
+"""
+
+
+def make_tarball(members):
+    """Return a .tar.gz as bytes containing ``members`` (name -> bytes)."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return buffer
+
+
+class TestParseDcf(TestCase):
+    """Test parsing of DCF formatted metadata."""
+
+    def test_stanzas_and_continuations(self):
+        """Test that stanzas are split on blank lines and continuation lines are joined."""
+        stanzas = parse_dcf(
+            "Package: a\nVersion: 1.0\nImports: b,\n  c\n\nPackage: b\nVersion: 2.0\n"
+        )
+        self.assertEqual(
+            stanzas,
+            [
+                {'Package': 'a', 'Version': '1.0', 'Imports': 'b, c'},
+                {'Package': 'b', 'Version': '2.0'},
+            ],
+        )
+
+    def test_dependencies(self):
+        """Test that dependency lists are split into packages and version constraints."""
+        self.assertEqual(
+            parse_dependencies("R (>= 3.5.0), methods,"),
+            [{'package': 'R', 'version': '>= 3.5.0'}, {'package': 'methods'}],
+        )
+
+    def test_nested_parentheses(self):
+        """Test that parentheses and commas inside a version constraint are kept."""
+        self.assertEqual(
+            parse_dependencies("pkg (>= 1.0 (foo)), other (>= 1.0, < 2.0)"),
+            [
+                {'package': 'pkg', 'version': '>= 1.0 (foo)'},
+                {'package': 'other', 'version': '>= 1.0, < 2.0'},
+            ],
+        )
+
+    def test_wrapped_linking_to(self):
+        """Test a LinkingTo field that starts on a continuation line and wraps a constraint."""
+        (stanza,) = parse_dcf("Package: a\nLinkingTo:\n    Rcpp (>=\n    1.0.0), BH\n")
+        self.assertEqual(
+            parse_dependencies(stanza['LinkingTo']),
+            [{'package': 'Rcpp', 'version': '>= 1.0.0'}, {'package': 'BH'}],
+        )
+
+
+class TestReadDescription(TestCase):
+    """Test reading the DESCRIPTION of a package tarball."""
+
+    def test_read_description(self):
+        """Test that the DESCRIPTION member is found and mapped onto package fields."""
+        tarball = make_tarball({
+            'mypkg/R/code.R': b'f <- function() NULL\n',
+            'mypkg/DESCRIPTION': DESCRIPTION,
+        })
+        fields = package_fields(read_description(tarball))
+        self.assertEqual(fields['name'], 'mypkg')
+        self.assertEqual(fields['version'], '1.2-3')
+        self.assertEqual(fields['description'], 'Does things, over several lines.')
+        self.assertEqual(
+            fields['imports'], [{'package': 'Rcpp', 'version': '>= 1.0.0'}, {'package': 'jsonlite'}]
+        )
+        self.assertTrue(fields['needs_compilation'])
+
+    def test_nested_description_is_ignored(self):
+        """Test that DESCRIPTION files of bundled subdirectories are not used."""
+        tarball = make_tarball({'mypkg/inst/DESCRIPTION': DESCRIPTION})
+        with self.assertRaises(ValueError):
+            read_description(tarball)
+
+    def test_not_a_tarball(self):
+        """Test that invalid archives raise a ValueError."""
+        with self.assertRaises(ValueError):
+            read_description(io.BytesIO(b'not a tarball'))
+
+
+class TestVersionKey(TestCase):
+    """Test the sortable R version key."""
+
+    def test_ordering(self):
+        """Test that keys sort like R's package_version()."""
+        versions = ['0.9', '1.2', '1.2.0', '1.2-1', '1.9.3', '1.10-2', '1.10.10', '2.0', '10.0']
+        self.assertEqual(sorted(versions, key=version_key), versions)
+
+    def test_equivalent_versions(self):
+        """Test that separators and leading zeros do not matter."""
+        self.assertEqual(version_key('1.02-3'), version_key('1.2.3'))
+
+    def test_invalid_version(self):
+        """Test that versions R does not accept get an empty key."""
+        self.assertEqual(version_key('1.0rc1'), '')
+        self.assertEqual(version_key(''), '')
+
+    def test_constraint(self):
+        """Test that constraints become range lookups on the version key."""
+        self.assertEqual(
+            version_constraint_q('>= 1.10'), Q(version_key__gte=version_key('1.10'))
+        )
+        self.assertEqual(version_constraint_q('1.0'), Q(version_key__exact=version_key('1.0')))
+        with self.assertRaises(ValueError):
+            version_constraint_q('>= latest')
+
+    def test_constraint_invalid_versions(self):
+        """Test that packages with invalid versions match no constraint."""
+        for version in ('0.9', '1.10', '1.0rc1'):
+            RPackage.objects.create(name='a', version=version)
+
+        for constraint, expected in (
+            ('< 1.0', {'0.9'}),
+            ('<= 1.10', {'0.9', '1.10'}),
+            ('!= 1.10', {'0.9'}),
+            ('>= 0.1', {'0.9', '1.10'}),
+        ):
+            with self.subTest(constraint=constraint):
+                versions = RPackage.objects.filter(version_constraint_q(constraint))
+                self.assertEqual(set(versions.values_list('version', flat=True)), expected)
@@ -0,0 +1,101 @@
+"""Property-based tests of the DCF and dependency parsers."""
+
+from django.test import SimpleTestCase
+from hypothesis import given
+from hypothesis import strategies as st
+
+from pulp_r.app.utils import parse_dcf, parse_dependencies
+
+FIELD_NAMES = st.from_regex(r"[A-Za-z][A-Za-z0-9._@/-]{0,15}", fullmatch=True)
+# Anything but whitespace and line breaks, colons included
+WORDS = st.lists(
+    st.text(
+        st.characters(blacklist_categories=('Cc', 'Cs', 'Zs', 'Zl', 'Zp')), min_size=1, max_size=8
+    ),
+    max_size=8,
+)
+INDENTS = st.sampled_from([' ', '  ', '    ', '\t'])
+
+PACKAGE_NAMES = st.from_regex(r"[A-Za-z][A-Za-z0-9.]{0,12}", fullmatch=True)
+VERSIONS = st.from_regex(r"[0-9]{1,3}([.-][0-9]{1,3}){0,3}", fullmatch=True)
+CONSTRAINTS = st.one_of(
+    st.none(),
+    st.builds(
+        lambda operator, version, note: f"{operator} {version}{note}",
+        st.sampled_from(['>=', '<=', '>', '<', '==']),
+        VERSIONS,
+        st.sampled_from(['', ' (foo)', ', < 99']),
+    ),
+)
+# Whitespace R tolerates around the parts of a dependency, line wraps of a DCF field included
+BLANKS = st.sampled_from(['', ' ', '  ', '\n    ', '\t'])
+
+
+@st.composite
+def dcf_documents(draw):
+    """Return DCF text and the stanzas it encodes, with values wrapped at random words."""
+    stanzas = draw(st.lists(st.dictionaries(FIELD_NAMES, WORDS, min_size=1), max_size=5))
+    lines = []
+    for stanza in stanzas:
+        for field, words in stanza.items():
+            first = draw(st.integers(min_value=0, max_value=len(words)))
+            lines.append(" ".join([f"{field}:", *words[:first]]))
+            rest = words[first:]
+            while rest:
+                size = draw(st.integers(min_value=1, max_value=len(rest)))
+                lines.append(draw(INDENTS) + " ".join(rest[:size]))
+                rest = rest[size:]
+        lines.append(draw(st.sampled_from(['', ' ', '\t'])))
+    expected = [
+        {field: " ".join(words) for field, words in stanza.items()} for stanza in stanzas
+    ]
+    return "\n".join(lines), expected
+
+
+@st.composite
+def dependency_lists(draw):
+    """Return a dependency field and the dependencies it encodes."""
+    dependencies = draw(st.lists(st.tuples(PACKAGE_NAMES, CONSTRAINTS), max_size=6))
+    parts = []
+    for name, constraint in dependencies:
+        part = draw(BLANKS) + name + draw(BLANKS)
+        if constraint is not None:
+            part += f"({draw(BLANKS)}{constraint.replace(' ', draw(BLANKS) or ' ')}{draw(BLANKS)})"
+        parts.append(part)
+    expected = [
+        {'package': name} if constraint is None else {'package': name, 'version': constraint}
+        for name, constraint in dependencies
+    ]
+    return ",".join(parts) + draw(st.sampled_from(['', ',', ', '])), expected
+
+
+class TestParseDcfProperties(SimpleTestCase):
+    """Fuzz the DCF parser."""
+
+    @given(dcf_documents())
+    def test_round_trip(self, document):
+        """Test that wrapped fields are unwrapped into the values they were formatted from."""
+        text, expected = document
+        self.assertEqual(parse_dcf(text), expected)
+
+    @given(st.text())
+    def test_any_text(self, text):
+        """Test that any text parses into stanzas of string fields."""
+        for stanza in parse_dcf(text):
+            self.assertTrue(all(isinstance(value, str) for value in stanza.values()))
+
+
+class TestParseDependenciesProperties(SimpleTestCase):
+    """Fuzz the dependency list parser."""
+
+    @given(dependency_lists())
+    def test_round_trip(self, dependency_list):
+        """Test that dependencies are recovered whatever the whitespace and nesting."""
+        text, expected = dependency_list
+        self.assertEqual(parse_dependencies(text), expected)
+
+    @given(st.text())
+    def test_any_text(self, text):
+        """Test that any text parses into named dependencies."""
+        for dependency in parse_dependencies(text):
+            self.assertIn('package', dependency)
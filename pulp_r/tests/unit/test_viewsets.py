@@ -0,0 +1,326 @@
+import base64
+import json
+import uuid
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from pulpcore.plugin.util import get_url
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from pulp_r.app.models import RDistribution, RPackage, RPublication, RRepository
+from pulp_r.app.viewsets import (
+    RDistributionViewSet,
+    RPackageFilter,
+    RPackagePagination,
+    RPackageViewSet,
+    RRepositoryVersionViewSet,
+)
+from pulp_r.tests.unit.utils import create_package, create_version
+
+
+def encode(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+class TestRPackagePagination(SimpleTestCase):
+    """Test decoding the cursors of keyset pagination."""
+
+    def decode(self, cursor):
+        request = Request(APIRequestFactory().get('/', {'cursor': cursor}))
+        return RPackagePagination().decode_cursor(request)
+
+    def test_first_page(self):
+        """Test that an empty cursor starts at the first page."""
+        self.assertIsNone(self.decode(''))
+
+    def test_position(self):
+        """Test that a cursor decodes into the name, version and pk of the last package."""
+        pk = str(uuid.uuid4())
+        self.assertEqual(self.decode(encode(['Rcpp', '1.0.12', pk])), ('Rcpp', '1.0.12', pk))
+
+    def test_invalid(self):
+        """Test that malformed cursors are not found instead of failing the query."""
+        for cursor in (
+            'not base64!',
+            encode(['Rcpp', '1.0.12']),
+            encode(['Rcpp', '1.0.12', 'not-a-uuid']),
+            encode(['Rcpp', '1.0.12', 42]),
+            encode([['Rcpp'], '1.0.12', str(uuid.uuid4())]),
+            encode({'name': 'Rcpp'}),
+        ):
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.decode(cursor)
+
+    def test_schema(self):
+        """Test that the cursor is documented next to limit and offset."""
+        parameters = RPackagePagination().get_schema_operation_parameters(view=None)
+        self.assertEqual(
+            {parameter['name'] for parameter in parameters}, {'limit', 'offset', 'cursor'}
+        )
+
+
+class TestKeysetPages(TestCase):
+    """Test paging through packages by keyset."""
+
+    def setUp(self):
+        for name, version in (('b', '1.0'), ('a', '2.0'), ('a', '1.0'), ('ab', '0.1')):
+            RPackage.objects.create(name=name, version=version)
+
+    def pages(self, limit):
+        cursor = ''
+        while cursor is not None:
+            paginator = RPackagePagination()
+            request = Request(APIRequestFactory().get('/', {'cursor': cursor, 'limit': limit}))
+            page = paginator.paginate_queryset(RPackage.objects.all(), request)
+            yield [(package.name, package.version) for package in page]
+            next_link = paginator.get_paginated_response([]).data['next']
+            cursor = parse_qs(urlparse(next_link).query)['cursor'][0] if next_link else None
+
+    def test_pages(self):
+        """Test that every package is returned once, in order, whatever the page size."""
+        expected = [('a', '1.0'), ('a', '2.0'), ('ab', '0.1'), ('b', '1.0')]
+        for limit in (1, 2, 3, 4, 5):
+            with self.subTest(limit=limit):
+                pages = list(self.pages(limit))
+                self.assertEqual([package for page in pages for package in page], expected)
+                self.assertTrue(all(0 < len(page) <= limit for page in pages))
+
+
+class TestRPackageFilter(TestCase):
+    """Test filtering packages."""
+
+    def setUp(self):
+        RPackage.objects.create(name='Rcpp', version='1.0.9', imports=[{'package': 'methods'}])
+        RPackage.objects.create(
+            name='Rcpp', version='1.0.10', imports=[{'package': 'methods'}],
+            needs_compilation=True,
+        )
+        RPackage.objects.create(
+            name='RcppArmadillo', version='0.12.6',
+            linking_to=[{'package': 'Rcpp'}], imports=[{'package': 'Rcpp', 'version': '>= 1.0'}],
+            needs_compilation=True,
+        )
+        RPackage.objects.create(name='dplyr', version='1.1.4', depends=[{'package': 'R'}])
+
+    def filter(self, **data):
+        queryset = RPackageFilter(data, queryset=RPackage.objects.all()).qs
+        return sorted((package.name, package.version) for package in queryset)
+
+    def test_latest(self):
+        """Test that only the newest version of each package is kept, by R ordering."""
+        self.assertEqual(
+            self.filter(latest='true'),
+            [('Rcpp', '1.0.10'), ('RcppArmadillo', '0.12.6'), ('dplyr', '1.1.4')],
+        )
+        self.assertEqual(self.filter(latest='true', name='Rcpp'), [('Rcpp', '1.0.10')])
+        self.assertEqual(len(self.filter(latest='false')), 4)
+
+    def test_depends_on(self):
+        """Test that Depends, Imports and LinkingTo are matched, versioned or not."""
+        self.assertEqual(self.filter(depends_on='Rcpp'), [('RcppArmadillo', '0.12.6')])
+        self.assertEqual(self.filter(depends_on='R'), [('dplyr', '1.1.4')])
+        self.assertEqual(
+            self.filter(depends_on='methods'), [('Rcpp', '1.0.10'), ('Rcpp', '1.0.9')]
+        )
+        self.assertEqual(self.filter(depends_on='Rcp'), [])
+
+    def test_name_in(self):
+        """Test that several names can be asked for at once."""
+        self.assertEqual(
+            self.filter(name__in='dplyr,RcppArmadillo'),
+            [('RcppArmadillo', '0.12.6'), ('dplyr', '1.1.4')],
+        )
+
+    def test_name_startswith(self):
+        """Test that names are matched by prefix, case sensitively."""
+        self.assertEqual(
+            self.filter(name__startswith='Rcpp'),
+            [('Rcpp', '1.0.10'), ('Rcpp', '1.0.9'), ('RcppArmadillo', '0.12.6')],
+        )
+        self.assertEqual(self.filter(name__startswith='rcpp'), [])
+
+    def test_needs_compilation(self):
+        """Test that packages are filtered by whether they need compilation."""
+        self.assertEqual(
+            self.filter(needs_compilation='true'),
+            [('Rcpp', '1.0.10'), ('RcppArmadillo', '0.12.6')],
+        )
+        self.assertEqual(
+            self.filter(needs_compilation='false'), [('Rcpp', '1.0.9'), ('dplyr', '1.1.4')]
+        )
+
+
+class TestSearch(TestCase):
+    """Test the package search action."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='search', is_superuser=True)
+        RPackage.objects.create(
+            name='shiny', version='1.8.0', summary='Web Application Framework for R'
+        )
+        RPackage.objects.create(
+            name='bslib', version='0.6.1', summary='Custom Bootstrap Sass Themes',
+            description='Simplifies custom CSS styling of shiny and rmarkdown documents.',
+        )
+        RPackage.objects.create(
+            name='dplyr', version='1.1.4', summary='A Grammar of Data Manipulation'
+        )
+
+    def search(self, **params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, self.user)
+        return RPackageViewSet.as_view({'get': 'search'})(request)
+
+    def test_ranking(self):
+        """Test that a name match ranks above a match in the description only."""
+        response = self.search(q='shiny')
+
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([result['name'] for result in results], ['shiny', 'bslib'])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+
+    def test_full_text(self):
+        """Test that the summary is searched with stemming."""
+        response = self.search(q='themes')
+        self.assertEqual([result['name'] for result in response.data['results']], ['bslib'])
+
+    def test_filters(self):
+        """Test that the package filters narrow the search down."""
+        response = self.search(q='shiny', name='bslib')
+        self.assertEqual([result['name'] for result in response.data['results']], ['bslib'])
+
+    def test_no_terms(self):
+        """Test that a search without terms is rejected."""
+        self.assertEqual(self.search(q=' ').status_code, 400)
+
+
+class TestInstallPlan(TestCase):
+    """Test the install_plan action of distributions."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='install-plan', is_superuser=True)
+        repository = RRepository.objects.create(name='install-plan')
+        self.rcpp = create_package('Rcpp', '1.0.10', md5sum='0' * 32)
+        self.eigen = create_package(
+            'RcppEigen', '0.3.4', md5sum='1' * 32, linking_to=[{'package': 'Rcpp'}]
+        )
+        # A package without a ContentArtifact cannot be downloaded
+        self.orphan = RPackage.objects.create(name='orphan', version='1.0')
+        publication = RPublication.objects.create(
+            repository_version=create_version(
+                repository, add=[self.rcpp, self.eigen, self.orphan]
+            ),
+            complete=True,
+        )
+        self.distribution = RDistribution.objects.create(
+            name='install-plan', base_path='install-plan', publication=publication
+        )
+
+    def plan(self, data):
+        request = APIRequestFactory().post('/', data, format='json')
+        force_authenticate(request, self.user)
+        view = RDistributionViewSet.as_view({'post': 'install_plan'})
+        return view(request, pk=self.distribution.pk)
+
+    def test_packages(self):
+        """Test that requirements resolve to download URLs, dependencies first."""
+        response = self.plan({'packages': ['RcppEigen', 'Matrix (>= 1.6)']})
+
+        self.assertEqual(response.status_code, 200)
+        base_url = f"{settings.CONTENT_ORIGIN}{settings.CONTENT_PATH_PREFIX}install-plan"
+        self.assertEqual(
+            response.data['packages'],
+            [
+                {
+                    'name': 'Rcpp', 'version': '1.0.10', 'url': f"{base_url}/Rcpp_1.0.10.tar.gz",
+                    'md5sum': '0' * 32, 'sha256': None,
+                },
+                {
+                    'name': 'RcppEigen', 'version': '0.3.4',
+                    'url': f"{base_url}/RcppEigen_0.3.4.tar.gz", 'md5sum': '1' * 32,
+                    'sha256': None,
+                },
+            ],
+        )
+        self.assertEqual(response.data['missing'], [{'name': 'Matrix', 'constraint': '>= 1.6'}])
+
+    def test_lockfile(self):
+        """Test that the packages of a lockfile are pinned to their locked versions."""
+        response = self.plan({'lockfile': {'Packages': {'Rcpp': {'Version': '1.0.9'}}}})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['packages'], [])
+        self.assertEqual(response.data['missing'], [{'name': 'Rcpp', 'constraint': '== 1.0.9'}])
+
+    def test_without_content_artifact(self):
+        """Test that a package that cannot be downloaded is reported as missing."""
+        response = self.plan({'packages': ['orphan']})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['packages'], [])
+        self.assertEqual(response.data['missing'], [{'name': 'orphan', 'constraint': '== 1.0'}])
+
+    def test_invalid_constraints(self):
+        """Test that unparsable requested or locked versions are rejected."""
+        self.assertEqual(self.plan({'packages': ['Rcpp (>= x)']}).status_code, 400)
+        response = self.plan({'lockfile': {'Packages': {'Rcpp': {'Version': 'latest'}}}})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Rcpp', str(response.data['lockfile']))
+
+
+class TestDiff(TestCase):
+    """Test the diff action of repository versions."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='diff', is_superuser=True)
+        self.repository = RRepository.objects.create(name='diff')
+        a_old, b = create_package('a', '1.0'), create_package('b', '1.0')
+        self.first = create_version(self.repository, add=[a_old, b])
+        self.second = create_version(
+            self.repository,
+            add=[create_package('a', '1.1'), create_package('c', '1.0')],
+            remove=[a_old, b],
+        )
+
+    def diff(self, repository_version, **params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, self.user)
+        view = RRepositoryVersionViewSet.as_view({'get': 'diff'})
+        return view(request, repository_pk=self.repository.pk, number=repository_version.number)
+
+    def test_previous_version(self):
+        """Test that a version is compared to the previous one by default."""
+        response = self.diff(self.second)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(
+            [
+                (change['name'], change['change'], change['base_version'], change['version'])
+                for change in response.data['results']
+            ],
+            [
+                ('a', 'upgraded', '1.0', '1.1'),
+                ('b', 'removed', '1.0', None),
+                ('c', 'added', None, '1.0'),
+            ],
+        )
+
+    def test_base_version(self):
+        """Test that a version can be compared to any other version, one page at a time."""
+        base_version = get_url(self.repository.versions.get(number=0))
+
+        response = self.diff(self.second, base_version=base_version, limit=1)
+
+        self.assertEqual([change['name'] for change in response.data['results']], ['a'])
+        self.assertEqual(response.data['results'][0]['change'], 'added')
+        self.assertEqual(parse_qs(urlparse(response.data['next']).query)['after'], ['a'])
+
+    def test_no_previous_version(self):
+        """Test that the first version cannot be compared to a previous one."""
+        self.assertEqual(self.diff(self.repository.versions.get(number=0)).status_code, 400)
@@ -0,0 +1,63 @@
+"""Helpers for the unit tests of the r plugin."""
+
+import io
+import os
+import tarfile
+from contextlib import contextmanager
+from unittest import mock
+
+from pulpcore.plugin.models import ContentArtifact, Task
+
+from pulp_r.app.models import RPackage
+
+
+def write_tarball(directory, name, version, **fields):
+    """
+    Write a source package tarball with a DESCRIPTION to ``directory``.
+
+    Returns:
+        The path of the tarball.
+    """
+    stanza = {'Package': name, 'Version': version, 'License': 'GPL-3', **fields}
+    description = ''.join(f"{field}: {value}\n" for field, value in stanza.items()).encode()
+    path = os.path.join(directory, f"{name}_{version}.tar.gz")
+    with tarfile.open(path, 'w:gz') as tar:
+        info = tarfile.TarInfo(f"{name}/DESCRIPTION")
+        info.size = len(description)
+        tar.addfile(info, io.BytesIO(description))
+    return path
+
+
+def create_package(name, version, relative_path=None, **fields):
+    """
+    Create a package with a ContentArtifact without artifact, as if it was synced on demand.
+    """
+    package = RPackage.objects.create(name=name, version=version, **fields)
+    ContentArtifact.objects.create(
+        content=package,
+        artifact=None,
+        relative_path=relative_path or f"{name}_{version}.tar.gz",
+    )
+    return package
+
+
+def create_version(repository, add=(), remove=()):
+    """
+    Create a new version of ``repository`` adding and removing packages.
+    """
+    with repository.new_version() as new_version:
+        if remove:
+            new_version.remove_content(RPackage.objects.filter(pk__in=[p.pk for p in remove]))
+        if add:
+            new_version.add_content(RPackage.objects.filter(pk__in=[p.pk for p in add]))
+    return new_version
+
+
+@contextmanager
+def running_task():
+    """
+    Run the block as if it were a task, for code that needs ``Task.current()``.
+    """
+    task = Task.objects.create(name='pulp_r.tests', state='running')
+    with mock.patch.dict(os.environ, {'PULP_TASK_ID': str(task.pk)}):
+        yield task